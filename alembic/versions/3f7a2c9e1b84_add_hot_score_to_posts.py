@@ -0,0 +1,31 @@
+"""add hot_score to posts
+
+Revision ID: 3f7a2c9e1b84
+Revises: fd98f3303699
+Create Date: 2026-10-19 12:30:41.118204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f7a2c9e1b84'
+down_revision: Union[str, Sequence[str], None] = 'fd98f3303699'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Existing rows start at 0; the hot score decay job backfills the window on startup
+    op.add_column('posts', sa.Column('hot_score', sa.Float(), server_default='0', nullable=True))
+    op.create_index(op.f('ix_posts_hot_score'), 'posts', ['hot_score'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_posts_hot_score'), table_name='posts')
+    op.drop_column('posts', 'hot_score')
@@ -0,0 +1,58 @@
+"""add unique like constraints
+
+Revision ID: 8b1e5d4c2a97
+Revises: 3f7a2c9e1b84
+Create Date: 2026-10-19 13:05:12.540318
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8b1e5d4c2a97'
+down_revision: Union[str, Sequence[str], None] = '3f7a2c9e1b84'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Drop duplicate likes left behind by the old check-then-insert race
+    op.execute(
+        "DELETE FROM post_likes WHERE id NOT IN "
+        "(SELECT MIN(id) FROM post_likes GROUP BY user_id, post_id)"
+    )
+    op.execute(
+        "DELETE FROM comment_likes WHERE id NOT IN "
+        "(SELECT MIN(id) FROM comment_likes GROUP BY user_id, comment_id)"
+    )
+
+    with op.batch_alter_table('post_likes') as batch_op:
+        batch_op.create_unique_constraint('uq_post_likes_user_post', ['user_id', 'post_id'])
+    with op.batch_alter_table('comment_likes') as batch_op:
+        batch_op.create_unique_constraint('uq_comment_likes_user_comment', ['user_id', 'comment_id'])
+
+    # Repair counters that drifted under lost updates
+    op.execute(
+        "UPDATE posts SET likes_count = "
+        "(SELECT COUNT(*) FROM post_likes WHERE post_likes.post_id = posts.id)"
+    )
+    op.execute(
+        "UPDATE posts SET comments_count = "
+        "(SELECT COUNT(*) FROM comments WHERE comments.post_id = posts.id)"
+    )
+    op.execute(
+        "UPDATE comments SET likes_count = "
+        "(SELECT COUNT(*) FROM comment_likes WHERE comment_likes.comment_id = comments.id)"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('comment_likes') as batch_op:
+        batch_op.drop_constraint('uq_comment_likes_user_comment', type_='unique')
+    with op.batch_alter_table('post_likes') as batch_op:
+        batch_op.drop_constraint('uq_post_likes_user_post', type_='unique')
@@ -0,0 +1,46 @@
+"""add user stats
+
+Revision ID: a7c3e9f1d254
+Revises: f3d9a1b6c482
+Create Date: 2026-10-19 21:02:47.118203
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a7c3e9f1d254'
+down_revision: Union[str, Sequence[str], None] = 'f3d9a1b6c482'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'user_stats',
+        sa.Column('user_id', sa.Integer(), sa.ForeignKey('users.id', ondelete='CASCADE'), primary_key=True),
+        sa.Column('posts_count', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('followers_count', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('following_count', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('likes_received', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('comments_received', sa.Integer(), server_default='0', nullable=False),
+    )
+    op.execute(
+        "INSERT INTO user_stats (user_id, posts_count, followers_count, following_count, likes_received, comments_received) "
+        "SELECT users.id, "
+        "(SELECT COUNT(*) FROM posts WHERE posts.user_id = users.id), "
+        "(SELECT COUNT(*) FROM user_follows WHERE user_follows.followed_id = users.id), "
+        "(SELECT COUNT(*) FROM user_follows WHERE user_follows.follower_id = users.id), "
+        "(SELECT COUNT(*) FROM post_likes JOIN posts ON posts.id = post_likes.post_id WHERE posts.user_id = users.id), "
+        "(SELECT COUNT(*) FROM comments JOIN posts ON posts.id = comments.post_id WHERE posts.user_id = users.id) "
+        "FROM users"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('user_stats')
@@ -0,0 +1,51 @@
+"""add follow list indexes
+
+Revision ID: b8d4f0a2e6c3
+Revises: a7c3e9f1d254
+Create Date: 2026-10-19 21:48:05.402719
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b8d4f0a2e6c3'
+down_revision: Union[str, Sequence[str], None] = 'a7c3e9f1d254'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# (name, columns)
+INDEXES = [
+    ('ix_user_follows_followed_created_id', ['followed_id', 'created_at', 'id']),
+    ('ix_user_follows_follower_created_id', ['follower_id', 'created_at', 'id']),
+]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if op.get_bind().dialect.name != 'postgresql':
+        for name, columns in INDEXES:
+            op.create_index(name, 'user_follows', columns)
+        return
+
+    # See c4e19a7d5b36 for why each concurrent build is preceded by a drop
+    with op.get_context().autocommit_block():
+        for name, columns in INDEXES:
+            op.execute(sa.text(f'DROP INDEX CONCURRENTLY IF EXISTS {name}'))
+            op.create_index(name, 'user_follows', columns, postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if op.get_bind().dialect.name != 'postgresql':
+        for name, columns in reversed(INDEXES):
+            op.drop_index(name, table_name='user_follows')
+        return
+
+    with op.get_context().autocommit_block():
+        for name, columns in reversed(INDEXES):
+            op.drop_index(name, table_name='user_follows', postgresql_concurrently=True, if_exists=True)
@@ -0,0 +1,41 @@
+"""add category suggestions
+
+Revision ID: c1e5a9b3f708
+Revises: b8d4f0a2e6c3
+Create Date: 2026-10-19 22:31:16.845092
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c1e5a9b3f708'
+down_revision: Union[str, Sequence[str], None] = 'b8d4f0a2e6c3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Filled by the category_suggestions_refresh job
+    op.create_table(
+        'category_similarities',
+        sa.Column('category_id', sa.Integer(), sa.ForeignKey('categories.id', ondelete='CASCADE'), primary_key=True),
+        sa.Column('similar_id', sa.Integer(), sa.ForeignKey('categories.id', ondelete='CASCADE'), primary_key=True),
+        sa.Column('score', sa.Float(), nullable=False),
+    )
+    op.create_table(
+        'category_suggestions',
+        sa.Column('user_id', sa.Integer(), sa.ForeignKey('users.id', ondelete='CASCADE'), primary_key=True),
+        sa.Column('category_id', sa.Integer(), sa.ForeignKey('categories.id', ondelete='CASCADE'), primary_key=True),
+        sa.Column('score', sa.Float(), nullable=False),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('category_suggestions')
+    op.drop_table('category_similarities')
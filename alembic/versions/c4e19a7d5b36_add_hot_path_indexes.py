@@ -0,0 +1,72 @@
+"""add hot path indexes
+
+Revision ID: c4e19a7d5b36
+Revises: 8b1e5d4c2a97
+Create Date: 2026-10-19 15:20:07.334190
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c4e19a7d5b36'
+down_revision: Union[str, Sequence[str], None] = '8b1e5d4c2a97'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# (name, table, columns, unique)
+INDEXES = [
+    ('ix_posts_created_at', 'posts', ['created_at'], False),
+    ('ix_posts_user_id_created_at', 'posts', ['user_id', 'created_at'], False),
+    ('ix_posts_category_id_created_at', 'posts', ['category_id', 'created_at'], False),
+    ('ix_comments_post_id_created_at', 'comments', ['post_id', 'created_at'], False),
+    ('ix_comments_parent_id_created_at', 'comments', ['parent_id', 'created_at'], False),
+    ('ix_post_likes_post_id', 'post_likes', ['post_id'], False),
+    ('ix_comment_likes_comment_id', 'comment_likes', ['comment_id'], False),
+    ('uq_user_follows_follower_followed', 'user_follows', ['follower_id', 'followed_id'], True),
+    ('ix_user_follows_followed_follower', 'user_follows', ['followed_id', 'follower_id'], False),
+    ('uq_category_members_user_category', 'category_members', ['user_id', 'category_id'], True),
+    ('ix_category_members_category_id', 'category_members', ['category_id'], False),
+]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Duplicates would fail the new unique indexes
+    op.execute(
+        "DELETE FROM user_follows WHERE id NOT IN "
+        "(SELECT MIN(id) FROM user_follows GROUP BY follower_id, followed_id)"
+    )
+    op.execute(
+        "DELETE FROM category_members WHERE id NOT IN "
+        "(SELECT MIN(id) FROM category_members GROUP BY user_id, category_id)"
+    )
+
+    if op.get_bind().dialect.name != 'postgresql':
+        for name, table, columns, unique in INDEXES:
+            op.create_index(name, table, columns, unique=unique)
+        return
+
+    # CREATE INDEX CONCURRENTLY keeps the tables writable but cannot run inside a
+    # transaction. A failed concurrent build leaves an INVALID index behind, so each
+    # index is dropped first to make the migration safe to re-run.
+    with op.get_context().autocommit_block():
+        for name, table, columns, unique in INDEXES:
+            op.execute(sa.text(f'DROP INDEX CONCURRENTLY IF EXISTS {name}'))
+            op.create_index(name, table, columns, unique=unique, postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if op.get_bind().dialect.name != 'postgresql':
+        for name, table, columns, unique in reversed(INDEXES):
+            op.drop_index(name, table_name=table)
+        return
+
+    with op.get_context().autocommit_block():
+        for name, table, columns, unique in reversed(INDEXES):
+            op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
@@ -0,0 +1,50 @@
+"""add user trigram indexes
+
+Revision ID: d2a7f3c91e58
+Revises: c4e19a7d5b36
+Create Date: 2026-10-19 16:42:51.208115
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd2a7f3c91e58'
+down_revision: Union[str, Sequence[str], None] = 'c4e19a7d5b36'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+INDEXES = [
+    ('ix_users_username_trgm', 'username'),
+    ('ix_users_full_name_trgm', 'full_name'),
+]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Other databases search through the in-process trigram index instead
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    with op.get_context().autocommit_block():
+        for name, column in INDEXES:
+            op.execute(sa.text(f'DROP INDEX CONCURRENTLY IF EXISTS {name}'))
+            op.create_index(
+                name, 'users', [column], postgresql_using='gin',
+                postgresql_ops={column: 'gin_trgm_ops'}, postgresql_concurrently=True
+            )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+
+    with op.get_context().autocommit_block():
+        for name, column in reversed(INDEXES):
+            op.drop_index(name, table_name='users', postgresql_concurrently=True, if_exists=True)
@@ -0,0 +1,29 @@
+"""add users updated_at
+
+Revision ID: e4b7d2a9c613
+Revises: c1e5a9b3f708
+Create Date: 2026-10-19 23:48:05.204417
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e4b7d2a9c613'
+down_revision: Union[str, Sequence[str], None] = 'c1e5a9b3f708'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # No server default: SQLite cannot add a column defaulting to the current time, and NULL reads as "never edited"
+    op.add_column('users', sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('users', 'updated_at')
@@ -0,0 +1,50 @@
+"""add content fulltext indexes
+
+Revision ID: e6b0c8d4f217
+Revises: d2a7f3c91e58
+Create Date: 2026-10-19 18:05:37.649021
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e6b0c8d4f217'
+down_revision: Union[str, Sequence[str], None] = 'd2a7f3c91e58'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Must match the expression services.search_service queries with
+INDEXES = [
+    ('ix_posts_content_fts', 'posts'),
+    ('ix_comments_content_fts', 'comments'),
+]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Other databases search through the in-process content indexes instead
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+
+    with op.get_context().autocommit_block():
+        for name, table in INDEXES:
+            op.execute(sa.text(f'DROP INDEX CONCURRENTLY IF EXISTS {name}'))
+            op.create_index(
+                name, table, [sa.text("to_tsvector('simple', content)")],
+                postgresql_using='gin', postgresql_concurrently=True
+            )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+
+    with op.get_context().autocommit_block():
+        for name, table in reversed(INDEXES):
+            op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
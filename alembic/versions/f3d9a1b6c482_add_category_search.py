@@ -0,0 +1,58 @@
+"""add category search
+
+Revision ID: f3d9a1b6c482
+Revises: e6b0c8d4f217
+Create Date: 2026-10-19 19:14:22.517390
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f3d9a1b6c482'
+down_revision: Union[str, Sequence[str], None] = 'e6b0c8d4f217'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Must match models.category.CATEGORY_SEARCH_VECTOR
+SEARCH_VECTOR = (
+    "setweight(to_tsvector('simple', name || ' ' || display_name), 'A') || "
+    "setweight(to_tsvector('simple', coalesce(description, '')), 'B')"
+)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('categories', sa.Column('members_count', sa.Integer(), server_default='0', nullable=True))
+    op.add_column('categories', sa.Column('last_post_at', sa.DateTime(timezone=True), nullable=True))
+    op.execute(
+        "UPDATE categories SET "
+        "members_count = (SELECT COUNT(*) FROM category_members WHERE category_members.category_id = categories.id), "
+        "last_post_at = (SELECT MAX(created_at) FROM posts WHERE posts.category_id = categories.id)"
+    )
+
+    # Other databases search through the in-process category index instead
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+
+    with op.get_context().autocommit_block():
+        op.execute(sa.text('DROP INDEX CONCURRENTLY IF EXISTS ix_categories_search_fts'))
+        op.create_index(
+            'ix_categories_search_fts', 'categories', [sa.text(SEARCH_VECTOR)],
+            postgresql_using='gin', postgresql_concurrently=True
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if op.get_bind().dialect.name == 'postgresql':
+        with op.get_context().autocommit_block():
+            op.drop_index('ix_categories_search_fts', table_name='categories', postgresql_concurrently=True, if_exists=True)
+
+    with op.batch_alter_table('categories') as batch_op:
+        batch_op.drop_column('last_post_at')
+        batch_op.drop_column('members_count')
@@ -0,0 +1,4 @@
+"""
+Benchmarks and stress tools for YegnaConnect
+Run from the project root, e.g. `python -m benchmarks.like_stress`
+"""
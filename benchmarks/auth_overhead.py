@@ -0,0 +1,100 @@
+"""
+Per-request cost of resolving the signed-in user.
+
+"legacy" is what every route module used to do: separate get_current_user and
+get_current_user_obj dependencies, each decoding the JWT and selecting the user.
+"cold" is core.auth with its caches emptied before every request (the first
+request of a session, or one after AUTH_CACHE_SECONDS); "warm" is core.auth on a
+cache hit, which is the common case.
+
+    python -m benchmarks.auth_overhead --requests 2000
+"""
+import argparse
+import random
+import statistics
+import time
+
+from sqlalchemy import event
+
+from core import auth
+from core.database import SessionLocal, engine
+from models.user import User
+
+def _setup() -> str:
+    db = SessionLocal()
+    try:
+        username = f"authbench_{random.randrange(10**9)}"
+        db.add(User(username=username, email=f"{username}@example.com", hashed_password="x"))
+        db.commit()
+        return auth.create_access_token(data={"sub": username})
+    finally:
+        db.close()
+
+def _legacy(access_token: str, db):
+    def get_current_user():
+        username = auth.verify_token(access_token)
+        if username:
+            user = db.query(User).filter(User.username == username).first()
+            return user.username if user else None
+        return None
+
+    def get_current_user_obj():
+        username = auth.verify_token(access_token)
+        if username:
+            return db.query(User).filter(User.username == username).first()
+        return None
+
+    return get_current_user(), get_current_user_obj()
+
+def _cached(access_token: str, db):
+    user = auth.get_current_user_obj(access_token, db)
+    return auth.get_current_user(user), user
+
+def _run(mode: str, access_token: str, requests: int) -> dict:
+    queries = [0]
+
+    def count(*_):
+        queries[0] += 1
+
+    event.listen(engine, "before_cursor_execute", count)
+    timings = []
+    try:
+        for _ in range(requests):
+            if mode == "cold":
+                auth.token_cache.clear()
+                auth.user_cache.clear()
+            started = time.perf_counter()
+            # A fresh session per request, as get_db hands out
+            db = SessionLocal()
+            try:
+                username, user = (_legacy if mode == "legacy" else _cached)(access_token, db)
+            finally:
+                db.close()
+            timings.append((time.perf_counter() - started) * 1_000_000)
+            assert username and user
+    finally:
+        event.remove(engine, "before_cursor_execute", count)
+
+    timings.sort()
+    return {
+        "mode": mode,
+        "p50": statistics.median(timings),
+        "p99": timings[int(len(timings) * 0.99) - 1],
+        "mean": statistics.fmean(timings),
+        "queries": queries[0] / requests,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=2000)
+    args = parser.parse_args()
+
+    access_token = _setup()
+    results = [_run(mode, access_token, args.requests) for mode in ("legacy", "cold", "warm")]
+
+    print(f"{'mode':<10}{'p50 us':>10}{'p99 us':>10}{'mean us':>10}{'queries':>10}")
+    for r in results:
+        print(f"{r['mode']:<10}{r['p50']:>10.1f}{r['p99']:>10.1f}{r['mean']:>10.1f}{r['queries']:>10.1f}")
+
+if __name__ == "__main__":
+    main()
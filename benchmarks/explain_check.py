@@ -0,0 +1,163 @@
+"""
+Query-plan regression check for the hot read paths.
+
+Runs the feed, profile, thread and category service calls against DATABASE_URL,
+captures every SELECT they issue and EXPLAINs it with the same parameters. Any
+full table scan of a large table fails the run (exit status 1), so a dropped or
+missing index shows up before it shows up in production latency. On Postgres
+sequential scans are disabled for the EXPLAIN, which makes the planner use an
+index whenever one applies even on small seed databases.
+
+    python -m benchmarks.seed --users 2000 --posts 20000 --likes 100000
+    python -m benchmarks.explain_check
+    python -m benchmarks.explain_check --verbose   # print every plan
+"""
+import argparse
+import re
+import sys
+from typing import Callable, Dict, List, Set, Tuple
+
+from sqlalchemy import event, func, select
+
+from core.database import SessionLocal, engine
+from models import Base
+from models.user import User
+from models.category import Category
+from models.post import Post, Comment
+from services.post_service import PostService
+from services.profile_service import ProfileService
+from services.category_service import CategoryService
+from services.search_service import SearchService
+from services.suggestion_service import SuggestionService
+
+# Tables small enough that scanning them is the right plan
+SMALL_TABLES = {"categories", "alembic_version"}
+
+_PG_SEQ_SCAN = re.compile(r"Seq Scan on (\w+)")
+# SQLite reports "SCAN <table or alias>" for a full scan, "SCAN ... USING INDEX" / "SEARCH" otherwise
+_SQLITE_SCAN = re.compile(r"^SCAN (\w+)$")
+_ALIAS_SUFFIX = re.compile(r"_\d+$")
+
+def _sample_ids(db) -> Dict[str, int]:
+    """Pick the busiest user, category, post and comment so the plans see realistic fan-out"""
+    user_id = db.scalar(select(Post.user_id).group_by(Post.user_id).order_by(func.count().desc()).limit(1))
+    category_id = db.scalar(
+        select(Post.category_id).where(Post.category_id.is_not(None))
+        .group_by(Post.category_id).order_by(func.count().desc()).limit(1)
+    )
+    post_id = db.scalar(select(Comment.post_id).group_by(Comment.post_id).order_by(func.count().desc()).limit(1))
+    comment_id = db.scalar(
+        select(Comment.parent_id).where(Comment.parent_id.is_not(None))
+        .group_by(Comment.parent_id).order_by(func.count().desc()).limit(1)
+    )
+    if not all((user_id, category_id, post_id, comment_id)):
+        raise SystemExit("Not enough data to check plans; run `python -m benchmarks.seed` first")
+    return {
+        "user_id": user_id, "category_id": category_id, "post_id": post_id, "comment_id": comment_id,
+        "viewer_id": db.scalar(select(User.id).where(User.id != user_id).limit(1)),
+        "username": db.scalar(select(User.username).where(User.id == user_id)),
+        "category_name": db.scalar(select(Category.name).where(Category.id == category_id)),
+    }
+
+def _checks(ids: Dict[str, int]) -> List[Tuple[str, Callable]]:
+    user_id, viewer_id, category_id = ids["user_id"], ids["viewer_id"], ids["category_id"]
+    return [
+        ("feed recent", lambda db: PostService.get_posts_with_users(db, viewer_id, sort="recent")),
+        ("feed hot", lambda db: PostService.get_posts_with_users(db, viewer_id, sort="hot")),
+        ("post comments", lambda db: PostService.get_comments_for_post(db, ids["post_id"], viewer_id)),
+        ("comment thread", lambda db: PostService.get_comment_thread(db, ids["post_id"], viewer_id)),
+        ("comment replies", lambda db: PostService.get_replies_for_comment(db, ids["comment_id"], viewer_id)),
+        ("profile user", lambda db: ProfileService(db).get_user_by_username(ids["username"])),
+        ("profile stats", lambda db: ProfileService(db).get_user_stats(user_id)),
+        ("profile posts", lambda db: ProfileService(db).get_user_posts(user_id)),
+        ("profile followers", lambda db: ProfileService(db).get_followers(user_id, viewer_id)),
+        ("profile following", lambda db: ProfileService(db).get_following(user_id, viewer_id)),
+        ("profile is_following", lambda db: ProfileService(db).is_following(viewer_id, user_id)),
+        ("user search", lambda db: ProfileService(db).search_users(ids["username"][:4], viewer_id)),
+        ("people you may know", lambda db: ProfileService(db).people_you_may_know(viewer_id)),
+        ("category by name", lambda db: CategoryService(db).get_category_by_name(ids["category_name"])),
+        ("category stats", lambda db: CategoryService(db).get_category_stats(category_id)),
+        ("category counts", lambda db: CategoryService(db).get_category_counts([category_id])),
+        ("category posts", lambda db: CategoryService(db).get_category_posts(category_id)),
+        ("category members", lambda db: CategoryService(db).get_category_members(category_id)),
+        ("category suggestions", lambda db: CategoryService(db).get_suggested_categories(viewer_id)),
+        ("category is_member", lambda db: CategoryService(db).is_member(viewer_id, category_id)),
+        ("category role", lambda db: CategoryService(db).get_user_role(viewer_id, category_id)),
+    ]
+
+def _capture(call: Callable) -> List[Tuple[str, object]]:
+    """Run a service call and return the SELECT statements it executed with their parameters"""
+    captured = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith(("SELECT", "WITH")):
+            captured.append((statement, parameters))
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    db = SessionLocal()
+    try:
+        call(db)
+    finally:
+        db.close()
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+    return captured
+
+def _explain(statement: str, parameters) -> Tuple[List[str], Set[str]]:
+    """Plan lines and the tables it scans in full"""
+    with engine.connect() as connection:
+        if engine.dialect.name == "postgresql":
+            connection.exec_driver_sql("SET LOCAL enable_seqscan = off")
+            lines = [row[0] for row in connection.exec_driver_sql(f"EXPLAIN {statement}", parameters)]
+            scanned = {match.group(1) for line in lines for match in _PG_SEQ_SCAN.finditer(line)}
+        else:
+            lines = [row[-1] for row in connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters)]
+            scanned = {match.group(1) for line in lines if (match := _SQLITE_SCAN.match(line.strip()))}
+        connection.rollback()
+    # Aliases such as posts_1 refer to the base table
+    return lines, {_ALIAS_SUFFIX.sub("", name) for name in scanned}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--verbose", action="store_true", help="print every statement and its plan")
+    args = parser.parse_args()
+
+    large_tables = set(Base.metadata.tables) - SMALL_TABLES
+    db = SessionLocal()
+    try:
+        ids = _sample_ids(db)
+        # In-process indexes load their whole table once by design; do it outside the capture
+        if not SearchService.uses_trigram_indexes(db):
+            SearchService.sync_user_index(db)
+        SuggestionService.sync_follow_graph(db)
+    finally:
+        db.close()
+
+    failures = 0
+    for label, call in _checks(ids):
+        seen = set()
+        problems = []
+        for statement, parameters in _capture(call):
+            if statement in seen:
+                continue
+            seen.add(statement)
+            lines, scanned = _explain(statement, parameters)
+            bad = sorted(scanned & large_tables)
+            if bad:
+                problems.append((statement, lines, bad))
+            elif args.verbose:
+                print(f"--- {label}\n{statement}\n  " + "\n  ".join(lines))
+        if problems:
+            failures += 1
+            print(f"FAIL {label}")
+            for statement, lines, bad in problems:
+                print(f"  full scan of {', '.join(bad)} in:\n    {' '.join(statement.split())}")
+                print("    " + "\n    ".join(lines))
+        else:
+            print(f"ok   {label} ({len(seen)} statements)")
+
+    if failures:
+        print(f"\n{failures} call(s) scan large tables")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Concurrency stress check for like/unlike and comment counters.
+
+Hammers a single post (and one of its comments) from many threads, each with its
+own session, then verifies that the denormalized counters equal the real row counts.
+
+    python -m benchmarks.like_stress --users 50 --threads 16 --rounds 20
+"""
+import argparse
+import random
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from sqlalchemy import func
+
+from core.database import SessionLocal
+from models.user import User
+from models.post import Post, PostLike, Comment, CommentLike
+from services.post_service import PostService
+
+def _setup(num_users: int):
+    db = SessionLocal()
+    try:
+        users = [User(username=f"stress_{i}_{random.randrange(10**9)}", email=f"stress_{i}_{random.randrange(10**9)}@example.com", hashed_password="x")
+                 for i in range(num_users)]
+        db.add_all(users)
+        db.commit()
+        user_ids = [user.id for user in users]
+        post = PostService.create_post(db, "stress test post", user_ids[0])
+        comment = PostService.create_comment(db, "stress test comment", user_ids[0], post.id)
+        return user_ids, post.id, comment.id
+    finally:
+        db.close()
+
+def _worker(user_ids, post_id: int, comment_id: int, rounds: int, seed: int):
+    rng = random.Random(seed)
+    errors = 0
+    for _ in range(rounds):
+        db = SessionLocal()
+        try:
+            user_id = rng.choice(user_ids)
+            action = rng.randrange(6)
+            if action == 0:
+                PostService.like_post(db, user_id, post_id)
+            elif action == 1:
+                PostService.unlike_post(db, user_id, post_id)
+            elif action == 2:
+                PostService.like_comment(db, user_id, comment_id)
+            elif action == 3:
+                PostService.unlike_comment(db, user_id, comment_id)
+            elif action == 4:
+                PostService.create_comment(db, "stress reply", user_id, post_id)
+            else:
+                own = db.query(Comment.id).filter(Comment.post_id == post_id, Comment.user_id == user_id, Comment.id != comment_id).first()
+                if own:
+                    PostService.delete_comment(db, own.id, user_id)
+        except Exception:
+            # Lock timeouts are acceptable; lost or double-counted updates are not
+            db.rollback()
+            errors += 1
+        finally:
+            db.close()
+    return errors
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--rounds", type=int, default=20, help="operations per thread")
+    args = parser.parse_args()
+
+    user_ids, post_id, comment_id = _setup(args.users)
+    with ThreadPoolExecutor(max_workers=args.threads) as pool:
+        errors = sum(pool.map(lambda seed: _worker(user_ids, post_id, comment_id, args.rounds, seed), range(args.threads)))
+
+    db = SessionLocal()
+    try:
+        post = db.query(Post).filter_by(id=post_id).one()
+        comment = db.query(Comment).filter_by(id=comment_id).one()
+        checks = {
+            "post.likes_count": (post.likes_count, db.query(func.count(PostLike.id)).filter_by(post_id=post_id).scalar()),
+            "post.comments_count": (post.comments_count, db.query(func.count(Comment.id)).filter_by(post_id=post_id).scalar()),
+            "comment.likes_count": (comment.likes_count, db.query(func.count(CommentLike.id)).filter_by(comment_id=comment_id).scalar()),
+        }
+    finally:
+        db.close()
+
+    ok = True
+    for name, (stored, actual) in checks.items():
+        status = "ok" if stored == actual else "MISMATCH"
+        ok = ok and stored == actual
+        print(f"{name:22} stored={stored:<6} actual={actual:<6} {status}")
+    print(f"failed operations (rolled back): {errors}")
+    sys.exit(0 if ok else 1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,217 @@
+"""
+End-to-end HTTP load driver.
+
+Logs in as seeded users (see benchmarks.seed), replays a weighted traffic mix
+against the app and reports throughput plus p50/p95/p99 latency and DB queries per
+request for each route. Query counts come from the Server-Timing header, so the
+target must run with DEBUG=1; --spawn starts a local uvicorn configured that way,
+with the AI API keys blanked so content analysis uses the offline fallbacks.
+
+    python -m benchmarks.seed --users 2000 --posts 20000 --likes 100000
+    python -m benchmarks.load --spawn --duration 30 --concurrency 32
+    python -m benchmarks.load --base-url http://127.0.0.1:8000 --mix feed=6,profile=2,like=1
+"""
+import argparse
+import asyncio
+import os
+import random
+import re
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+import httpx
+from sqlalchemy import func, select
+
+from core.database import SessionLocal
+from models.user import User
+from models.category import Category
+from models.post import Post
+
+DEFAULT_MIX = "feed=30,hot=10,profile=20,category=10,thread=15,like=10,search=5"
+QUERIES_PATTERN = re.compile(r'desc="(\d+) queries"')
+
+def _parse_mix(mix: str) -> Dict[str, float]:
+    weights = {}
+    for part in mix.split(","):
+        name, _, weight = part.partition("=")
+        weights[name.strip()] = float(weight or 1)
+    unknown = set(weights) - set(ROUTES)
+    if unknown:
+        raise SystemExit(f"Unknown routes in --mix: {', '.join(sorted(unknown))} (known: {', '.join(ROUTES)})")
+    return weights
+
+class Targets:
+    """Usernames, categories and posts sampled from the database, weighted toward recent/popular rows"""
+
+    def __init__(self, login_prefix: str, logins: int, sample: int):
+        db = SessionLocal()
+        try:
+            self.logins = db.scalars(
+                select(User.username).where(User.username.like(f"{login_prefix}%")).limit(logins)
+            ).all()
+            self.usernames = db.scalars(select(User.username).order_by(func.random()).limit(sample)).all()
+            self.categories = db.scalars(
+                select(Category.name).where(Category.is_public == True).order_by(func.random()).limit(sample)
+            ).all()
+            self.post_ids = db.scalars(select(Post.id).order_by(Post.created_at.desc()).limit(sample)).all()
+        finally:
+            db.close()
+        if not self.logins or not self.post_ids:
+            raise SystemExit("No seeded data found; run `python -m benchmarks.seed` first")
+
+async def _feed(client, targets, rng):
+    return await client.get("/feed")
+
+async def _hot(client, targets, rng):
+    return await client.get("/feed", params={"sort": "hot"})
+
+async def _profile(client, targets, rng):
+    return await client.get(f"/profile/{rng.choice(targets.usernames)}")
+
+async def _category(client, targets, rng):
+    return await client.get(f"/category/{rng.choice(targets.categories)}")
+
+async def _thread(client, targets, rng):
+    return await client.get(f"/posts/{rng.choice(targets.post_ids)}/thread")
+
+async def _like(client, targets, rng):
+    post_id = rng.choice(targets.post_ids)
+    response = await client.post(f"/posts/{post_id}/like")
+    if response.status_code == 400:
+        # Already liked by this user: exercise the unlike path instead
+        response = await client.post(f"/posts/{post_id}/unlike")
+    return response
+
+async def _search(client, targets, rng):
+    return await client.get("/search/", params={"q": rng.choice(targets.usernames)[:4]})
+
+ROUTES = {
+    "feed": _feed, "hot": _hot, "profile": _profile, "category": _category,
+    "thread": _thread, "like": _like, "search": _search,
+}
+
+class Results:
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.queries: Dict[str, List[int]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+
+    def record(self, route: str, elapsed: float, response: Optional[httpx.Response]):
+        self.latencies[route].append(elapsed)
+        if response is None or response.status_code >= 500 or response.status_code in (401, 404):
+            self.errors[route] += 1
+            return
+        match = QUERIES_PATTERN.search(response.headers.get("server-timing", ""))
+        if match:
+            self.queries[route].append(int(match.group(1)))
+
+def _percentile(sorted_values: List[float], fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+async def _login(client: httpx.AsyncClient, username: str, password: str):
+    response = await client.post("/login", data={"username": username, "password": password})
+    if "access_token" not in client.cookies:
+        raise SystemExit(f"Login failed for {username} (status {response.status_code})")
+
+async def _virtual_user(index: int, args, targets: Targets, routes: List[str], weights: List[float],
+                        results: Results, deadline: float):
+    rng = random.Random(args.seed + index)
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=args.timeout, follow_redirects=False) as client:
+        await _login(client, targets.logins[index % len(targets.logins)], args.password)
+        while time.perf_counter() < deadline:
+            route = rng.choices(routes, weights=weights)[0]
+            started = time.perf_counter()
+            try:
+                response = await ROUTES[route](client, targets, rng)
+            except httpx.HTTPError:
+                response = None
+            results.record(route, time.perf_counter() - started, response)
+
+def _report(results: Results, elapsed: float):
+    total = sum(len(values) for values in results.latencies.values())
+    print(f"\n{total} requests in {elapsed:.1f}s = {total / elapsed:.1f} req/s\n")
+    print(f"{'route':<10}{'reqs':>8}{'err':>6}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'queries':>9}")
+    for route in sorted(results.latencies):
+        latencies = sorted(results.latencies[route])
+        queries = results.queries.get(route)
+        avg_queries = f"{sum(queries) / len(queries):.1f}" if queries else "-"
+        print(
+            f"{route:<10}{len(latencies):>8}{results.errors[route]:>6}{len(latencies) / elapsed:>9.1f}"
+            f"{_percentile(latencies, 0.50) * 1000:>9.1f}{_percentile(latencies, 0.95) * 1000:>9.1f}"
+            f"{_percentile(latencies, 0.99) * 1000:>9.1f}{avg_queries:>9}"
+        )
+
+def _spawn_server(port: int, workers: int) -> subprocess.Popen:
+    env = dict(os.environ, DEBUG="1", AI_HF_API_KEY="", AI_OPENAI_API_KEY="")
+    # Budgets are for production logs; the benchmark reports per-route numbers itself
+    env.setdefault("QUERY_BUDGET_COUNT", "1000000")
+    env.setdefault("QUERY_BUDGET_MS", "1000000")
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--workers", str(workers), "--log-level", "warning"],
+        env=env
+    )
+
+async def _wait_until_up(base_url: str, timeout: float = 30):
+    deadline = time.perf_counter() + timeout
+    async with httpx.AsyncClient(base_url=base_url) as client:
+        while time.perf_counter() < deadline:
+            try:
+                await client.get("/")
+                return
+            except httpx.HTTPError:
+                await asyncio.sleep(0.25)
+    raise SystemExit(f"Server at {base_url} did not come up")
+
+async def _main(args):
+    mix = _parse_mix(args.mix)
+    routes, weights = list(mix), list(mix.values())
+    targets = Targets(args.login_prefix, args.concurrency, args.sample)
+    await _wait_until_up(args.base_url)
+
+    results = Results()
+    if args.warmup:
+        await asyncio.gather(*(
+            _virtual_user(i, args, targets, routes, weights, Results(), time.perf_counter() + args.warmup)
+            for i in range(args.concurrency)
+        ))
+    started = time.perf_counter()
+    deadline = started + args.duration
+    await asyncio.gather(*(
+        _virtual_user(i, args, targets, routes, weights, results, deadline) for i in range(args.concurrency)
+    ))
+    _report(results, time.perf_counter() - started)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default=None, help="target app (default: the spawned server)")
+    parser.add_argument("--spawn", action="store_true", help="start uvicorn locally with DEBUG=1 and AI stubbed")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--duration", type=float, default=30, help="seconds of measured load")
+    parser.add_argument("--warmup", type=float, default=3, help="seconds of unmeasured load first")
+    parser.add_argument("--concurrency", type=int, default=32, help="virtual users, each logged in separately")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help=f"route weights (default {DEFAULT_MIX})")
+    parser.add_argument("--login-prefix", default="seed_")
+    parser.add_argument("--password", default="password")
+    parser.add_argument("--sample", type=int, default=1000, help="users/categories/posts sampled as targets")
+    parser.add_argument("--timeout", type=float, default=30)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    args.base_url = args.base_url or f"http://127.0.0.1:{args.port}"
+
+    server = _spawn_server(args.port, args.workers) if args.spawn else None
+    try:
+        asyncio.run(_main(args))
+    finally:
+        if server:
+            server.terminate()
+            server.wait(timeout=10)
+
+if __name__ == "__main__":
+    main()
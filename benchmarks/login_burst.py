@@ -0,0 +1,115 @@
+"""
+Feed latency during a login burst.
+
+A few logged-in clients keep loading /feed while --burst clients hammer /login
+with valid seeded credentials (a full bcrypt verify each). The feed is measured
+alone first, then during the burst. Before password hashing had its own bounded
+executor, the burst occupied every request threadpool thread and /feed queued
+behind it; now logins wait on (or are refused by) the hashing queue instead.
+
+    python -m benchmarks.seed --users 2000 --posts 20000 --likes 100000
+    python -m benchmarks.login_burst --spawn --burst 200 --duration 15
+"""
+import argparse
+import asyncio
+import time
+from collections import Counter
+from typing import List
+
+import httpx
+
+from benchmarks.load import Targets, _percentile, _spawn_server, _wait_until_up
+
+async def _feed_reader(client: httpx.AsyncClient, latencies: List[float], errors: Counter, deadline: float):
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        try:
+            response = await client.get("/feed")
+        except httpx.HTTPError:
+            errors["feed error"] += 1
+            continue
+        if response.status_code != 200:
+            errors[f"feed {response.status_code}"] += 1
+        latencies.append(time.perf_counter() - started)
+
+async def _login_loop(args, username: str, statuses: Counter, latencies: List[float], deadline: float):
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=args.timeout) as client:
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            try:
+                response = await client.post("/login", data={"username": username, "password": args.password})
+                statuses[response.status_code] += 1
+            except httpx.HTTPError:
+                statuses["error"] += 1
+                continue
+            latencies.append(time.perf_counter() - started)
+            if response.status_code == 503:
+                # Back off the way a browser user retrying would
+                await asyncio.sleep(float(response.headers.get("retry-after", 1)))
+
+async def _phase(args, readers: List[httpx.AsyncClient], logins: List[str], burst: int) -> dict:
+    feed, login, statuses = [], [], Counter()
+    deadline = time.perf_counter() + args.duration
+    await asyncio.gather(
+        *(_feed_reader(client, feed, statuses, deadline) for client in readers),
+        *(_login_loop(args, logins[i % len(logins)], statuses, login, deadline) for i in range(burst))
+    )
+    feed.sort()
+    login.sort()
+    return {"feed": feed, "login": login, "statuses": statuses}
+
+async def _main(args):
+    targets = Targets(args.login_prefix, max(args.readers, args.burst), 10)
+    await _wait_until_up(args.base_url)
+    readers = []
+    for i in range(args.readers):
+        client = httpx.AsyncClient(base_url=args.base_url, timeout=args.timeout)
+        await client.post("/login", data={"username": targets.logins[i % len(targets.logins)], "password": args.password})
+        if "access_token" not in client.cookies:
+            raise SystemExit("Login failed; are the seeded users and --password right?")
+        readers.append(client)
+
+    results = {
+        "feed alone": await _phase(args, readers, targets.logins, 0),
+        f"feed + {args.burst} logins": await _phase(args, readers, targets.logins, args.burst),
+    }
+    for client in readers:
+        await client.aclose()
+
+    print(f"{'phase':<24}{'feeds':>7}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'logins':>8}{'login p50':>11}  statuses")
+    for name, r in results.items():
+        feed, login = r["feed"], r["login"]
+        statuses = " ".join(f"{status}:{count}" for status, count in sorted(r["statuses"].items(), key=str))
+        print(
+            f"{name:<24}{len(feed):>7}{_percentile(feed, 0.50) * 1000:>9.1f}{_percentile(feed, 0.95) * 1000:>9.1f}"
+            f"{_percentile(feed, 0.99) * 1000:>9.1f}{len(login):>8}{_percentile(login, 0.50) * 1000:>11.1f}  {statuses}"
+        )
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default=None, help="target app (default: the spawned server)")
+    parser.add_argument("--spawn", action="store_true", help="start uvicorn locally")
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--duration", type=float, default=15, help="seconds per phase")
+    parser.add_argument("--readers", type=int, default=4, help="clients loading /feed back to back")
+    parser.add_argument("--burst", type=int, default=200, help="clients logging in back to back")
+    parser.add_argument("--login-prefix", default="seed_")
+    parser.add_argument("--password", default="password")
+    parser.add_argument("--timeout", type=float, default=60)
+    args = parser.parse_args()
+
+    server = None
+    if args.spawn:
+        server = _spawn_server(args.port, 1)
+        args.base_url = args.base_url or f"http://127.0.0.1:{args.port}"
+    elif not args.base_url:
+        parser.error("pass --base-url or --spawn")
+    try:
+        asyncio.run(_main(args))
+    finally:
+        if server:
+            server.terminate()
+            server.wait()
+
+if __name__ == "__main__":
+    main()
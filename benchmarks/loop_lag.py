@@ -0,0 +1,110 @@
+"""
+Event-loop lag under mixed load: blocking Session vs the async session path.
+
+A ticker coroutine asks to wake every few milliseconds and records how late it
+actually runs while concurrent "profile page" workloads hit the database. With
+the blocking Session every query stalls the loop; with AsyncProfileService the
+loop keeps ticking while queries are in flight.
+
+    python -m benchmarks.loop_lag --concurrency 20 --requests 400
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import time
+
+from core.database import SessionLocal, AsyncSessionLocal, async_engine
+from models.user import User
+from models.post import Post
+from services.profile_service import ProfileService, AsyncProfileService
+
+TICK_SECONDS = 0.005
+
+def _setup(num_posts: int) -> str:
+    db = SessionLocal()
+    try:
+        username = f"looplag_{random.randrange(10**9)}"
+        user = User(username=username, email=f"{username}@example.com", hashed_password="x")
+        db.add(user)
+        db.commit()
+        db.add_all([Post(content=f"loop lag post {i}", user_id=user.id) for i in range(num_posts)])
+        db.commit()
+        return username
+    finally:
+        db.close()
+
+def _profile_page_blocking(username: str):
+    """What the async handlers used to do: a sync Session called straight from the coroutine"""
+    db = SessionLocal()
+    try:
+        service = ProfileService(db)
+        user = service.get_user_by_username(username)
+        service.get_user_stats(user.id)
+        service.get_user_posts(user.id)
+    finally:
+        db.close()
+
+async def _profile_page_async(username: str):
+    async with AsyncSessionLocal() as db:
+        service = AsyncProfileService(db)
+        user = await service.get_user_by_username(username)
+        await service.get_user_stats(user.id)
+        await service.get_user_posts(user.id)
+
+async def _ticker(lags: list, stop: asyncio.Event):
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(TICK_SECONDS)
+        lags.append(max(0.0, time.perf_counter() - started - TICK_SECONDS) * 1000)
+
+async def _run(mode: str, username: str, concurrency: int, requests: int) -> dict:
+    lags, stop = [], asyncio.Event()
+    remaining = iter(range(requests))
+
+    async def worker():
+        for _ in remaining:
+            if mode == "blocking":
+                _profile_page_blocking(username)
+                # Yield like a real handler would between awaits
+                await asyncio.sleep(0)
+            else:
+                await _profile_page_async(username)
+
+    ticker = asyncio.create_task(_ticker(lags, stop))
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await ticker
+
+    lags.sort()
+    return {
+        "mode": mode,
+        "rps": requests / elapsed,
+        "lag_p50": statistics.median(lags) if lags else 0.0,
+        "lag_p99": lags[int(len(lags) * 0.99) - 1] if lags else 0.0,
+        "lag_max": lags[-1] if lags else 0.0,
+        "ticks": len(lags),
+    }
+
+async def _main(args):
+    username = _setup(args.posts)
+    results = []
+    for mode in ("blocking", "async"):
+        results.append(await _run(mode, username, args.concurrency, args.requests))
+    await async_engine.dispose()
+
+    print(f"{'mode':<10}{'req/s':>10}{'lag p50 ms':>12}{'lag p99 ms':>12}{'lag max ms':>12}{'ticks':>8}")
+    for r in results:
+        print(f"{r['mode']:<10}{r['rps']:>10.1f}{r['lag_p50']:>12.2f}{r['lag_p99']:>12.2f}{r['lag_max']:>12.2f}{r['ticks']:>8}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--posts", type=int, default=50)
+    asyncio.run(_main(parser.parse_args()))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,260 @@
+"""
+Bulk synthetic dataset for benchmarks.
+
+Generates users, power-law follows, categories and memberships, posts, comments
+(with replies) and post likes straight into DATABASE_URL (Postgres or SQLite) with
+batched Core inserts. Activity and popularity follow Zipf distributions so a few
+users, posts and categories dominate, as in real traffic. Denormalized counters
+(post counters, category member counts and activity) and hot scores are written
+consistently with the generated rows.
+
+Every seeded user can log in as `seed_<n>` with password `password`.
+
+    python -m benchmarks.seed --users 100000 --posts 1000000 --likes 10000000
+    python -m benchmarks.seed --users 2000 --posts 20000 --likes 100000   # quick local run
+"""
+import argparse
+import random
+import time
+from datetime import datetime, timedelta, timezone
+from itertools import accumulate
+from typing import Dict, Iterable, List
+
+from sqlalchemy import func, insert, select, text
+from sqlalchemy.orm import Session
+
+from core.database import engine
+from models import Base
+from models.user import User, UserFollow
+from models.category import Category, CategoryMember
+from models.post import Post, PostLike, Comment
+from core.passwords import pwd_context
+from services.category_service import CategoryService
+from services.ranking_service import RankingService
+from services.suggestion_service import SuggestionService
+from services.user_stats_service import UserStatsService
+
+SEED_PASSWORD = "password"
+DAYS_OF_HISTORY = 90
+CATEGORY_POST_SHARE = 0.3
+REPLY_SHARE = 0.25
+
+WORDS = (
+    "selam addis ababa coffee buna injera music football running market church festival rain "
+    "morning evening friends family school university exam project code startup design photo "
+    "travel bahir dar gondar lalibela hawassa mekelle harar axum history culture language book "
+    "news weather traffic bus taxi food doro wat tibs shiro habesha holiday timket meskel "
+    "great love happy tired busy today tomorrow weekend new idea question help share thanks"
+).split()
+
+class ZipfSampler:
+    """Draws indexes 0..n-1 with P(i) proportional to 1 / (rank + 1) ** exponent over a shuffled ranking"""
+
+    def __init__(self, n: int, exponent: float, rng: random.Random):
+        self.population = list(range(n))
+        rng.shuffle(self.population)
+        self.cum_weights = list(accumulate(1.0 / (rank + 1) ** exponent for rank in range(n)))
+        self.rng = rng
+
+    def sample(self, k: int = 1) -> List[int]:
+        return self.rng.choices(self.population, cum_weights=self.cum_weights, k=k)
+
+    def distinct(self, k: int, exclude: int = -1) -> set:
+        """Up to k distinct draws (popular items first), giving up after a bounded number of tries"""
+        chosen = set()
+        for _ in range(4):
+            chosen.update(self.sample(2 * (k - len(chosen))))
+            chosen.discard(exclude)
+            if len(chosen) >= k:
+                break
+        return set(list(chosen)[:k])
+
+def _split_total(total: int, n: int, exponent: float, rng: random.Random) -> List[int]:
+    """Distribute `total` over n buckets along a shuffled Zipf curve"""
+    weights = [1.0 / (rank + 1) ** exponent for rank in range(n)]
+    rng.shuffle(weights)
+    scale = total / sum(weights)
+    counts = []
+    for weight in weights:
+        expected = weight * scale
+        base = int(expected)
+        counts.append(base + (1 if rng.random() < expected - base else 0))
+    return counts
+
+def _sentence(rng: random.Random, low: int = 5, high: int = 30) -> str:
+    return " ".join(rng.choices(WORDS, k=rng.randint(low, high))).capitalize() + "."
+
+def _next_id(model) -> int:
+    with engine.connect() as connection:
+        return (connection.execute(select(func.max(model.id))).scalar() or 0) + 1
+
+class BatchWriter:
+    """Buffers rows per table and flushes them as executemany inserts"""
+
+    def __init__(self, batch_size: int):
+        self.batch_size = batch_size
+        self.buffers: Dict[object, List[dict]] = {}
+        self.written: Dict[str, int] = {}
+
+    def add(self, model, row: dict):
+        buffer = self.buffers.setdefault(model, [])
+        buffer.append(row)
+        if len(buffer) >= self.batch_size:
+            self.flush(model)
+
+    def flush(self, model=None):
+        for table_model in ([model] if model is not None else list(self.buffers)):
+            rows = self.buffers.get(table_model)
+            if not rows:
+                continue
+            with engine.begin() as connection:
+                connection.execute(insert(table_model), rows)
+            name = table_model.__tablename__
+            self.written[name] = self.written.get(name, 0) + len(rows)
+            self.buffers[table_model] = []
+
+def _reset_sequences(models: Iterable):
+    """Explicit ids bypass Postgres sequences; move them past the seeded rows"""
+    if engine.dialect.name != "postgresql":
+        return
+    with engine.begin() as connection:
+        for model in models:
+            table = model.__tablename__
+            connection.execute(text(
+                f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), (SELECT COALESCE(MAX(id), 1) FROM {table}))"
+            ))
+
+def seed(args):
+    rng = random.Random(args.seed)
+    writer = BatchWriter(args.batch)
+    now = datetime.now(timezone.utc)
+    run = f"{rng.randrange(36 ** 4):04x}"
+    started = time.perf_counter()
+
+    # Users
+    first_user_id = _next_id(User)
+    # Re-seeding into a populated database gets a run suffix to keep usernames unique
+    prefix = "seed_" if first_user_id == 1 else f"seed_{run}_"
+    password_hash = pwd_context.hash(SEED_PASSWORD)
+    user_ids = list(range(first_user_id, first_user_id + args.users))
+    for offset, user_id in enumerate(user_ids):
+        username = f"{prefix}{offset}"
+        writer.add(User, {
+            "id": user_id, "username": username, "email": f"{username}@example.com",
+            "hashed_password": password_hash, "full_name": f"Seed User {offset}",
+            "bio": _sentence(rng, 3, 12) if rng.random() < 0.5 else None,
+        })
+    writer.flush()
+    activity = ZipfSampler(args.users, 1.0, rng)
+    popularity = ZipfSampler(args.users, 1.1, rng)
+
+    # Follows: power-law out-degree, preferential attachment to popular users
+    follow_id = _next_id(UserFollow)
+    for count, follower in zip(_split_total(args.users * args.avg_follows, args.users, 0.9, rng), range(args.users)):
+        for followed in popularity.distinct(min(count, args.users - 1), exclude=follower) if count else ():
+            writer.add(UserFollow, {"id": follow_id, "follower_id": user_ids[follower], "followed_id": user_ids[followed]})
+            follow_id += 1
+    writer.flush()
+
+    # Categories and memberships (creator is admin)
+    first_category_id = _next_id(Category)
+    category_ids = list(range(first_category_id, first_category_id + args.categories))
+    category_creators = {}
+    for offset, category_id in enumerate(category_ids):
+        creator = user_ids[activity.sample()[0]]
+        category_creators[category_id] = creator
+        writer.add(Category, {
+            "id": category_id, "name": f"seed_{run}_{offset}", "display_name": " ".join(rng.choices(WORDS, k=2)).title(),
+            "description": _sentence(rng, 8, 25), "rules": "Be respectful.", "is_public": rng.random() > 0.05,
+            "created_by": creator,
+        })
+    writer.flush()
+    category_popularity = ZipfSampler(args.categories, 1.0, rng)
+    membership_id = _next_id(CategoryMember)
+    for category_id, creator in category_creators.items():
+        writer.add(CategoryMember, {"id": membership_id, "user_id": creator, "category_id": category_id, "role": "admin"})
+        membership_id += 1
+    for user_index, user_id in enumerate(user_ids):
+        joined = {category_ids[index] for index in category_popularity.sample(rng.randint(0, args.max_memberships))}
+        for category_id in joined:
+            if category_creators[category_id] != user_id:
+                writer.add(CategoryMember, {"id": membership_id, "user_id": user_id, "category_id": category_id, "role": "member"})
+                membership_id += 1
+    writer.flush()
+
+    # Posts: counters are decided up front so they match the likes and comments written below
+    first_post_id = _next_id(Post)
+    likes_per_post = [min(count, args.users) for count in _split_total(args.likes, args.posts, 0.9, rng)]
+    comments_per_post = _split_total(args.comments, args.posts, 0.9, rng)
+    authors = activity.sample(args.posts)
+    post_times = []
+    for offset in range(args.posts):
+        created_at = now - timedelta(seconds=rng.random() * DAYS_OF_HISTORY * 86400)
+        post_times.append(created_at)
+        category_id = category_ids[category_popularity.sample()[0]] if category_ids and rng.random() < CATEGORY_POST_SHARE else None
+        writer.add(Post, {
+            "id": first_post_id + offset, "content": _sentence(rng), "user_id": user_ids[authors[offset]],
+            "category_id": category_id, "created_at": created_at,
+            "likes_count": likes_per_post[offset], "comments_count": comments_per_post[offset],
+            "hot_score": RankingService.compute_hot_score(
+                likes_per_post[offset], comments_per_post[offset], None, None, created_at, now
+            ) if now - created_at < timedelta(hours=72) else 0,
+        })
+    writer.flush()
+
+    # Comments, a share of them replies to an earlier comment on the same post
+    comment_id = _next_id(Comment)
+    for offset, count in enumerate(comments_per_post):
+        post_comment_ids = []
+        for commenter in activity.sample(count) if count else []:
+            parent_id = rng.choice(post_comment_ids) if post_comment_ids and rng.random() < REPLY_SHARE else None
+            created_at = post_times[offset] + timedelta(seconds=rng.random() * 86400)
+            writer.add(Comment, {
+                "id": comment_id, "content": _sentence(rng, 2, 15), "user_id": user_ids[commenter],
+                "post_id": first_post_id + offset, "parent_id": parent_id, "created_at": min(created_at, now),
+            })
+            post_comment_ids.append(comment_id)
+            comment_id += 1
+    writer.flush()
+
+    # Likes: distinct users per post
+    like_id = _next_id(PostLike)
+    for offset, count in enumerate(likes_per_post):
+        if not count:
+            continue
+        for liker in rng.sample(range(args.users), count):
+            writer.add(PostLike, {"id": like_id, "user_id": user_ids[liker], "post_id": first_post_id + offset})
+            like_id += 1
+    writer.flush()
+
+    _reset_sequences([User, UserFollow, Category, CategoryMember, Post, Comment, PostLike])
+    # Member counts, last post times, user stats and suggestions are only known once everything is written
+    with Session(engine) as db:
+        CategoryService(db).recount_categories()
+        UserStatsService.reconcile(db)
+        SuggestionService.refresh_category_suggestions(db)
+
+    elapsed = time.perf_counter() - started
+    for table, count in writer.written.items():
+        print(f"{table:20} {count:>12,}")
+    print(f"seeded in {elapsed:.1f}s; log in as {prefix}<n> / {SEED_PASSWORD}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--posts", type=int, default=20000)
+    parser.add_argument("--likes", type=int, default=100000)
+    parser.add_argument("--comments", type=int, default=40000)
+    parser.add_argument("--categories", type=int, default=50)
+    parser.add_argument("--avg-follows", type=int, default=20, help="mean follows per user")
+    parser.add_argument("--max-memberships", type=int, default=5, help="max categories joined per user")
+    parser.add_argument("--batch", type=int, default=5000, help="rows per insert batch")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--create-tables", action="store_true", help="create missing tables first (SQLite scratch databases)")
+    args = parser.parse_args()
+    if args.create_tables:
+        Base.metadata.create_all(engine)
+    seed(args)
+
+if __name__ == "__main__":
+    main()
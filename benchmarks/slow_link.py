@@ -0,0 +1,179 @@
+"""
+Bytes on the wire and latency over a slow link.
+
+Requests go through a local TCP proxy that adds --rtt of round-trip delay and
+caps the server-to-client direction at --kbps, roughly a congested mobile
+connection. One logged-in client fetches the feed HTML and the comments JSON of
+the most-commented post back to back, with compression off (Accept-Encoding:
+identity), with gzip and brotli, and as a poller revalidating with If-None-Match.
+Bytes are counted at the proxy, so they include headers.
+
+    python -m benchmarks.seed --users 2000 --posts 20000 --likes 100000
+    python -m benchmarks.slow_link --spawn --kbps 1000 --rtt 150
+"""
+import argparse
+import asyncio
+import time
+from typing import List, Optional
+
+import httpx
+from sqlalchemy import select
+
+from benchmarks.load import Targets, _percentile, _spawn_server, _wait_until_up
+from core.database import SessionLocal
+from models.post import Post
+
+READ_SIZE = 4096
+
+class SlowLink:
+    """TCP proxy: half the RTT each way, downstream bandwidth capped, downstream bytes counted"""
+
+    def __init__(self, upstream_port: int, kbps: float, rtt_ms: float):
+        self.upstream_port = upstream_port
+        self.bytes_per_second = kbps * 1000 / 8
+        self.delay = rtt_ms / 2000
+        self.downstream_bytes = 0
+        self._connections: List[asyncio.Task] = []
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    async def _pump(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter, throttle: bool):
+        # Chunks are stamped on arrival and released after the one-way delay, then paced at the bandwidth cap
+        queue: asyncio.Queue = asyncio.Queue()
+
+        async def deliver():
+            while True:
+                due, data = await queue.get()
+                if data is None:
+                    break
+                await asyncio.sleep(max(0.0, due - time.perf_counter()))
+                if throttle:
+                    self.downstream_bytes += len(data)
+                    await asyncio.sleep(len(data) / self.bytes_per_second)
+                writer.write(data)
+                await writer.drain()
+            writer.close()
+
+        delivering = asyncio.create_task(deliver())
+        try:
+            while data := await reader.read(READ_SIZE):
+                queue.put_nowait((time.perf_counter() + self.delay, data))
+        except ConnectionError:
+            pass
+        queue.put_nowait((0, None))
+        await delivering
+
+    async def _handle(self, client_reader, client_writer):
+        server_reader, server_writer = await asyncio.open_connection("127.0.0.1", self.upstream_port)
+        self._connections.append(asyncio.current_task())
+        try:
+            await asyncio.gather(
+                self._pump(client_reader, server_writer, throttle=False),
+                self._pump(server_reader, client_writer, throttle=True)
+            )
+        except asyncio.CancelledError:
+            pass
+
+    async def start(self, port: int):
+        self._server = await asyncio.start_server(self._handle, "127.0.0.1", port)
+
+    async def close(self):
+        # Keep-alive connections would otherwise be cancelled mid-read by asyncio.run's teardown
+        self._server.close()
+        for task in self._connections:
+            task.cancel()
+        await asyncio.gather(*self._connections, return_exceptions=True)
+        await self._server.wait_closed()
+
+async def _fetch(client: httpx.AsyncClient, path: str, headers: dict) -> httpx.Response:
+    # Raw bytes only: the body is never decoded, so brotli works without the client-side package
+    response = await client.send(client.build_request("GET", path, headers=headers), stream=True)
+    async for _ in response.aiter_raw():
+        pass
+    await response.aclose()
+    return response
+
+async def _scenario(client: httpx.AsyncClient, link: SlowLink, path: str, encoding: str, revalidate: bool, requests: int) -> dict:
+    latencies: List[float] = []
+    statuses = set()
+    etag: Optional[str] = None
+    if revalidate:
+        etag = (await _fetch(client, path, {"accept-encoding": encoding})).headers.get("etag")
+    link.downstream_bytes = 0
+    for _ in range(requests):
+        headers = {"accept-encoding": encoding}
+        if etag:
+            headers["if-none-match"] = etag
+        started = time.perf_counter()
+        response = await _fetch(client, path, headers)
+        latencies.append(time.perf_counter() - started)
+        statuses.add(f"{response.status_code} {response.headers.get('content-encoding', 'identity')}")
+    latencies.sort()
+    return {"bytes": link.downstream_bytes / requests, "latencies": latencies, "statuses": ", ".join(sorted(statuses))}
+
+def _busiest_post() -> int:
+    db = SessionLocal()
+    try:
+        post_id = db.scalar(select(Post.id).order_by(Post.comments_count.desc()).limit(1))
+    finally:
+        db.close()
+    if post_id is None:
+        raise SystemExit("No seeded data found; run `python -m benchmarks.seed` first")
+    return post_id
+
+async def _main(args):
+    targets = Targets(args.login_prefix, 1, 1)
+    post_id = _busiest_post()
+    await _wait_until_up(args.base_url)
+    link = SlowLink(httpx.URL(args.base_url).port, args.kbps, args.rtt)
+    await link.start(args.proxy_port)
+
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{args.proxy_port}", timeout=args.timeout) as client:
+        await client.post("/login", data={"username": targets.logins[0], "password": args.password})
+        if "access_token" not in client.cookies:
+            raise SystemExit("Login failed; are the seeded users and --password right?")
+        print(f"{args.kbps:g} kbit/s down, {args.rtt:g} ms RTT, {args.requests} requests per row (post {post_id})\n")
+        print(f"{'request':<34}{'KB/resp':>9}{'p50 ms':>9}{'p95 ms':>9}  responses")
+        for name, path in (("feed", "/feed"), ("comments", f"/posts/{post_id}/comments")):
+            for label, encoding, revalidate in (
+                ("identity", "identity", False), ("gzip", "gzip", False), ("br", "br, gzip", False),
+                ("If-None-Match", "br, gzip", True)
+            ):
+                if revalidate and name == "feed":
+                    continue  # personalised HTML carries no validator
+                result = await _scenario(client, link, path, encoding, revalidate, args.requests)
+                latencies = result["latencies"]
+                print(
+                    f"{name + ' ' + label:<34}{result['bytes'] / 1024:>9.1f}{_percentile(latencies, 0.50) * 1000:>9.0f}"
+                    f"{_percentile(latencies, 0.95) * 1000:>9.0f}  {result['statuses']}"
+                )
+    await link.close()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default=None, help="target app (default: the spawned server)")
+    parser.add_argument("--spawn", action="store_true", help="start uvicorn locally")
+    parser.add_argument("--port", type=int, default=8767)
+    parser.add_argument("--proxy-port", type=int, default=8768)
+    parser.add_argument("--kbps", type=float, default=1000, help="downstream bandwidth in kbit/s")
+    parser.add_argument("--rtt", type=float, default=150, help="added round-trip time in ms")
+    parser.add_argument("--requests", type=int, default=10, help="requests per row")
+    parser.add_argument("--login-prefix", default="seed_")
+    parser.add_argument("--password", default="password")
+    parser.add_argument("--timeout", type=float, default=120)
+    args = parser.parse_args()
+
+    server = None
+    if args.spawn:
+        server = _spawn_server(args.port, 1)
+        args.base_url = args.base_url or f"http://127.0.0.1:{args.port}"
+    elif not args.base_url:
+        parser.error("pass --base-url or --spawn")
+    try:
+        asyncio.run(_main(args))
+    finally:
+        if server:
+            server.terminate()
+            server.wait()
+
+if __name__ == "__main__":
+    main()
@@ -2,6 +2,8 @@ from pydantic_settings import BaseSettings
 from typing import Optional
 
 class Settings(BaseSettings):
+    DEBUG: bool = False
+
     DATABASE_URL: str
     
     JWT_SECRET_KEY: str
@@ -13,6 +15,73 @@ class Settings(BaseSettings):
     
     REDIS_URL: Optional[str] = None
 
+    # Connection pool sizing, applied to both the sync and async engines
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: float = 30
+    DB_POOL_RECYCLE: int = 1800
+    # Log sessions that outlive their request and connections held too long, with the opening stack
+    DB_DEBUG_SESSIONS: bool = False
+    DB_CONNECTION_HOLD_WARN_SECONDS: float = 5.0
+
+    # Query accounting: requests over either budget are logged with their worst statements
+    SLOW_QUERY_MS: float = 200
+    QUERY_BUDGET_COUNT: int = 30
+    QUERY_BUDGET_MS: float = 300
+    # Raise when one statement shape repeats more than this many times in a request (0 = off; set in tests)
+    QUERY_REPEAT_LIMIT: int = 0
+
+    # Comma-separated read replica URLs; reads stay on the primary when empty
+    DATABASE_REPLICA_URLS: str = ""
+    # After a write, the client reads from the primary for this long (keep above REPLICA_MAX_LAG_SECONDS)
+    REPLICA_STICKY_SECONDS: float = 10
+    REPLICA_MAX_LAG_SECONDS: float = 5
+    REPLICA_LAG_CHECK_SECONDS: int = 5
+
+    HOT_FEED_WINDOW_HOURS: int = 72
+    HOT_SCORE_REFRESH_SECONDS: int = 300
+
+    # Non-Postgres deployments: how often each worker rebuilds its in-process search indexes
+    SEARCH_INDEX_REFRESH_SECONDS: int = 300
+    # Post/comment search: a brand-new match scores up to (1 + weight) times an old one, halving every half-life
+    SEARCH_RECENCY_WEIGHT: float = 1.0
+    SEARCH_RECENCY_HALF_LIFE_HOURS: float = 72
+    # Category search rankings are shared between users for this long
+    CATEGORY_SEARCH_CACHE_SECONDS: float = 60
+    # bcrypt cost factor; existing hashes are upgraded on the user's next login after a change
+    BCRYPT_ROUNDS: int = 12
+    # Dedicated password hashing threads, and how many hashes may run or wait before logins get a 503
+    PASSWORD_HASH_WORKERS: int = 2
+    PASSWORD_HASH_MAX_PENDING: int = 32
+    # Uploaded media (content-addressed avatar thumbnails), the largest avatar accepted, and resizing processes
+    MEDIA_DIR: str = "media"
+    AVATAR_MAX_BYTES: int = 5 * 1024 * 1024
+    AVATAR_WORKERS: int = 1
+    # Compiled template bytecode, shared by workers and restarts
+    TEMPLATE_CACHE_DIR: str = "data/templates"
+    # Rendered {% cache %} fragments: how long each is kept (keys change on edits anyway) and how many
+    FRAGMENT_CACHE_SECONDS: float = 600
+    FRAGMENT_CACHE_MAX_ENTRIES: int = 10000
+    # HTML/JSON/text responses smaller than this go out uncompressed (a packet either way)
+    COMPRESSION_MIN_BYTES: int = 1024
+    # Fingerprinted, precompressed copies of static/ (served at /assets), rebuilt at startup when files change
+    STATIC_BUILD_DIR: str = "data/static"
+    # How long decoded session cookies and signed-in user snapshots are reused; profile edits made through
+    # other workers show up in their navigation bars after at most this long
+    AUTH_CACHE_SECONDS: float = 60
+    # How often denormalized user stats are recounted to repair drift
+    USER_STATS_RECONCILE_SECONDS: int = 3600
+    # "People you may know": per-user cache lifetime, and how often workers reload the follow graph
+    USER_SUGGESTIONS_CACHE_SECONDS: float = 300
+    FOLLOW_GRAPH_REFRESH_SECONDS: int = 600
+    # How often category neighbours and everyone's category suggestions are recomputed
+    CATEGORY_SUGGESTIONS_REFRESH_SECONDS: int = 3600
+    # Related posts: where the shared post vectors live, how far back matches go, and result/backfill intervals
+    RELATED_POSTS_DIR: str = "data/related_posts"
+    RELATED_POSTS_WINDOW_DAYS: int = 30
+    RELATED_POSTS_CACHE_SECONDS: float = 600
+    RELATED_POSTS_BACKFILL_SECONDS: int = 900
+
     class Config:
         env_file = ".env"
         env_file_encoding = "utf-8"
@@ -1,6 +1,33 @@
+import math
+import time
 from datetime import datetime, timedelta
+from typing import NamedTuple, Optional
+
+from fastapi import Cookie, Depends
 from jose import JWTError, jwt
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
 from config import settings
+from core.cache import TTLCache
+from core.database import get_db
+from models.user import User
+
+# Decoded cookies (token -> (username, expiry)) and the users they name (username -> CurrentUser).
+# Profile updates and logout invalidate them in this worker; other workers catch up within AUTH_CACHE_SECONDS.
+token_cache = TTLCache("auth_tokens", settings.AUTH_CACHE_SECONDS, max_entries=10000)
+user_cache = TTLCache("auth_users", settings.AUTH_CACHE_SECONDS, max_entries=10000)
+
+class CurrentUser(NamedTuple):
+    """Read-only snapshot of the signed-in user, shared between requests (no password hash, no session)"""
+    id: int
+    username: str
+    email: str
+    full_name: Optional[str]
+    bio: Optional[str]
+    avatar_url: Optional[str]
+    location: Optional[str]
+    website: Optional[str]
 
 def create_access_token(data: dict, expires_delta: timedelta = None):
     to_encode = data.copy()
@@ -12,12 +39,57 @@ def create_access_token(data: dict, expires_delta: timedelta = None):
     encoded_jwt = jwt.encode(to_encode, settings.JWT_SECRET_KEY, algorithm=settings.JWT_ALGORITHM)
     return encoded_jwt
 
-def verify_token(token: str):
+def _decode(token: str) -> Optional[dict]:
     try:
-        payload = jwt.decode(token, settings.JWT_SECRET_KEY, algorithms=[settings.JWT_ALGORITHM])
-        username: str = payload.get("sub")
-        if username is None:
-            return None
-        return username
+        return jwt.decode(token, settings.JWT_SECRET_KEY, algorithms=[settings.JWT_ALGORITHM])
     except JWTError:
-        return None 
\ No newline at end of file
+        return None
+
+def verify_token(token: str):
+    payload = _decode(token)
+    if payload is None:
+        return None
+    username: str = payload.get("sub")
+    if username is None:
+        return None
+    return username
+
+def token_username(token: str) -> Optional[str]:
+    """verify_token through the cache; a cached token still stops working at its expiry"""
+    cached = token_cache.get(token)
+    if cached is None:
+        payload = _decode(token)
+        cached = (payload.get("sub"), payload.get("exp", math.inf)) if payload else (None, math.inf)
+        token_cache.set(token, cached)
+    username, expires_at = cached
+    if username and expires_at <= time.time():
+        token_cache.delete(token)
+        return None
+    return username
+
+def _load_user(db: Session, username: str) -> Optional[CurrentUser]:
+    row = db.execute(select(*(getattr(User, field) for field in CurrentUser._fields)).where(User.username == username)).first()
+    return CurrentUser(*row) if row else None
+
+def get_current_user_obj(access_token: str = Cookie(None), db: Session = Depends(get_db)) -> Optional[CurrentUser]:
+    """The signed-in user, or None. FastAPI resolves it once per request however many dependencies ask for it."""
+    if not access_token:
+        return None
+    username = token_username(access_token)
+    if not username:
+        return None
+    # The session only opens a connection on a cache miss
+    return user_cache.get_or_compute(username, lambda: _load_user(db, username))
+
+def get_current_user(user: Optional[CurrentUser] = Depends(get_current_user_obj)) -> Optional[str]:
+    """Username of the signed-in user, or None"""
+    return user.username if user else None
+
+def invalidate_user(username: str):
+    """Call after changing a user's profile so the next request sees it"""
+    user_cache.delete(username)
+
+def forget_token(token: Optional[str]):
+    """Call on logout; the token itself stays valid until it expires, so this only drops it from the cache"""
+    if token:
+        token_cache.delete(token)
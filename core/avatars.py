@@ -0,0 +1,146 @@
+"""
+Avatar storage
+Uploads are copied to disk in chunks (each write off the event loop) while being
+hashed, and rejected once they pass AVATAR_MAX_BYTES. A worker process decodes
+the image and writes square WebP thumbnails named after the SHA-256 of the
+upload, so the URLs never change meaning and are served with immutable cache
+headers. Uploading the same image again, by anyone, reuses the existing files.
+
+Starlette spools file parts of a form to disk with no size limit before the
+route runs, so AvatarUploadLimit refuses oversized uploads ahead of the parser.
+"""
+import asyncio
+import hashlib
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+from fastapi import HTTPException
+from starlette.datastructures import Headers, UploadFile
+from starlette.responses import JSONResponse
+
+from config import settings
+
+AVATAR_SIZES = (48, 128, 256)
+# The variant stored on the user; the largest place it is shown is 96 px
+DEFAULT_SIZE = 128
+CHUNK_SIZE = 256 * 1024
+WEBP_QUALITY = 80
+# Refuse to decode anything bigger (a small compressed file can expand to gigabytes)
+MAX_PIXELS = 40_000_000
+# Room for the other profile fields and the multipart framing around the image
+FORM_OVERHEAD_BYTES = 64 * 1024
+
+_executor: Optional[ProcessPoolExecutor] = None
+
+class AvatarError(ValueError):
+    """The upload is not a readable image"""
+
+class AvatarTooLarge(AvatarError):
+    """The upload is over AVATAR_MAX_BYTES"""
+
+def _too_large_message() -> str:
+    return f"Avatars are limited to {settings.AVATAR_MAX_BYTES // (1024 * 1024)} MB"
+
+def avatar_directory() -> str:
+    return os.path.join(settings.MEDIA_DIR, "avatars")
+
+def avatar_url(digest: str, size: int = DEFAULT_SIZE) -> str:
+    return f"/media/avatars/{digest}-{size}.webp"
+
+def _pool() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(max_workers=settings.AVATAR_WORKERS)
+    return _executor
+
+def make_thumbnails(source_path: str, digest: str, directory: str):
+    """Runs in a worker process: square-crop the image and write every size as WebP"""
+    from PIL import Image, ImageOps
+
+    Image.MAX_IMAGE_PIXELS = MAX_PIXELS
+    try:
+        with Image.open(source_path) as image:
+            image = ImageOps.exif_transpose(image)
+            image = image.convert("RGBA" if image.mode in ("RGBA", "LA", "P") else "RGB")
+    except (OSError, Image.DecompressionBombError):
+        raise AvatarError("Not a usable image") from None
+    side = min(image.size)
+    image = ImageOps.fit(image, (side, side), method=Image.Resampling.LANCZOS)
+    for size in AVATAR_SIZES:
+        path = os.path.join(directory, f"{digest}-{size}.webp")
+        # Write then rename, so a concurrent request never serves a half-written file
+        with tempfile.NamedTemporaryFile(dir=directory, suffix=".tmp", delete=False) as handle:
+            image.resize((size, size), Image.Resampling.LANCZOS).save(handle, "WEBP", quality=WEBP_QUALITY, method=4)
+        os.replace(handle.name, path)
+
+async def store_avatar(upload: UploadFile) -> str:
+    """Save an uploaded avatar and return the URL of its default size"""
+    directory = avatar_directory()
+    await asyncio.to_thread(os.makedirs, directory, exist_ok=True)
+    digest = hashlib.sha256()
+    received = 0
+    handle = await asyncio.to_thread(tempfile.NamedTemporaryFile, dir=directory, suffix=".upload", delete=False)
+    try:
+        while chunk := await upload.read(CHUNK_SIZE):
+            received += len(chunk)
+            if received > settings.AVATAR_MAX_BYTES:
+                raise AvatarTooLarge(_too_large_message())
+            digest.update(chunk)
+            await asyncio.to_thread(handle.write, chunk)
+        await asyncio.to_thread(handle.close)
+        if not received:
+            raise AvatarError("Empty upload")
+
+        name = digest.hexdigest()
+        last_size = os.path.join(directory, f"{name}-{AVATAR_SIZES[-1]}.webp")
+        # Thumbnails are renamed into place smallest first, so the largest existing means all do
+        if not await asyncio.to_thread(os.path.exists, last_size):
+            await asyncio.get_running_loop().run_in_executor(_pool(), make_thumbnails, handle.name, name, directory)
+        return avatar_url(name)
+    finally:
+        handle.close()
+        await asyncio.to_thread(_remove, handle.name)
+
+def _remove(path: str):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+class AvatarUploadLimit:
+    """ASGI middleware: caps the request body of the avatar upload routes before the form is parsed.
+
+    A Content-Length over the cap gets a 413 without the body being read; a body that runs past
+    it anyway (chunked, or a lying header) is cut off there, and the parser's error becomes the 413.
+    """
+
+    def __init__(self, app, paths=("/profile/edit",), max_bytes: int = settings.AVATAR_MAX_BYTES + FORM_OVERHEAD_BYTES):
+        self.app = app
+        self.paths = set(paths)
+        self.max_bytes = max_bytes
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "POST" or scope["path"] not in self.paths:
+            await self.app(scope, receive, send)
+            return
+        try:
+            declared = int(Headers(scope=scope).get("content-length", 0))
+        except ValueError:
+            declared = 0
+        if declared > self.max_bytes:
+            await JSONResponse({"detail": _too_large_message()}, status_code=413)(scope, receive, send)
+            return
+        received = 0
+
+        async def receive_limited():
+            nonlocal received
+            message = await receive()
+            received += len(message.get("body", b""))
+            if received > self.max_bytes:
+                # FastAPI re-raises an HTTPException from reading the body instead of turning it into a 400
+                raise HTTPException(status_code=413, detail=_too_large_message())
+            return message
+
+        await self.app(scope, receive_limited, send)
@@ -0,0 +1,136 @@
+"""
+Response compression
+Compresses text-like responses of at least COMPRESSION_MIN_BYTES with brotli
+when the client accepts it and the brotli package is installed, gzip otherwise.
+Streamed bodies are compressed chunk by chunk and flushed per chunk, so
+nothing is held back; server-sent events, responses that already carry a
+Content-Encoding (the precompressed /assets) and anything but a full 200 body
+(304s, 206 partial content) pass through untouched.
+"""
+import zlib
+from typing import Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+
+from config import settings
+from core.metrics import registry
+from core.staticfiles import accepted_encodings
+
+try:
+    import brotli
+except ImportError:  # gzip only
+    brotli = None
+
+COMPRESSIBLE_TYPES = ("text/", "application/json", "application/javascript", "application/xml", "image/svg+xml")
+UNCOMPRESSED_TYPES = ("text/event-stream",)
+# Dynamic responses: fast settings, most of the gain of the slow ones
+GZIP_LEVEL = 5
+BROTLI_QUALITY = 4
+
+BYTES_IN = registry.counter("http_compressed_bytes_in_total", "Response bytes before compression")
+BYTES_OUT = registry.counter("http_compressed_bytes_out_total", "Response bytes after compression")
+
+class _Gzip:
+    def __init__(self):
+        self._compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, data: bytes, final: bool) -> bytes:
+        return self._compressor.compress(data) + self._compressor.flush(zlib.Z_FINISH if final else zlib.Z_SYNC_FLUSH)
+
+class _Brotli:
+    def __init__(self):
+        self._compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+
+    def compress(self, data: bytes, final: bool) -> bytes:
+        out = self._compressor.process(data)
+        return out + (self._compressor.finish() if final else self._compressor.flush())
+
+def _choose_encoding(accept_encoding: str) -> Optional[str]:
+    accepted = accepted_encodings(accept_encoding)
+    if brotli is not None and "br" in accepted:
+        return "br"
+    if "gzip" in accepted:
+        return "gzip"
+    return None
+
+def _compressible(headers: Headers) -> bool:
+    if "content-encoding" in headers:
+        return False
+    content_type = headers.get("content-type", "").lower()
+    if content_type.startswith(UNCOMPRESSED_TYPES):
+        return False
+    return content_type.startswith(COMPRESSIBLE_TYPES)
+
+class CompressionMiddleware:
+    """ASGI middleware: brotli/gzip for text, HTML and JSON responses over the size threshold"""
+
+    def __init__(self, app, minimum_size: int = settings.COMPRESSION_MIN_BYTES):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = _choose_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+        compressor = None
+        passthrough = False
+
+        async def send_compressed(message):
+            nonlocal start_message, compressor, passthrough
+            if passthrough:
+                await send(message)
+                return
+            if message["type"] == "http.response.start":
+                # Held back until the first body chunk shows whether the response is worth compressing
+                start_message = message
+                headers = Headers(raw=message["headers"])
+                # Only full 200 bodies: a 206 slice (or anything else with Content-Range) must reach the client as is
+                if message["status"] != 200 or "content-range" in headers or not _compressible(headers):
+                    passthrough = True
+                    await send(message)
+                return
+            if message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if compressor is None:
+                if not more_body and len(body) < self.minimum_size:
+                    passthrough = True
+                    await send(start_message)
+                    await send(message)
+                    return
+                compressor = _Brotli() if encoding == "br" else _Gzip()
+                headers = MutableHeaders(scope=start_message)
+                headers["Content-Encoding"] = encoding
+                headers.add_vary_header("Accept-Encoding")
+                # Validators name the uncompressed bytes; a weak ETag stays true for any encoding of them
+                etag = headers.get("etag")
+                if etag and not etag.startswith("W/"):
+                    headers["ETag"] = f"W/{etag}"
+                if not more_body:
+                    compressed = compressor.compress(body, final=True)
+                    headers["Content-Length"] = str(len(compressed))
+                    self._count(body, compressed)
+                    await send(start_message)
+                    await send({"type": "http.response.body", "body": compressed})
+                    return
+                del headers["Content-Length"]
+                await send(start_message)
+            compressed = compressor.compress(body, final=not more_body)
+            self._count(body, compressed)
+            await send({"type": "http.response.body", "body": compressed, "more_body": more_body})
+
+        await self.app(scope, receive, send_compressed)
+
+    @staticmethod
+    def _count(body: bytes, compressed: bytes):
+        BYTES_IN.inc(len(body))
+        BYTES_OUT.inc(len(compressed))
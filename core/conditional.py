@@ -0,0 +1,42 @@
+"""
+Conditional GET for JSON endpoints
+A handler computes a version marker for the resource first (counts, max ids and
+the like: one or two aggregate queries) and turns it into an ETag. When the
+client's If-None-Match still names that version the handler answers 304 before
+loading or serialising anything, so polling an unchanged thread costs one small
+query and no body.
+"""
+import hashlib
+import time
+
+from starlette.requests import Request
+from starlette.responses import Response
+
+# Clients may store the response but must revalidate before reusing it; private because of liked state
+REVALIDATE_CACHE_CONTROL = "private, no-cache"
+# Payloads carry relative times ("5 minutes ago"), which change without the data changing
+RELATIVE_TIME_RESOLUTION_SECONDS = 60
+
+def make_etag(*parts) -> str:
+    """Weak ETag over the version marker: the compression middleware may re-encode the body"""
+    digest = hashlib.sha1(repr(parts).encode()).hexdigest()[:20]
+    return f'W/"{digest}"'
+
+def relative_time_bucket() -> int:
+    return int(time.time() // RELATIVE_TIME_RESOLUTION_SECONDS)
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """If-None-Match uses weak comparison, so W/ prefixes are ignored on both sides"""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(candidate.strip().removeprefix("W/") == opaque for candidate in header.split(","))
+
+def etag_headers(etag: str) -> dict:
+    return {"ETag": etag, "Cache-Control": REVALIDATE_CACHE_CONTROL}
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers=etag_headers(etag))
@@ -1,16 +1,234 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, scoped_session
+import contextvars
+import logging
+import time
+import traceback
+from typing import Optional, Set
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url, URL
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy.orm import sessionmaker, Session
+from sqlalchemy.pool import QueuePool, AsyncAdaptedQueuePool
 from config import settings
+from core.metrics import registry
+from core.replicas import ReplicaRouter, RoutingSessionMixin, install_write_tracking
 from models import Base  # Import Base from models package
 
+logger = logging.getLogger(__name__)
+
 SQLALCHEMY_DATABASE_URL = settings.DATABASE_URL
 
-engine = create_engine(SQLALCHEMY_DATABASE_URL, pool_pre_ping=True)
-SessionLocal = scoped_session(sessionmaker(autocommit=False, autoflush=False, bind=engine))
+POOL_CHECKOUT_WAIT = registry.histogram("db_pool_checkout_wait_seconds", "Time spent waiting for a pooled connection")
+POOL_CONNECTION_HOLD = registry.histogram("db_pool_connection_hold_seconds", "Time a connection stayed checked out")
+POOL_OVERFLOW_EVENTS = registry.counter("db_pool_overflow_total", "Connections opened beyond pool_size")
+POOL_TIMEOUTS = registry.counter("db_pool_timeouts_total", "Checkouts that gave up after DB_POOL_TIMEOUT")
+POOL_IN_USE = registry.gauge("db_pool_connections_in_use", "Connections currently checked out")
+POOL_SIZE = registry.gauge("db_pool_size", "Configured pool size")
+SESSION_LEAKS = registry.counter("db_session_leaks_total", "Sessions still open when their request finished")
+
+class _InstrumentedPoolMixin:
+    """Times every checkout and counts overflow connections and pool timeouts"""
+    pool_label = "sync"
+
+    def _do_get(self):
+        overflow_before = self.overflow()
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except PoolTimeoutError:
+            POOL_TIMEOUTS.inc(pool=self.pool_label)
+            raise
+        finally:
+            POOL_CHECKOUT_WAIT.observe(time.perf_counter() - started, pool=self.pool_label)
+        if self.overflow() > overflow_before and self.overflow() > 0:
+            POOL_OVERFLOW_EVENTS.inc(pool=self.pool_label)
+        return connection
+
+class InstrumentedQueuePool(_InstrumentedPoolMixin, QueuePool):
+    pool_label = "sync"
+
+class InstrumentedAsyncPool(_InstrumentedPoolMixin, AsyncAdaptedQueuePool):
+    pool_label = "async"
+
+def _caller_stack(limit: int = 8) -> str:
+    """Application frames of the current stack, innermost last (SQLAlchemy internals skipped)"""
+    frames = [frame for frame in traceback.extract_stack()[:-2] if "sqlalchemy" not in frame.filename]
+    return "".join(traceback.format_list(frames[-limit:]))
+
+def _pool_options(url: URL, poolclass) -> dict:
+    """Pool sizing from settings; in-memory SQLite keeps its single-connection pool"""
+    if url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:"):
+        return {}
+    return {
+        "poolclass": poolclass,
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+    }
+
+def _instrument_engine(sync_engine, label: str):
+    pool = sync_engine.pool
+    if not isinstance(pool, _InstrumentedPoolMixin):
+        return
+    POOL_IN_USE.set_function(pool.checkedout, pool=label)
+    POOL_SIZE.set_function(pool.size, pool=label)
+
+    @event.listens_for(sync_engine, "checkout")
+    def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+        connection_record.info["checked_out_at"] = time.perf_counter()
+        if settings.DB_DEBUG_SESSIONS:
+            connection_record.info["checkout_stack"] = _caller_stack()
+
+    @event.listens_for(sync_engine, "checkin")
+    def _on_checkin(dbapi_connection, connection_record):
+        checked_out_at = connection_record.info.pop("checked_out_at", None)
+        stack = connection_record.info.pop("checkout_stack", None)
+        if checked_out_at is None:
+            return
+        held = time.perf_counter() - checked_out_at
+        POOL_CONNECTION_HOLD.observe(held, pool=label)
+        if stack and held > settings.DB_CONNECTION_HOLD_WARN_SECONDS:
+            logger.warning(f"Connection held for {held:.2f}s, checked out at:\n{stack}")
+
+def to_async_url(url: str) -> URL:
+    """Swap the sync DBAPI in DATABASE_URL for its asyncio driver"""
+    parsed = make_url(url)
+    if parsed.get_backend_name() == "postgresql":
+        return parsed.set(drivername="postgresql+asyncpg")
+    if parsed.get_backend_name() == "sqlite":
+        return parsed.set(drivername="sqlite+aiosqlite")
+    return parsed
+
+def _make_engine(url: str, label: str):
+    new_engine = create_engine(url, pool_pre_ping=True, **_pool_options(make_url(url), InstrumentedQueuePool))
+    _instrument_engine(new_engine, label)
+    return new_engine
+
+def _make_async_engine(url: str, label: str):
+    async_url = to_async_url(url)
+    new_engine = create_async_engine(async_url, pool_pre_ping=True, **_pool_options(async_url, InstrumentedAsyncPool))
+    _instrument_engine(new_engine.sync_engine, label)
+    return new_engine
+
+engine = _make_engine(SQLALCHEMY_DATABASE_URL, "sync")
+
+# Optional read replicas; each gets a sync and an async engine like the primary
+REPLICA_URLS = [url.strip() for url in settings.DATABASE_REPLICA_URLS.split(",") if url.strip()]
+replica_router = ReplicaRouter(
+    [_make_engine(url, f"replica{index}") for index, url in enumerate(REPLICA_URLS)],
+    [_make_async_engine(url, f"replica{index}_async").sync_engine for index, url in enumerate(REPLICA_URLS)]
+)
+
+# Sessions opened while serving the current request; the request scope closes any left open
+_request_sessions: contextvars.ContextVar[Optional[Set["TrackedSession"]]] = contextvars.ContextVar(
+    "request_sessions", default=None
+)
+
+class TrackedSession(Session):
+    """Session that registers with the enclosing request scope while it holds a connection"""
+    _scope: Optional[Set["TrackedSession"]] = None
+    _opened_at: float = 0.0
+    _origin: Optional[str] = None
+
+    def close(self):
+        if self._scope is not None:
+            self._scope.discard(self)
+            self._scope = None
+        super().close()
+
+@event.listens_for(TrackedSession, "after_begin")
+def _track_session(session, transaction, connection):
+    # Registered on begin rather than construction: a closed session that is used
+    # again silently checks out a fresh connection
+    scope = _request_sessions.get()
+    if scope is None or session in scope:
+        return
+    session._scope = scope
+    session._opened_at = time.perf_counter()
+    session._origin = _caller_stack() if settings.DB_DEBUG_SESSIONS else None
+    scope.add(session)
+
+class RoutingSession(RoutingSessionMixin, TrackedSession):
+    router = replica_router if replica_router.enabled else None
+
+class AsyncRoutingSession(RoutingSessionMixin, Session):
+    router = replica_router if replica_router.enabled else None
+    use_async_engines = True
+
+install_write_tracking(RoutingSession)
+install_write_tracking(AsyncRoutingSession)
+
+SessionLocal = sessionmaker(class_=RoutingSession, autocommit=False, autoflush=False, bind=engine)
 
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
-        db.close() 
\ No newline at end of file
+        db.close()
+
+class RequestSessionScope:
+    """ASGI middleware: every session opened during a request is closed when the response is done.
+
+    Leaked sessions (e.g. an unclosed get_db() generator) are counted and, with
+    DB_DEBUG_SESSIONS, logged with the stack that opened them.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        sessions: Set[TrackedSession] = set()
+        token = _request_sessions.set(sessions)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _request_sessions.reset(token)
+            for session in list(sessions):
+                SESSION_LEAKS.inc()
+                if settings.DB_DEBUG_SESSIONS:
+                    age = time.perf_counter() - session._opened_at
+                    logger.warning(
+                        f"Session outlived request {scope.get('method')} {scope.get('path')} "
+                        f"(open {age:.2f}s), opened at:\n{session._origin}"
+                    )
+                session.close()
+
+# Non-blocking engine for async route handlers; same database, asyncio driver
+async_engine = _make_async_engine(SQLALCHEMY_DATABASE_URL, "async")
+AsyncSessionLocal = async_sessionmaker(
+    async_engine, sync_session_class=AsyncRoutingSession, autoflush=False, expire_on_commit=False
+)
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+def check_replica_lag():
+    """Scheduled job: drop lagging replicas from rotation so reads fall back to the primary"""
+    replica_router.check_lag(settings.REPLICA_MAX_LAG_SECONDS)
+
+def upsert_insert(db: Session):
+    """The dialect's insert() construct, which supports ON CONFLICT clauses"""
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        raise NotImplementedError(f"ON CONFLICT is not supported on {dialect}")
+    return insert
+
+def insert_ignore(db: Session, model, **values) -> bool:
+    """INSERT ... ON CONFLICT DO NOTHING against the model's unique constraints.
+
+    Returns True when a row was actually inserted.
+    """
+    insert = upsert_insert(db)
+    result = db.execute(insert(model).values(**values).on_conflict_do_nothing())
+    return result.rowcount == 1
@@ -0,0 +1,144 @@
+"""
+Pub/sub event bus for real-time pushes
+In-process fan-out on a single node, Redis pub/sub across nodes when REDIS_URL is set
+"""
+import asyncio
+import json
+import logging
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Set
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+REDIS_CHANNEL = "yegnaconnect:events"
+MAX_PENDING_PER_CONNECTION = 500
+
+class Subscription:
+    """Per-connection buffer that coalesces deltas for the same (type, id)"""
+
+    def __init__(self):
+        self._pending: "OrderedDict[tuple, Dict[str, Any]]" = OrderedDict()
+        self._ready = asyncio.Event()
+
+    def push(self, event: Dict[str, Any]):
+        key = (event.get("type"), event.get("id"))
+        if key in self._pending:
+            # Events carry absolute values, so the newest one wins
+            self._pending[key].update(event)
+            self._pending.move_to_end(key)
+        else:
+            self._pending[key] = dict(event)
+            if len(self._pending) > MAX_PENDING_PER_CONNECTION:
+                # Slow consumer: drop the oldest deltas rather than growing without bound
+                self._pending.popitem(last=False)
+        self._ready.set()
+
+    async def wait(self, timeout: float) -> bool:
+        """Wait until at least one event is pending"""
+        try:
+            await asyncio.wait_for(self._ready.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    def drain(self) -> List[Dict[str, Any]]:
+        events = list(self._pending.values())
+        self._pending.clear()
+        self._ready.clear()
+        return events
+
+class EventBus:
+    """In-process bus; publish() is safe to call from worker threads"""
+
+    def __init__(self):
+        self._subscribers: Set[Subscription] = set()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    async def start(self):
+        self._loop = asyncio.get_running_loop()
+
+    async def stop(self):
+        self._loop = None
+
+    def subscribe(self) -> Subscription:
+        subscription = Subscription()
+        self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        self._subscribers.discard(subscription)
+
+    @property
+    def connection_count(self) -> int:
+        return len(self._subscribers)
+
+    def publish(self, event: Dict[str, Any]):
+        """Fire-and-forget; silently dropped when the bus is not running (scripts, jobs)"""
+        if self._loop is None:
+            return
+        self._loop.call_soon_threadsafe(self._deliver, event)
+
+    def _deliver(self, event: Dict[str, Any]):
+        self._dispatch(event)
+
+    def _dispatch(self, event: Dict[str, Any]):
+        for subscription in list(self._subscribers):
+            subscription.push(event)
+
+class RedisEventBus(EventBus):
+    """Fans events out through Redis so every node's subscribers see every write"""
+
+    def __init__(self, redis_url: str):
+        super().__init__()
+        self.redis_url = redis_url
+        self._redis = None
+        self._listener: Optional[asyncio.Task] = None
+
+    async def start(self):
+        import redis.asyncio as redis
+
+        await super().start()
+        self._redis = redis.from_url(self.redis_url)
+        pubsub = self._redis.pubsub()
+        await pubsub.subscribe(REDIS_CHANNEL)
+        self._listener = asyncio.create_task(self._listen(pubsub))
+
+    async def stop(self):
+        if self._listener:
+            self._listener.cancel()
+            await asyncio.gather(self._listener, return_exceptions=True)
+        if self._redis:
+            await self._redis.close()
+        await super().stop()
+
+    def _deliver(self, event: Dict[str, Any]):
+        # Local subscribers receive the event back through the Redis subscription
+        asyncio.ensure_future(self._publish_remote(event))
+
+    async def _publish_remote(self, event: Dict[str, Any]):
+        try:
+            await self._redis.publish(REDIS_CHANNEL, json.dumps(event))
+        except Exception as e:
+            logger.error(f"Event publish failed: {str(e)}")
+            self._dispatch(event)
+
+    async def _listen(self, pubsub):
+        while True:
+            try:
+                async for message in pubsub.listen():
+                    if message.get("type") == "message":
+                        self._dispatch(json.loads(message["data"]))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Event listener error: {str(e)}")
+                await asyncio.sleep(1)
+
+def create_event_bus() -> EventBus:
+    if settings.REDIS_URL:
+        return RedisEventBus(settings.REDIS_URL)
+    return EventBus()
+
+event_bus = create_event_bus()
@@ -0,0 +1,159 @@
+"""
+Compact in-memory follow graph for friends-of-friends suggestions
+Adjacency is kept CSR-style: the followed ids of every user sit in one sorted int32
+array, sliced by an int64 offset array indexed by user id, so an edge costs four
+bytes. Follows and unfollows since the last compaction live in per-user overlay rows
+that shadow the CSR slice; once there are enough of them they are folded back in.
+"""
+import threading
+from typing import Dict, Iterable, List, Tuple
+
+import numpy as np
+
+# Overlay rows kept before they are folded back into the CSR arrays
+COMPACT_AFTER = 10000
+LOAD_CHUNK_SIZE = 100000
+
+_EMPTY = np.zeros(0, dtype=np.int32)
+
+def _csr(followers: np.ndarray, followed: np.ndarray, size: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Offsets and per-row sorted targets for an edge list"""
+    order = np.lexsort((followed, followers))
+    indptr = np.zeros(size + 1, dtype=np.int64)
+    np.cumsum(np.bincount(followers, minlength=size), out=indptr[1:])
+    return indptr, followed[order].astype(np.int32)
+
+def _gather(indptr: np.ndarray, indices: np.ndarray, rows: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Concatenated CSR rows and their lengths, without a Python loop over rows"""
+    starts = indptr[rows]
+    lengths = indptr[rows + 1] - starts
+    # Position of every gathered element: its row start plus its offset within the row
+    offsets = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+    return indices[np.repeat(starts, lengths) + offsets], lengths
+
+class FollowGraph:
+    """Thread-safe; rows are never modified in place, so readers can work on a snapshot"""
+
+    def __init__(self, compact_after: int = COMPACT_AFTER):
+        self.compact_after = compact_after
+        self._lock = threading.Lock()
+        self._indptr = np.zeros(1, dtype=np.int64)
+        self._indices = _EMPTY
+        self._overlay: Dict[int, np.ndarray] = {}
+        self.max_edge_id = 0
+
+    @property
+    def edge_count(self) -> int:
+        with self._lock:
+            overlaid = sum(self._base_length(user_id) for user_id in self._overlay)
+            return len(self._indices) - overlaid + sum(len(row) for row in self._overlay.values())
+
+    @property
+    def nbytes(self) -> int:
+        with self._lock:
+            return self._indptr.nbytes + self._indices.nbytes + sum(row.nbytes for row in self._overlay.values())
+
+    def _base_length(self, user_id: int) -> int:
+        if user_id >= len(self._indptr) - 1:
+            return 0
+        return int(self._indptr[user_id + 1] - self._indptr[user_id])
+
+    def _row(self, user_id: int) -> np.ndarray:
+        row = self._overlay.get(user_id)
+        if row is not None:
+            return row
+        if user_id >= len(self._indptr) - 1:
+            return _EMPTY
+        return self._indices[self._indptr[user_id]:self._indptr[user_id + 1]]
+
+    def following(self, user_id: int) -> np.ndarray:
+        with self._lock:
+            return self._row(user_id)
+
+    def replace_all(self, edges: Iterable[Tuple[int, int, int]]):
+        """Rebuild from (edge_id, follower_id, followed_id) rows and swap in atomically"""
+        followers, followed, max_edge_id = [], [], 0
+        iterator = iter(edges)
+        while True:
+            chunk = [row for _, row in zip(range(LOAD_CHUNK_SIZE), iterator)]
+            if not chunk:
+                break
+            block = np.array(chunk, dtype=np.int64)
+            max_edge_id = max(max_edge_id, int(block[:, 0].max()))
+            followers.append(block[:, 1])
+            followed.append(block[:, 2])
+        sources = np.concatenate(followers) if followers else np.zeros(0, dtype=np.int64)
+        targets = np.concatenate(followed) if followed else np.zeros(0, dtype=np.int64)
+        size = int(max(sources.max(initial=-1), targets.max(initial=-1))) + 1
+        indptr, indices = _csr(sources, targets, size)
+        with self._lock:
+            self._indptr, self._indices, self._overlay = indptr, indices, {}
+            self.max_edge_id = max_edge_id
+
+    def add(self, follower_id: int, followed_id: int, edge_id: int = 0):
+        with self._lock:
+            self.max_edge_id = max(self.max_edge_id, edge_id)
+            row = self._row(follower_id)
+            position = int(np.searchsorted(row, followed_id))
+            if position < len(row) and row[position] == followed_id:
+                return
+            self._overlay[follower_id] = np.insert(row, position, followed_id).astype(np.int32)
+            self._maybe_compact()
+
+    def remove(self, follower_id: int, followed_id: int):
+        with self._lock:
+            row = self._row(follower_id)
+            position = int(np.searchsorted(row, followed_id))
+            if position == len(row) or row[position] != followed_id:
+                return
+            self._overlay[follower_id] = np.delete(row, position)
+            self._maybe_compact()
+
+    def _maybe_compact(self):
+        if len(self._overlay) < self.compact_after:
+            return
+        size = max(len(self._indptr) - 1, max(self._overlay) + 1,
+                   max((int(row.max()) + 1 for row in self._overlay.values() if len(row)), default=0))
+        sources = np.repeat(np.arange(len(self._indptr) - 1, dtype=np.int64), np.diff(self._indptr))
+        keep = ~np.isin(sources, np.fromiter(self._overlay, dtype=np.int64, count=len(self._overlay)))
+        overlay_sources = np.concatenate([np.full(len(row), user_id, dtype=np.int64) for user_id, row in self._overlay.items()])
+        overlay_targets = np.concatenate(list(self._overlay.values())).astype(np.int64)
+        self._indptr, self._indices = _csr(
+            np.concatenate([sources[keep], overlay_sources]),
+            np.concatenate([self._indices[keep].astype(np.int64), overlay_targets]),
+            size
+        )
+        self._overlay = {}
+
+    def suggest(self, user_id: int, limit: int) -> List[Tuple[int, float, int]]:
+        """Up to `limit` (user_id, score, mutual count) for accounts followed by the ones `user_id` follows.
+
+        Each path through a followed account counts 1 / log(2 + its out-degree)
+        (Adamic-Adar): someone who follows few people is a stronger signal.
+        """
+        with self._lock:
+            indptr, indices, overlay = self._indptr, self._indices, dict(self._overlay)
+            followed = self._row(user_id)
+        if not len(followed):
+            return []
+
+        overlaid = np.isin(followed, np.fromiter(overlay, dtype=np.int64, count=len(overlay)))
+        in_base = ~overlaid & (followed < len(indptr) - 1)
+        candidates, lengths = _gather(indptr, indices, followed[in_base].astype(np.int64))
+        candidate_parts, length_parts = [candidates], [lengths]
+        for friend in followed[overlaid].tolist():
+            candidate_parts.append(overlay[friend])
+            length_parts.append(np.array([len(overlay[friend])], dtype=np.int64))
+        candidates = np.concatenate(candidate_parts)
+        lengths = np.concatenate(length_parts)
+        weights = np.repeat(1 / np.log(2 + lengths), lengths)
+
+        keep = (candidates != user_id) & ~np.isin(candidates, followed)
+        ids, inverse = np.unique(candidates[keep], return_inverse=True)
+        if not len(ids):
+            return []
+        scores = np.bincount(inverse, weights=weights[keep], minlength=len(ids))
+        mutuals = np.bincount(inverse, minlength=len(ids))
+        top = np.argpartition(-scores, limit - 1)[:limit] if len(ids) > limit else np.arange(len(ids))
+        top = top[np.lexsort((ids[top], -scores[top]))]
+        return [(int(ids[i]), float(scores[i]), int(mutuals[i])) for i in top]
@@ -0,0 +1,184 @@
+"""
+In-process full-text index for databases without native full-text search
+Lucene-style segments: new documents go to a small in-memory buffer that is sealed
+into an immutable segment when full; deletes are tombstones purged when segments
+merge. Queries match all terms and rank by BM25 times a recency boost.
+"""
+import heapq
+import math
+import re
+import threading
+from datetime import datetime, timezone
+from typing import Collection, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+SEGMENT_SIZE = 1000
+MAX_SEGMENTS = 16
+
+_TOKEN = re.compile(r"\w+", re.UNICODE)
+
+def tokenize(text: str) -> List[str]:
+    return _TOKEN.findall(text.lower())
+
+def to_timestamp(value: Optional[datetime]) -> float:
+    """SQLite hands back naive UTC datetimes; treat them as UTC"""
+    if value is None:
+        return 0.0
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+def recency_boost(age_seconds: float, weight: float, half_life_hours: float) -> float:
+    """1 for old documents, up to 1 + weight for brand new ones, halving every half_life_hours"""
+    return 1 + weight * 0.5 ** (max(age_seconds, 0) / 3600 / half_life_hours)
+
+class DocInfo(NamedTuple):
+    length: int
+    created_at: float
+    user_id: int
+    category_id: Optional[int]
+    # Posts: the post itself; comments: the post they belong to
+    post_id: int
+
+class Segment:
+    """Immutable term -> [(doc_id, term frequency)] postings"""
+    __slots__ = ("postings", "doc_ids")
+
+    def __init__(self, postings: Dict[str, List[Tuple[int, int]]], doc_ids: set):
+        self.postings = postings
+        self.doc_ids = doc_ids
+
+class SegmentedIndex:
+    """Thread-safe; documents are immutable, so adding an id that is already indexed is a no-op"""
+
+    def __init__(self, segment_size: int = SEGMENT_SIZE, max_segments: int = MAX_SEGMENTS):
+        self.segment_size = segment_size
+        self.max_segments = max_segments
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self.segments: List[Segment] = []
+        self.buffer: Dict[str, List[Tuple[int, int]]] = {}
+        self.buffered_ids: set = set()
+        self.docs: Dict[int, DocInfo] = {}
+        self.total_length = 0
+        self.max_id = 0
+
+    def __len__(self) -> int:
+        return len(self.docs)
+
+    def add(self, doc_id: int, text: str, created_at: Optional[datetime], user_id: int,
+            category_id: Optional[int], post_id: int):
+        tokens = tokenize(text)
+        frequencies: Dict[str, int] = {}
+        for token in tokens:
+            frequencies[token] = frequencies.get(token, 0) + 1
+        with self._lock:
+            if doc_id in self.docs:
+                return
+            self.docs[doc_id] = DocInfo(len(tokens), to_timestamp(created_at), user_id, category_id, post_id)
+            self.total_length += len(tokens)
+            self.max_id = max(self.max_id, doc_id)
+            for term, frequency in frequencies.items():
+                self.buffer.setdefault(term, []).append((doc_id, frequency))
+            self.buffered_ids.add(doc_id)
+            if len(self.buffered_ids) >= self.segment_size:
+                self._seal()
+
+    def replace_all(self, rows: Iterable[Tuple]):
+        """Rebuild from rows of add() arguments and swap in atomically"""
+        fresh = SegmentedIndex(self.segment_size, self.max_segments)
+        for row in rows:
+            fresh.add(*row)
+        if fresh.buffered_ids:
+            fresh._seal()
+        with self._lock:
+            self.segments, self.buffer, self.buffered_ids = fresh.segments, fresh.buffer, fresh.buffered_ids
+            self.docs, self.total_length, self.max_id = fresh.docs, fresh.total_length, fresh.max_id
+
+    def remove(self, doc_id: int):
+        """Tombstone: postings stay until the next merge but are skipped by queries"""
+        with self._lock:
+            info = self.docs.pop(doc_id, None)
+            if info is not None:
+                self.total_length -= info.length
+
+    def remove_where(self, post_id: int):
+        """Drop every document belonging to a post (comments of a deleted post)"""
+        with self._lock:
+            for doc_id in [doc_id for doc_id, info in self.docs.items() if info.post_id == post_id]:
+                self.total_length -= self.docs.pop(doc_id).length
+
+    def _seal(self):
+        self.segments.append(Segment(self.buffer, self.buffered_ids))
+        self.buffer, self.buffered_ids = {}, set()
+        if len(self.segments) > self.max_segments:
+            self._merge()
+
+    def _merge(self):
+        """Fold all segments into one, dropping postings of deleted documents"""
+        merged: Dict[str, List[Tuple[int, int]]] = {}
+        for segment in self.segments:
+            for term, postings in segment.postings.items():
+                live = [posting for posting in postings if posting[0] in self.docs]
+                if live:
+                    merged.setdefault(term, []).extend(live)
+        self.segments = [Segment(merged, {doc_id for segment in self.segments for doc_id in segment.doc_ids if doc_id in self.docs})]
+
+    def search(self, query: str, limit: int, now: datetime, recency_weight: float, half_life_hours: float,
+               user_id: Optional[int] = None, category_id: Optional[int] = None,
+               after: Optional[Tuple[float, int]] = None,
+               hidden_category_ids: Collection[int] = ()) -> List[Tuple[float, int]]:
+        """Up to `limit` (score, doc_id) pairs matching every query term, best first.
+
+        `after` is the (score, doc_id) of the last result on the previous page; documents in
+        `hidden_category_ids` are skipped before ranking, so pages stay full.
+        """
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms:
+            return []
+        with self._lock:
+            docs = self.docs
+            live_count = len(docs)
+            if not live_count:
+                return []
+            average_length = self.total_length / live_count
+            term_postings = []
+            for term in terms:
+                postings = [posting for segment in self.segments for posting in segment.postings.get(term, ())]
+                postings.extend(self.buffer.get(term, ()))
+                term_postings.append([posting for posting in postings if posting[0] in docs])
+            infos = {}
+            # Rarest term first: it bounds the candidate set
+            term_postings.sort(key=len)
+            candidates = None
+            for postings in term_postings:
+                ids = {doc_id for doc_id, _ in postings}
+                candidates = ids if candidates is None else candidates & ids
+            for doc_id in candidates:
+                info = docs[doc_id]
+                if (user_id is None or info.user_id == user_id) and (category_id is None or info.category_id == category_id) \
+                        and info.category_id not in hidden_category_ids:
+                    infos[doc_id] = info
+
+        scores: Dict[int, float] = dict.fromkeys(infos, 0.0)
+        for postings in term_postings:
+            frequency_of_docs = len(postings)
+            idf = math.log(1 + (live_count - frequency_of_docs + 0.5) / (frequency_of_docs + 0.5))
+            for doc_id, frequency in postings:
+                info = infos.get(doc_id)
+                if info is None:
+                    continue
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * info.length / average_length)
+                scores[doc_id] += idf * frequency * (BM25_K1 + 1) / (frequency + norm)
+
+        now_timestamp = now.timestamp()
+        ranked = (
+            (score * recency_boost(now_timestamp - infos[doc_id].created_at, recency_weight, half_life_hours), doc_id)
+            for doc_id, score in scores.items()
+        )
+        if after is not None:
+            ranked = (item for item in ranked if item < after)
+        return heapq.nlargest(limit, ranked)
@@ -0,0 +1,46 @@
+"""
+Opaque keyset cursors for paginated listings
+"""
+import base64
+import json
+from datetime import datetime
+from typing import Optional
+from sqlalchemy import func, tuple_
+
+def encode_cursor(*values) -> str:
+    """Encode the sort key of the last row on a page, e.g. (created_at, id)"""
+    payload = [value.isoformat() if isinstance(value, datetime) else value for value in values]
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: Optional[str], *types) -> Optional[tuple]:
+    """Decode a cursor back into typed values; raises ValueError on malformed input"""
+    if not cursor:
+        return None
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except Exception:
+        raise ValueError("Invalid cursor")
+    if not isinstance(payload, list) or len(payload) != len(types):
+        raise ValueError("Invalid cursor")
+    values = []
+    try:
+        for value, value_type in zip(payload, types):
+            if value_type is datetime:
+                values.append(datetime.fromisoformat(value))
+            else:
+                values.append(value_type(value))
+    except (TypeError, ValueError):
+        raise ValueError("Invalid cursor")
+    return tuple(values)
+
+def after_keyset(dialect_name: str, created_col, id_col, after: tuple, descending: bool = False):
+    """Row-value predicate selecting rows strictly after a (created_at, id) cursor"""
+    created_at, row_id = after
+    if dialect_name == "sqlite":
+        # SQLite keeps server-default timestamps as text without microseconds, which
+        # breaks string comparison against bound datetimes; compare as Julian days instead
+        created_col, created_at = func.julianday(created_col), func.julianday(created_at)
+    if descending:
+        return tuple_(created_col, id_col) < tuple_(created_at, row_id)
+    return tuple_(created_col, id_col) > tuple_(created_at, row_id)
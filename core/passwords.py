@@ -0,0 +1,58 @@
+"""
+Password hashing off the request threadpool
+bcrypt costs 100-300 ms of CPU per hash by design. Hashes run on a few dedicated
+threads (bcrypt releases the GIL while it works) with a cap on how many may be
+running or queued, so a login burst waits on itself instead of occupying every
+threadpool thread that sync routes need, and requests past the cap fail fast.
+"""
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional, Tuple
+
+from passlib.context import CryptContext
+
+from config import settings
+from core.metrics import registry
+
+# Hashes made with other rounds still verify; verify_and_update hands back a replacement for them
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=settings.BCRYPT_ROUNDS)
+
+HASHES_REJECTED = registry.counter("password_hash_rejected_total", "Password hashes refused because the hashing queue was full")
+
+class PasswordHasherBusy(RuntimeError):
+    """Raised when PASSWORD_HASH_MAX_PENDING hashes are already running or queued"""
+
+class PasswordHasher:
+    def __init__(self, workers: int, max_pending: int):
+        self.max_pending = max_pending
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="password-hash")
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    @property
+    def pending(self) -> int:
+        return self._pending
+
+    async def _run(self, function: Callable, *args):
+        with self._lock:
+            if self._pending >= self.max_pending:
+                HASHES_REJECTED.inc()
+                raise PasswordHasherBusy(f"{self._pending} password hashes already pending")
+            self._pending += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, function, *args)
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    async def hash(self, password: str) -> str:
+        return await self._run(pwd_context.hash, password)
+
+    async def verify(self, password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+        """Whether the password matches, plus a new hash when the stored one uses outdated parameters"""
+        return await self._run(pwd_context.verify_and_update, password, hashed_password)
+
+password_hasher = PasswordHasher(settings.PASSWORD_HASH_WORKERS, settings.PASSWORD_HASH_MAX_PENDING)
+
+registry.gauge("password_hash_pending", "Password hashes running or queued").set_function(lambda: password_hasher.pending)
@@ -0,0 +1,128 @@
+"""
+Per-request SQL accounting: query count, DB time, slowest statements and repeated shapes
+Hooks every Engine (primary, replicas, async) through cursor execute events
+"""
+import contextvars
+import logging
+import re
+import time
+from collections import Counter
+from typing import List, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.datastructures import MutableHeaders
+
+from config import settings
+from core.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+SLOWEST_KEPT = 5
+
+QUERIES_PER_REQUEST = registry.histogram(
+    "db_queries_per_request", "SQL statements executed per HTTP request",
+    buckets=(1, 2, 5, 10, 20, 50, 100, 200, 500)
+)
+DB_TIME_PER_REQUEST = registry.histogram("db_time_per_request_seconds", "Time spent in SQL per HTTP request")
+SLOW_QUERIES = registry.counter("db_slow_queries_total", "Statements slower than SLOW_QUERY_MS")
+
+class RepeatedQueryError(RuntimeError):
+    """Raised when QUERY_REPEAT_LIMIT is set and a request repeats one statement shape too often"""
+
+# Bound-parameter lists of any length, e.g. IN (?, ?, ?) or IN (%(id_1_1)s, %(id_1_2)s)
+_PARAM = r"(?:\?|%\(\w+\)s|%s|\$\d+|:\w+)"
+_PARAM_LIST = re.compile(rf"\(\s*{_PARAM}(?:\s*,\s*{_PARAM})+\s*\)")
+_WHITESPACE = re.compile(r"\s+")
+_SELECT_LIST = re.compile(r"SELECT .+? FROM ")
+
+def statement_shape(statement: str) -> str:
+    """Normalize a statement so executions differing only in IN-list length compare equal"""
+    return _PARAM_LIST.sub("(...)", _WHITESPACE.sub(" ", statement).strip())
+
+def abbreviate(shape: str, width: int = 200) -> str:
+    """Shorten a shape for logs: column lists are elided, the FROM/WHERE part is what identifies it"""
+    return _SELECT_LIST.sub("SELECT ... FROM ", shape)[:width]
+
+class QueryStats:
+    def __init__(self):
+        self.count = 0
+        self.total_time = 0.0
+        self.shapes: Counter = Counter()
+        self.slowest: List[Tuple[float, str]] = []
+
+    def record(self, statement: str, duration: float):
+        self.count += 1
+        self.total_time += duration
+        shape = statement_shape(statement)
+        self.shapes[shape] += 1
+        self.slowest.append((duration, shape))
+        self.slowest.sort(reverse=True)
+        del self.slowest[SLOWEST_KEPT:]
+        limit = settings.QUERY_REPEAT_LIMIT
+        if limit and self.shapes[shape] > limit:
+            raise RepeatedQueryError(f"Statement repeated {self.shapes[shape]} times in one request (limit {limit}): {abbreviate(shape)}")
+
+    def repeated(self, minimum: int = 2) -> List[Tuple[str, int]]:
+        return [(shape, count) for shape, count in self.shapes.most_common() if count >= minimum]
+
+_current: contextvars.ContextVar[Optional[QueryStats]] = contextvars.ContextVar("query_stats", default=None)
+
+def current_stats() -> Optional[QueryStats]:
+    return _current.get()
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    context._query_started_at = time.perf_counter()
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    duration = time.perf_counter() - context._query_started_at
+    if duration * 1000 > settings.SLOW_QUERY_MS:
+        SLOW_QUERIES.inc()
+        logger.warning(f"Slow query ({duration * 1000:.1f}ms): {abbreviate(statement_shape(statement), 1000)}")
+    stats = _current.get()
+    if stats is not None:
+        stats.record(statement, duration)
+
+class QueryStatsMiddleware:
+    """ASGI middleware: collect QueryStats per request, log over-budget requests, emit Server-Timing in DEBUG"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        stats = QueryStats()
+        token = _current.set(stats)
+        started = time.perf_counter()
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start" and settings.DEBUG:
+                elapsed = time.perf_counter() - started
+                MutableHeaders(scope=message).append(
+                    "server-timing",
+                    f'db;dur={stats.total_time * 1000:.1f};desc="{stats.count} queries", app;dur={elapsed * 1000:.1f}'
+                )
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current.reset(token)
+            QUERIES_PER_REQUEST.observe(stats.count)
+            DB_TIME_PER_REQUEST.observe(stats.total_time)
+            if stats.count > settings.QUERY_BUDGET_COUNT or stats.total_time * 1000 > settings.QUERY_BUDGET_MS:
+                self._log_over_budget(scope, stats)
+
+    @staticmethod
+    def _log_over_budget(scope, stats: QueryStats):
+        route = getattr(scope.get("route"), "path", scope.get("path"))
+        lines = [f"{scope.get('method')} {route}: {stats.count} queries, {stats.total_time * 1000:.1f}ms in DB"]
+        for shape, count in stats.repeated()[:3]:
+            lines.append(f"  repeated x{count}: {abbreviate(shape)}")
+        for duration, shape in stats.slowest[:3]:
+            lines.append(f"  slow {duration * 1000:.1f}ms: {abbreviate(shape)}")
+        logger.warning("\n".join(lines))
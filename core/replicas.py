@@ -0,0 +1,162 @@
+"""
+Read-replica routing
+Plain SELECTs go to a healthy replica; writes, locking reads and everything a session
+runs after its first write go to the primary. Replicas lagging past the configured
+limit are taken out of rotation until they catch up.
+"""
+import contextvars
+import itertools
+import logging
+import time
+from typing import Dict, List, Optional
+
+from sqlalchemy import event, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.sql import Select
+from starlette.datastructures import MutableHeaders
+from starlette.requests import HTTPConnection
+
+from core.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+STICKY_COOKIE = "db_primary_until"
+
+REPLICA_LAG = registry.gauge("db_replica_lag_seconds", "Replication lag reported by each replica")
+REPLICA_HEALTHY = registry.gauge("db_replica_healthy", "1 when the replica is serving reads")
+
+# Per-request routing state: {"sticky": read from primary, "wrote": a write happened}
+_request_state: contextvars.ContextVar[Optional[Dict[str, bool]]] = contextvars.ContextVar(
+    "replica_request_state", default=None
+)
+
+# Postgres standby lag; an idle primary has nothing to replay, which is not lag
+LAG_QUERY = text(
+    "SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+    "ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END"
+)
+
+class ReplicaRouter:
+    """Round-robin over healthy replicas; each replica has a sync and an async engine"""
+
+    def __init__(self, sync_engines: List[Engine], async_engines: List[Engine]):
+        self.sync_engines = sync_engines
+        # Sync facades of the async engines, which is what AsyncSession.get_bind must return
+        self.async_engines = async_engines
+        self.healthy = [True] * len(sync_engines)
+        self._next = itertools.count()
+        for index in range(len(sync_engines)):
+            REPLICA_HEALTHY.set(1, replica=index)
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.sync_engines)
+
+    def choose(self, use_async: bool = False) -> Optional[Engine]:
+        candidates = [index for index, healthy in enumerate(self.healthy) if healthy]
+        if not candidates:
+            return None
+        index = candidates[next(self._next) % len(candidates)]
+        return (self.async_engines if use_async else self.sync_engines)[index]
+
+    def check_lag(self, max_lag_seconds: float):
+        """Scheduled job: measure each replica and take laggards out of rotation"""
+        for index, replica in enumerate(self.sync_engines):
+            try:
+                lag = self._measure_lag(replica)
+                healthy = lag <= max_lag_seconds
+            except Exception as e:
+                logger.error(f"Replica {index} lag check failed: {str(e)}")
+                lag, healthy = float("inf"), False
+            if healthy != self.healthy[index]:
+                logger.warning(f"Replica {index} {'back in rotation' if healthy else 'removed from rotation'} (lag {lag:.1f}s)")
+            self.healthy[index] = healthy
+            REPLICA_LAG.set(lag, replica=index)
+            REPLICA_HEALTHY.set(1 if healthy else 0, replica=index)
+
+    @staticmethod
+    def _measure_lag(replica: Engine) -> float:
+        if replica.dialect.name != "postgresql":
+            return 0.0
+        with replica.connect() as connection:
+            return float(connection.execute(LAG_QUERY).scalar() or 0)
+
+class RoutingSessionMixin:
+    """Session.get_bind override; mix into a Session subclass and set `router`"""
+    router: Optional[ReplicaRouter] = None
+    use_async_engines = False
+    _pinned_to_primary = False
+
+    def get_bind(self, mapper=None, clause=None, **kw):
+        if self.router is not None and self._can_use_replica(clause):
+            replica = self.router.choose(self.use_async_engines)
+            if replica is not None:
+                return replica
+        return super().get_bind(mapper=mapper, clause=clause, **kw)
+
+    def _can_use_replica(self, clause) -> bool:
+        if self._pinned_to_primary or self._flushing:
+            return False
+        if not isinstance(clause, Select) or clause._for_update_arg is not None:
+            return False
+        state = _request_state.get()
+        return not (state and state["sticky"])
+
+    def use_primary(self):
+        """Send every later statement of this session to the primary"""
+        self._pinned_to_primary = True
+
+def _mark_write(session):
+    session._pinned_to_primary = True
+    state = _request_state.get()
+    if state is not None:
+        state["wrote"] = True
+
+def install_write_tracking(session_class):
+    """Pin a session to the primary after its first write and flag the request as a writer"""
+
+    @event.listens_for(session_class, "after_flush")
+    def _after_flush(session, flush_context):
+        _mark_write(session)
+
+    @event.listens_for(session_class, "do_orm_execute")
+    def _on_execute(orm_execute_state):
+        if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+            _mark_write(orm_execute_state.session)
+
+class ReadYourWritesMiddleware:
+    """ASGI middleware: after a client writes, route its reads to the primary for a short window.
+
+    The window is carried in a cookie so it survives redirects and follows the
+    client across workers.
+    """
+
+    def __init__(self, app, sticky_seconds: float):
+        self.app = app
+        self.sticky_seconds = sticky_seconds
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        try:
+            until = float(HTTPConnection(scope).cookies.get(STICKY_COOKIE, 0))
+        except ValueError:
+            until = 0
+        state = {"sticky": until > time.time(), "wrote": False}
+        token = _request_state.set(state)
+
+        async def send_with_cookie(message):
+            if message["type"] == "http.response.start" and state["wrote"]:
+                headers = MutableHeaders(scope=message)
+                headers.append(
+                    "set-cookie",
+                    f"{STICKY_COOKIE}={time.time() + self.sticky_seconds:.3f}; "
+                    f"Max-Age={int(self.sticky_seconds) + 1}; Path=/; HttpOnly; SameSite=Lax"
+                )
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_cookie)
+        finally:
+            _request_state.reset(token)
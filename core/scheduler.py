@@ -0,0 +1,56 @@
+"""
+Background scheduler for periodic maintenance jobs
+"""
+import asyncio
+import logging
+from typing import Callable, List, Tuple
+from starlette.concurrency import run_in_threadpool
+
+from core.database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+_jobs: List[Tuple[str, float, Callable, bool]] = []
+_tasks: List[asyncio.Task] = []
+
+def register_job(name: str, interval_seconds: float, func: Callable, run_on_start: bool = False):
+    """Register a job; sync functions run in the threadpool, coroutines on the loop"""
+    _jobs.append((name, interval_seconds, func, run_on_start))
+
+def session_job(func: Callable[..., object]) -> Callable[[], object]:
+    """Wrap a service function taking a Session so it gets its own short-lived session"""
+    def run():
+        db = SessionLocal()
+        try:
+            return func(db)
+        finally:
+            db.close()
+    return run
+
+async def _run_job(name: str, func: Callable):
+    try:
+        if asyncio.iscoroutinefunction(func):
+            await func()
+        else:
+            await run_in_threadpool(func)
+    except Exception as e:
+        logger.error(f"Scheduled job {name} failed: {str(e)}")
+
+async def _run_periodically(name: str, interval_seconds: float, func: Callable, run_on_start: bool):
+    if run_on_start:
+        await _run_job(name, func)
+    while True:
+        await asyncio.sleep(interval_seconds)
+        await _run_job(name, func)
+
+def start():
+    """Start every registered job on the running event loop"""
+    for name, interval_seconds, func, run_on_start in _jobs:
+        _tasks.append(asyncio.create_task(_run_periodically(name, interval_seconds, func, run_on_start)))
+
+async def stop():
+    """Cancel running jobs"""
+    for task in _tasks:
+        task.cancel()
+    await asyncio.gather(*_tasks, return_exceptions=True)
+    _tasks.clear()
@@ -0,0 +1,151 @@
+"""
+Static file mounts for content-addressed files
+A file whose name carries a hash of its content never changes, so browsers and
+proxies may keep it for a year without revalidating.
+
+static/ is built into STATIC_BUILD_DIR at startup (or ahead of time with
+`python -m core.staticfiles`): each file is copied under a name carrying its
+content hash, and text-like files get .gz and .br siblings so the mount can hand
+out a precompressed copy instead of compressing per request. Templates ask
+static_url() for the hashed name, so a changed file gets a new URL.
+"""
+import gzip
+import hashlib
+import mimetypes
+import os
+import stat
+import tempfile
+from typing import Dict, Optional
+
+import anyio
+from starlette.datastructures import Headers
+from starlette.responses import Response
+from starlette.staticfiles import StaticFiles
+from starlette.types import Scope
+
+from config import settings
+
+try:
+    import brotli
+except ImportError:  # gzip only
+    brotli = None
+
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+STATIC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "static")
+ASSETS_PREFIX = "/assets"
+HASH_LENGTH = 12
+# Smaller files fit in a packet either way; images other than icons are compressed already
+MIN_COMPRESS_BYTES = 256
+COMPRESSIBLE_SUFFIXES = {".css", ".js", ".mjs", ".map", ".json", ".svg", ".ico", ".txt", ".xml", ".html", ".webmanifest"}
+# Preferred first
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+
+class ImmutableStaticFiles(StaticFiles):
+    """StaticFiles for directories where a name is never reused for different content"""
+
+    def file_response(self, full_path: os.PathLike, stat_result: os.stat_result, scope: Scope, status_code: int = 200):
+        response = super().file_response(full_path, stat_result, scope, status_code)
+        response.headers["Cache-Control"] = IMMUTABLE_CACHE_CONTROL
+        return response
+
+class PrecompressedStaticFiles(ImmutableStaticFiles):
+    """Serves name.br / name.gz in place of name when the client accepts that encoding and the file exists.
+
+    Each variant keeps its own ETag (starlette derives it from the file served), so 304s never mix them up.
+    """
+
+    async def get_response(self, path: str, scope: Scope) -> Response:
+        accepted = accepted_encodings(Headers(scope=scope).get("accept-encoding", ""))
+        for encoding, suffix in ENCODINGS:
+            if encoding not in accepted:
+                continue
+            full_path, stat_result = await anyio.to_thread.run_sync(self.lookup_path, path + suffix)
+            if stat_result and stat.S_ISREG(stat_result.st_mode):
+                response = self.file_response(full_path, stat_result, scope)
+                media_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+                response.headers["Content-Type"] = f"{media_type}; charset=utf-8" if media_type.startswith("text/") else media_type
+                response.headers["Content-Encoding"] = encoding
+                response.headers["Vary"] = "Accept-Encoding"
+                return response
+        response = await super().get_response(path, scope)
+        response.headers["Vary"] = "Accept-Encoding"
+        return response
+
+def accepted_encodings(header: str) -> set:
+    accepted = set()
+    for part in header.split(","):
+        name, _, params = part.partition(";")
+        quality = params.strip().lower()
+        if quality.startswith("q=") and quality[2:].strip().rstrip("0").rstrip(".") in ("0", ""):
+            continue
+        accepted.add(name.strip().lower())
+    return accepted
+
+def _write_atomic(path: str, data: bytes):
+    # Workers build at the same time; a reader must never see a partial file
+    with tempfile.NamedTemporaryFile(dir=os.path.dirname(path), suffix=".tmp", delete=False) as handle:
+        handle.write(data)
+    os.replace(handle.name, path)
+
+def hashed_name(path: str, digest: str) -> str:
+    """css/site.css -> css/site.<hash>.css"""
+    stem, suffix = os.path.splitext(path)
+    return f"{stem}.{digest[:HASH_LENGTH]}{suffix}"
+
+class AssetManifest:
+    """Maps paths under static/ to their fingerprinted copies in the build directory"""
+
+    def __init__(self, source: str, output: str):
+        self.source = source
+        self.output = output
+        self.paths: Dict[str, str] = {}
+
+    def build(self) -> Dict[str, str]:
+        """Copy and precompress anything new; unchanged files (same hash) are skipped, so restarts are cheap"""
+        paths = {}
+        for root, _, files in os.walk(self.source):
+            for filename in files:
+                full_path = os.path.join(root, filename)
+                logical = os.path.relpath(full_path, self.source).replace(os.sep, "/")
+                with open(full_path, "rb") as handle:
+                    data = handle.read()
+                target = hashed_name(logical, hashlib.sha256(data).hexdigest())
+                self._write_variants(target, data)
+                paths[logical] = target
+        self.paths = paths
+        return paths
+
+    def _write_variants(self, target: str, data: bytes):
+        destination = os.path.join(self.output, *target.split("/"))
+        os.makedirs(os.path.dirname(destination), exist_ok=True)
+        if not os.path.exists(destination):
+            _write_atomic(destination, data)
+        if len(data) < MIN_COMPRESS_BYTES or os.path.splitext(target)[1].lower() not in COMPRESSIBLE_SUFFIXES:
+            return
+        if not os.path.exists(destination + ".gz"):
+            compressed = gzip.compress(data, compresslevel=9, mtime=0)
+            if len(compressed) < len(data):
+                _write_atomic(destination + ".gz", compressed)
+        if brotli is not None and not os.path.exists(destination + ".br"):
+            compressed = brotli.compress(data, quality=11)
+            if len(compressed) < len(data):
+                _write_atomic(destination + ".br", compressed)
+
+    def url(self, path: str) -> str:
+        """Template helper: the fingerprinted URL for a static/ path, or its plain /static URL if it isn't built"""
+        path = path.lstrip("/")
+        target: Optional[str] = self.paths.get(path)
+        if target is None:
+            return f"/static/{path}"
+        return f"{ASSETS_PREFIX}/{target}"
+
+assets = AssetManifest(STATIC_DIR, settings.STATIC_BUILD_DIR)
+
+def static_url(path: str) -> str:
+    return assets.url(path)
+
+if __name__ == "__main__":
+    # Ahead-of-time build, e.g. in a Docker image, so workers start with nothing to write
+    for logical, target in sorted(assets.build().items()):
+        print(f"{logical} -> {target}")
@@ -0,0 +1,67 @@
+"""
+Shared Jinja2 environment
+Every route module renders through this one environment, so a worker compiles
+each template once. Compiled bytecode is also written to TEMPLATE_CACHE_DIR,
+where other workers and later restarts load it instead of recompiling, and
+precompile() loads all templates at startup rather than on their first request.
+Outside DEBUG templates are not checked for changes on every render.
+
+{% cache "name", key, ... %}...{% endcache %} keeps the rendered HTML of a block
+in a shared TTLCache. The key lists the entity versions the block depends on
+(updated_at, counters, the viewer's relationship to it), so an edit produces a
+new key instead of needing explicit invalidation; superseded entries age out.
+"""
+import logging
+import os
+
+from fastapi.templating import Jinja2Templates
+from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader, nodes
+from jinja2.ext import Extension
+
+from config import settings
+from core.cache import TTLCache
+from core.staticfiles import static_url
+
+logger = logging.getLogger(__name__)
+
+TEMPLATES_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "templates")
+
+fragment_cache = TTLCache("template_fragments", settings.FRAGMENT_CACHE_SECONDS, max_entries=settings.FRAGMENT_CACHE_MAX_ENTRIES)
+
+class FragmentCacheExtension(Extension):
+    """The {% cache %} tag: the first argument names the fragment, the rest are its version key"""
+
+    tags = {"cache"}
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        key = [parser.parse_expression()]
+        while parser.stream.skip_if("comma"):
+            key.append(parser.parse_expression())
+        body = parser.parse_statements(("name:endcache",), drop_needle=True)
+        return nodes.CallBlock(self.call_method("_cached", [nodes.Tuple(key, "load")]), [], [], body).set_lineno(lineno)
+
+    def _cached(self, key: tuple, caller) -> str:
+        return fragment_cache.get_or_compute(key, caller)
+
+def _environment() -> Environment:
+    os.makedirs(settings.TEMPLATE_CACHE_DIR, exist_ok=True)
+    env = Environment(
+        loader=FileSystemLoader(TEMPLATES_DIR),
+        autoescape=True,
+        auto_reload=settings.DEBUG,
+        bytecode_cache=FileSystemBytecodeCache(settings.TEMPLATE_CACHE_DIR),
+        extensions=[FragmentCacheExtension]
+    )
+    env.globals["static_url"] = static_url
+    return env
+
+templates = Jinja2Templates(env=_environment())
+
+def precompile():
+    """Compile (or load from the bytecode cache) every template now instead of on its first request"""
+    env = templates.env
+    names = env.list_templates(extensions=["html"])
+    for name in names:
+        env.get_template(name)
+    logger.info("Loaded %d templates", len(names))
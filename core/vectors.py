@@ -0,0 +1,223 @@
+"""
+Hashed TF-IDF vectors in a memory-mapped store shared by every worker
+Text is hashed into a fixed number of signed buckets (no vocabulary to keep in sync),
+weighted by sublinear term frequency times an IDF from document frequencies kept next
+to the vectors, and L2-normalized. Rows are float16 and addressed by document id, so
+workers map the same files and share one copy through the page cache. Writers take an
+exclusive file lock; readers take none and may see a row mid-write, which only costs
+one slightly off score.
+"""
+import math
+import os
+import threading
+import zlib
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from core.fulltext import tokenize
+
+try:
+    import fcntl
+except ImportError:  # Windows: single-worker development setups only
+    fcntl = None
+
+# 1 KiB per document as float16; fewer buckets make unrelated short posts collide noticeably
+DIMENSIONS = 512
+# Files grow in steps of this many rows; unused rows are sparse on disk until written
+GROW_ROWS = 65536
+SEARCH_CHUNK_ROWS = 16384
+# Too common to say anything about a post; short texts would otherwise match on these alone
+STOPWORDS = frozenset("""
+a about after all also an and any are as at be been but by can do for from had has have he her his how i if in
+into is it its just me my no not of on or our out so than that the their them then there they this to too up us
+was we were what when which who will with would you your
+""".split())
+
+def hashed_counts(text: str, dimensions: int = DIMENSIONS) -> Dict[int, float]:
+    """Signed term counts per bucket (the sign halves the bias from hash collisions)"""
+    counts: Dict[int, int] = {}
+    for token in tokenize(text):
+        if token in STOPWORDS:
+            continue
+        counts[token] = counts.get(token, 0) + 1
+    buckets: Dict[int, float] = {}
+    for token, count in counts.items():
+        digest = zlib.crc32(token.encode())
+        bucket = digest % dimensions
+        sign = -1.0 if digest & 0x80000000 else 1.0
+        buckets[bucket] = buckets.get(bucket, 0.0) + sign * (1 + math.log(count))
+    return buckets
+
+def _first_filled(timestamps: np.ndarray, start: int, stop: int) -> Optional[int]:
+    """First non-empty row in [start, stop), or None"""
+    for chunk in range(start, stop, SEARCH_CHUNK_ROWS):
+        filled = np.flatnonzero(timestamps[chunk:min(chunk + SEARCH_CHUNK_ROWS, stop)])
+        if len(filled):
+            return chunk + int(filled[0])
+    return None
+
+def _last_filled(timestamps: np.ndarray) -> Optional[int]:
+    """Last non-empty row; the files end in up to GROW_ROWS rows nothing has been written to"""
+    for stop in range(len(timestamps), 0, -SEARCH_CHUNK_ROWS):
+        start = max(stop - SEARCH_CHUNK_ROWS, 0)
+        filled = np.flatnonzero(timestamps[start:stop])
+        if len(filled):
+            return start + int(filled[-1])
+    return None
+
+def _window_start(timestamps: np.ndarray, since: float, stop: int) -> int:
+    """Lowest row that can be newer than `since`, by binary search: ids grow with time, so the
+    filled rows' timestamps are ordered, and an empty row is judged by the next filled one"""
+    low, high = 0, stop
+    while low < high:
+        middle = (low + high) // 2
+        filled = _first_filled(timestamps, middle, high)
+        if filled is None or timestamps[filled] >= since:
+            high = middle
+        else:
+            low = filled + 1
+    return low
+
+class VectorStore:
+    """Row i holds document i; a zero timestamp marks an empty row"""
+
+    def __init__(self, directory: str, dimensions: int = DIMENSIONS):
+        self.directory = directory
+        self.dimensions = dimensions
+        self._lock = threading.Lock()
+        self._rows = 0
+        self._vectors: Optional[np.memmap] = None
+        self._timestamps: Optional[np.memmap] = None
+        self._df: Optional[np.memmap] = None
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    def _map(self):
+        """(Re)map the files at their current size; callers hold self._lock"""
+        if self._df is None:
+            os.makedirs(self.directory, exist_ok=True)
+            for name in ("vectors.f16", "timestamps.i64", "lock"):
+                open(self._path(name), "ab").close()
+            # Document frequency per bucket, then the document count
+            df_path = self._path("df.f64")
+            if not os.path.exists(df_path) or os.path.getsize(df_path) != (self.dimensions + 1) * 8:
+                np.zeros(self.dimensions + 1, dtype=np.float64).tofile(df_path)
+            self._df = np.memmap(df_path, dtype=np.float64, mode="r+", shape=(self.dimensions + 1,))
+        rows = os.path.getsize(self._path("timestamps.i64")) // 8
+        if rows and rows != self._rows:
+            self._vectors = np.memmap(self._path("vectors.f16"), dtype=np.float16, mode="r+", shape=(rows, self.dimensions))
+            self._timestamps = np.memmap(self._path("timestamps.i64"), dtype=np.int64, mode="r+", shape=(rows,))
+        self._rows = rows
+
+    def _snapshot(self, doc_id: int = -1) -> Tuple[Optional[np.memmap], Optional[np.memmap], np.memmap]:
+        """Current maps, remapped first if another worker grew the files past doc_id"""
+        with self._lock:
+            if self._df is None or doc_id >= self._rows:
+                self._map()
+            return self._vectors, self._timestamps, self._df
+
+    @contextmanager
+    def _writing(self):
+        """Exclusive across threads and worker processes; remaps to whatever size other writers left"""
+        with self._lock:
+            if self._df is None:
+                self._map()
+            with open(self._path("lock"), "rb") as lock_file:
+                if fcntl:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    self._map()
+                    yield
+                finally:
+                    if fcntl:
+                        fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _grow(self, doc_id: int):
+        """Extend both files to cover doc_id; only ever grows, under the write lock"""
+        if doc_id < self._rows:
+            return
+        rows = (doc_id // GROW_ROWS + 1) * GROW_ROWS
+        for name, itemsize in (("vectors.f16", 2 * self.dimensions), ("timestamps.i64", 8)):
+            with open(self._path(name), "r+b") as handle:
+                handle.truncate(rows * itemsize)
+        self._map()
+
+    def _weigh(self, counts: Dict[int, float], df: np.ndarray) -> np.ndarray:
+        vector = np.zeros(self.dimensions, dtype=np.float32)
+        documents = df[-1]
+        for bucket, weight in counts.items():
+            vector[bucket] = weight * (math.log((1 + documents) / (1 + df[bucket])) + 1)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def vectorize(self, text: str) -> np.ndarray:
+        """Query vector with the current document frequencies (leaves them untouched)"""
+        _, _, df = self._snapshot()
+        return self._weigh(hashed_counts(text, self.dimensions), df)
+
+    def add(self, doc_id: int, text: str, timestamp: float) -> bool:
+        """Index a document once; its IDF weights are those at indexing time"""
+        counts = hashed_counts(text, self.dimensions)
+        with self._writing():
+            self._grow(doc_id)
+            if self._timestamps[doc_id]:
+                return False
+            for bucket in counts:
+                self._df[bucket] += 1
+            self._df[-1] += 1
+            self._vectors[doc_id] = self._weigh(counts, self._df)
+            self._timestamps[doc_id] = max(int(timestamp), 1)
+        return True
+
+    def remove(self, doc_id: int):
+        """Clear the row; document frequencies keep counting it, which only matters in aggregate"""
+        with self._writing():
+            if doc_id < self._rows:
+                self._vectors[doc_id] = 0
+                self._timestamps[doc_id] = 0
+
+    def vector(self, doc_id: int) -> Optional[np.ndarray]:
+        vectors, timestamps, _ = self._snapshot(doc_id)
+        if timestamps is None or doc_id >= len(timestamps) or not timestamps[doc_id]:
+            return None
+        return np.asarray(vectors[doc_id], dtype=np.float32)
+
+    def indexed_ids(self) -> np.ndarray:
+        _, timestamps, _ = self._snapshot()
+        return np.zeros(0, dtype=np.int64) if timestamps is None else np.flatnonzero(timestamps)
+
+    def nearest(self, query: np.ndarray, since: float, limit: int, exclude: int = -1,
+                min_score: float = 0.0) -> List[Tuple[int, float]]:
+        """Up to `limit` (doc_id, cosine) among documents newer than `since`, best first.
+
+        Exact search over the recent rows, which are contiguous because ids grow with time; only
+        that range is read, so the cost follows the window, not every post ever indexed.
+        """
+        vectors, timestamps, _ = self._snapshot()
+        if timestamps is None:
+            return []
+        last = _last_filled(timestamps)
+        if last is None:
+            return []
+        first = _window_start(timestamps, since, last + 1)
+        if first > last:
+            return []
+        query = query.astype(np.float32)
+        best_ids, best_scores = [], []
+        for start in range(first, last + 1, SEARCH_CHUNK_ROWS):
+            stop = min(start + SEARCH_CHUNK_ROWS, last + 1)
+            scores = np.asarray(vectors[start:stop], dtype=np.float32) @ query
+            scores[timestamps[start:stop] < since] = -1
+            if start <= exclude < stop:
+                scores[exclude - start] = -1
+            keep = np.flatnonzero(scores > min_score)
+            if len(keep) > limit:
+                keep = keep[np.argpartition(-scores[keep], limit - 1)[:limit]]
+            best_ids.append(keep + start)
+            best_scores.append(scores[keep])
+        ids, scores = np.concatenate(best_ids), np.concatenate(best_scores)
+        order = np.lexsort((ids, -scores))[:limit]
+        return [(int(ids[i]), float(scores[i])) for i in order]
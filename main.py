@@ -1,11 +1,25 @@
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.templating import Jinja2Templates
 from starlette.responses import HTMLResponse
 
 import os
-from routes import auth, feed, profile, search, category, ai
+from config import settings
+from core import scheduler
+from core.database import RequestSessionScope, replica_router, check_replica_lag
+from core.replicas import ReadYourWritesMiddleware
+from core.avatars import AvatarUploadLimit
+from core.compression import CompressionMiddleware
+from core.staticfiles import ImmutableStaticFiles, PrecompressedStaticFiles, assets
+from core.templating import templates, precompile
+from core.query_stats import QueryStatsMiddleware
+from core.events import event_bus
+from routes import auth, feed, profile, search, category, ai, events, metrics
+from services.ranking_service import RankingService
+from services.related_posts_service import RelatedPostsService
+from services.search_service import SearchService
+from services.suggestion_service import SuggestionService
+from services.user_stats_service import UserStatsService
 
 app = FastAPI(title="YegnaConnect API", version="0.1.0")
 
@@ -18,12 +32,29 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Static files
-app.mount("/static", StaticFiles(directory=os.path.join(os.path.dirname(__file__), "static")), name="static")
+# Close any DB session a request left open once its response has been sent
+app.add_middleware(RequestSessionScope)
+
+# Per-request query count/time, over-budget logging and Server-Timing in DEBUG
+app.add_middleware(QueryStatsMiddleware)
+
+if replica_router.enabled:
+    # Clients that just wrote read from the primary until replicas have caught up
+    app.add_middleware(ReadYourWritesMiddleware, sticky_seconds=settings.REPLICA_STICKY_SECONDS)
+
+# Oversized avatar uploads are refused before the form parser spools them to disk
+app.add_middleware(AvatarUploadLimit)
 
-# Jinja2 templates
-TEMPLATES_DIR = os.path.join(os.path.dirname(__file__), "templates")
-templates = Jinja2Templates(directory=TEMPLATES_DIR)
+# Outermost, so every header set inside (Server-Timing, ETag) is in place before the body is compressed
+app.add_middleware(CompressionMiddleware)
+
+# Static files; templates link the fingerprinted copies under /assets (core.staticfiles.static_url)
+app.mount("/static", StaticFiles(directory=os.path.join(os.path.dirname(__file__), "static")), name="static")
+assets.build()
+app.mount("/assets", PrecompressedStaticFiles(directory=settings.STATIC_BUILD_DIR), name="assets")
+# Content-addressed uploads (core.avatars), cached by browsers for good
+os.makedirs(settings.MEDIA_DIR, exist_ok=True)
+app.mount("/media", ImmutableStaticFiles(directory=settings.MEDIA_DIR), name="media")
 
 app.include_router(auth.router)
 app.include_router(feed.router)
@@ -31,6 +62,34 @@ app.include_router(profile.router)
 app.include_router(search.router)
 app.include_router(category.router)
 app.include_router(ai.router)
+app.include_router(events.router)
+app.include_router(metrics.router)
+
+@app.on_event("startup")
+async def on_startup():
+    # Compile every template before the first request (from the bytecode cache after the first worker)
+    precompile()
+    # Keep hot feed scores decaying even for posts nobody is touching
+    scheduler.register_job("hot_score_decay", settings.HOT_SCORE_REFRESH_SECONDS, scheduler.session_job(RankingService.decay_hot_scores), run_on_start=True)
+    # Picks up edits and deletions made through other workers (no-op on Postgres, which searches in the database)
+    scheduler.register_job("search_index_rebuild", settings.SEARCH_INDEX_REFRESH_SECONDS, scheduler.session_job(SearchService.rebuild_indexes))
+    # Unfollows made through other workers (no-op until a worker has served a suggestion)
+    scheduler.register_job("follow_graph_rebuild", settings.FOLLOW_GRAPH_REFRESH_SECONDS, scheduler.session_job(SuggestionService.rebuild_follow_graph))
+    # Joins and leaves refresh the member's own suggestions; this picks up shifts in category overlap
+    scheduler.register_job("category_suggestions_refresh", settings.CATEGORY_SUGGESTIONS_REFRESH_SECONDS, scheduler.session_job(SuggestionService.refresh_category_suggestions))
+    # Stats are maintained by the write paths; this only repairs drift (failed hooks, manual edits)
+    scheduler.register_job("user_stats_reconcile", settings.USER_STATS_RECONCILE_SECONDS, scheduler.session_job(UserStatsService.reconcile))
+    # Posts are vectorized on creation; this covers existing posts and anything a failed hook missed
+    scheduler.register_job("related_posts_backfill", settings.RELATED_POSTS_BACKFILL_SECONDS, scheduler.session_job(RelatedPostsService.backfill), run_on_start=True)
+    if replica_router.enabled:
+        scheduler.register_job("replica_lag_check", settings.REPLICA_LAG_CHECK_SECONDS, check_replica_lag, run_on_start=True)
+    scheduler.start()
+    await event_bus.start()
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    await scheduler.stop()
+    await event_bus.stop()
 
 @app.get("/", response_class=HTMLResponse)
 def index(request: Request):
@@ -4,12 +4,13 @@ from sqlalchemy.ext.declarative import declarative_base
 Base = declarative_base()
 
 # Import all models to ensure they're registered with the Base metadata
-from .user import User, UserFollow
+from .user import User, UserFollow, UserStats
 from .post import Post, PostLike, Comment, CommentLike
-from .category import Category, CategoryMember
+from .category import Category, CategoryMember, CategorySimilarity, CategorySuggestion
 
 # Make sure all models are imported so Alembic can detect them
-__all__ = ['Base', 'User', 'UserFollow', 'Post', 'PostLike', 'Comment', 'CommentLike', 'Category', 'CategoryMember']
+__all__ = ['Base', 'User', 'UserFollow', 'UserStats', 'Post', 'PostLike', 'Comment', 'CommentLike', 'Category', 'CategoryMember',
+           'CategorySimilarity', 'CategorySuggestion']
 
 
 
@@ -1,9 +1,19 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, Boolean, func, ForeignKey
+from sqlalchemy import Column, Integer, String, Text, DateTime, Boolean, Float, func, ForeignKey, Index, text
 from sqlalchemy.orm import relationship
 from . import Base
 
+# Weighted search document for category discovery; name fields rank above the description.
+# Queries must use this exact expression for Postgres to match it against the GIN index.
+CATEGORY_SEARCH_VECTOR = (
+    "setweight(to_tsvector('simple', name || ' ' || display_name), 'A') || "
+    "setweight(to_tsvector('simple', coalesce(description, '')), 'B')"
+)
+
 class Category(Base):
     __tablename__ = "categories"
+    __table_args__ = (
+        Index("ix_categories_search_fts", text(CATEGORY_SEARCH_VECTOR), postgresql_using="gin").ddl_if(dialect="postgresql"),
+    )
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String(50), unique=True, nullable=False, index=True)
     display_name = Column(String(100), nullable=False)
@@ -14,6 +24,9 @@ class Category(Base):
     created_by = Column(Integer, ForeignKey("users.id"), nullable=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    # Denormalized for search ranking; maintained by CategoryService and PostService
+    members_count = Column(Integer, default=0, server_default="0")
+    last_post_at = Column(DateTime(timezone=True), nullable=True)
     
     # Relationships
     creator = relationship("User", back_populates="created_categories")
@@ -22,6 +35,10 @@ class Category(Base):
 
 class CategoryMember(Base):
     __tablename__ = "category_members"
+    __table_args__ = (
+        Index("uq_category_members_user_category", "user_id", "category_id", unique=True),
+        Index("ix_category_members_category_id", "category_id"),
+    )
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     category_id = Column(Integer, ForeignKey("categories.id"), nullable=False)
@@ -30,4 +47,18 @@ class CategoryMember(Base):
     
     # Relationships
     user = relationship("User", back_populates="category_memberships")
-    category = relationship("Category", back_populates="members") 
\ No newline at end of file
+    category = relationship("Category", back_populates="members") 
+
+class CategorySimilarity(Base):
+    """Nearest categories by shared members; rebuilt by SuggestionService.refresh_category_suggestions"""
+    __tablename__ = "category_similarities"
+    category_id = Column(Integer, ForeignKey("categories.id", ondelete="CASCADE"), primary_key=True)
+    similar_id = Column(Integer, ForeignKey("categories.id", ondelete="CASCADE"), primary_key=True)
+    score = Column(Float, nullable=False)
+
+class CategorySuggestion(Base):
+    """Precomputed top categories for each member; refreshed per user on join and leave"""
+    __tablename__ = "category_suggestions"
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    category_id = Column(Integer, ForeignKey("categories.id", ondelete="CASCADE"), primary_key=True)
+    score = Column(Float, nullable=False)
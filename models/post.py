@@ -1,9 +1,16 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, func, JSON
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, func, JSON, Float, UniqueConstraint, Index, text
 from sqlalchemy.orm import relationship
 from . import Base
 
 class Post(Base):
     __tablename__ = "posts"
+    __table_args__ = (
+        Index("ix_posts_created_at", "created_at"),
+        Index("ix_posts_user_id_created_at", "user_id", "created_at"),
+        Index("ix_posts_category_id_created_at", "category_id", "created_at"),
+        # Full-text search (see services.search_service); Postgres only
+        Index("ix_posts_content_fts", text("to_tsvector('simple', content)"), postgresql_using="gin").ddl_if(dialect="postgresql"),
+    )
     id = Column(Integer, primary_key=True, index=True)
     content = Column(Text, nullable=False)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
@@ -11,6 +18,7 @@ class Post(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     likes_count = Column(Integer, default=0)
     comments_count = Column(Integer, default=0)
+    hot_score = Column(Float, default=0, index=True)  # Maintained by RankingService
     
     # AI Analysis Fields
     ai_analysis = Column(JSON, nullable=True)  # Store complete AI analysis
@@ -27,6 +35,10 @@ class Post(Base):
 
 class PostLike(Base):
     __tablename__ = "post_likes"
+    __table_args__ = (
+        UniqueConstraint("user_id", "post_id", name="uq_post_likes_user_post"),
+        Index("ix_post_likes_post_id", "post_id"),
+    )
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     post_id = Column(Integer, ForeignKey("posts.id"), nullable=False)
@@ -38,6 +50,11 @@ class PostLike(Base):
 
 class Comment(Base):
     __tablename__ = "comments"
+    __table_args__ = (
+        Index("ix_comments_post_id_created_at", "post_id", "created_at"),
+        Index("ix_comments_parent_id_created_at", "parent_id", "created_at"),
+        Index("ix_comments_content_fts", text("to_tsvector('simple', content)"), postgresql_using="gin").ddl_if(dialect="postgresql"),
+    )
     id = Column(Integer, primary_key=True, index=True)
     content = Column(Text, nullable=False)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
@@ -60,6 +77,10 @@ class Comment(Base):
 
 class CommentLike(Base):
     __tablename__ = "comment_likes"
+    __table_args__ = (
+        UniqueConstraint("user_id", "comment_id", name="uq_comment_likes_user_comment"),
+        Index("ix_comment_likes_comment_id", "comment_id"),
+    )
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     comment_id = Column(Integer, ForeignKey("comments.id"), nullable=False)
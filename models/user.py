@@ -1,9 +1,17 @@
-from sqlalchemy import Column, Integer, String, DateTime, Text, func, ForeignKey
+from sqlalchemy import Column, Integer, String, DateTime, Text, func, ForeignKey, Index, DDL, event
 from sqlalchemy.orm import relationship
+from datetime import datetime, timezone
 from . import Base
 
 class User(Base):
     __tablename__ = "users"
+    __table_args__ = (
+        # Trigram indexes for user search (see services.search_service); Postgres only
+        Index("ix_users_username_trgm", "username", postgresql_using="gin",
+              postgresql_ops={"username": "gin_trgm_ops"}).ddl_if(dialect="postgresql"),
+        Index("ix_users_full_name_trgm", "full_name", postgresql_using="gin",
+              postgresql_ops={"full_name": "gin_trgm_ops"}).ddl_if(dialect="postgresql"),
+    )
     id = Column(Integer, primary_key=True, index=True)
     username = Column(String(32), unique=True, nullable=False, index=True)
     email = Column(String(128), unique=True, nullable=False, index=True)
@@ -14,6 +22,9 @@ class User(Base):
     location = Column(String(100), nullable=True)
     website = Column(String(255), nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+    # Set on every ORM update and part of the profile header's fragment cache key (NULL = never edited);
+    # stamped in Python because SQLite's CURRENT_TIMESTAMP only has whole seconds
+    updated_at = Column(DateTime(timezone=True), nullable=True, onupdate=lambda: datetime.now(timezone.utc))
     
     # Relationships
     posts = relationship("Post", back_populates="user")
@@ -29,8 +40,20 @@ class User(Base):
     created_categories = relationship("Category", back_populates="creator", cascade="all, delete-orphan")
     category_memberships = relationship("CategoryMember", back_populates="user", cascade="all, delete-orphan")
 
+event.listen(
+    User.__table__, "before_create",
+    DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm").execute_if(dialect="postgresql")
+)
+
 class UserFollow(Base):
     __tablename__ = "user_follows"
+    __table_args__ = (
+        Index("uq_user_follows_follower_followed", "follower_id", "followed_id", unique=True),
+        Index("ix_user_follows_followed_follower", "followed_id", "follower_id"),
+        # Keyset pagination of follower / following lists, newest first
+        Index("ix_user_follows_followed_created_id", "followed_id", "created_at", "id"),
+        Index("ix_user_follows_follower_created_id", "follower_id", "created_at", "id"),
+    )
     id = Column(Integer, primary_key=True, index=True)
     follower_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     followed_id = Column(Integer, ForeignKey("users.id"), nullable=False)
@@ -38,4 +61,14 @@ class UserFollow(Base):
     
     # Relationships
     follower = relationship("User", foreign_keys=[follower_id], back_populates="following")
-    followed = relationship("User", foreign_keys=[followed_id], back_populates="followers") 
\ No newline at end of file
+    followed = relationship("User", foreign_keys=[followed_id], back_populates="followers") 
+
+class UserStats(Base):
+    """Denormalized profile counters, kept current by the write paths (see services.user_stats_service)"""
+    __tablename__ = "user_stats"
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    posts_count = Column(Integer, nullable=False, default=0, server_default="0")
+    followers_count = Column(Integer, nullable=False, default=0, server_default="0")
+    following_count = Column(Integer, nullable=False, default=0, server_default="0")
+    likes_received = Column(Integer, nullable=False, default=0, server_default="0")
+    comments_received = Column(Integer, nullable=False, default=0, server_default="0")
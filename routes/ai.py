@@ -1,50 +1,30 @@
 """
 AI Routes - AI-powered features and content analysis
 """
-from fastapi import APIRouter, Depends, HTTPException, Request, Cookie, Form
+from fastapi import APIRouter, Depends, HTTPException, Request, Form
 from fastapi.responses import HTMLResponse, JSONResponse, RedirectResponse
-from fastapi.templating import Jinja2Templates
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Dict, Any, Optional
 import json
-from sqlalchemy import func
-import os
+from sqlalchemy import func, select
 
-from core.database import get_db
-from core.auth import verify_token
-from models.user import User
+from core.database import get_db, get_async_db
+from core.auth import CurrentUser, get_current_user, get_current_user_obj
+from core.templating import templates
 from models.post import Post, Comment
 from ai import AIManager
+from services.ranking_service import RankingService
 
 router = APIRouter(prefix="/ai", tags=["AI Features"])
-TEMPLATES_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "templates")
-templates = Jinja2Templates(directory=TEMPLATES_DIR)
 
 # Initialize AI Manager
 ai_manager = AIManager()
 
-def get_current_user(access_token: str = Cookie(None), db: Session = Depends(get_db)):
-    if not access_token:
-        return None
-    username = verify_token(access_token)
-    if username:
-        user = db.query(User).filter(User.username == username).first()
-        return user.username if user else None
-    return None
-
-def get_current_user_obj(access_token: str = Cookie(None), db: Session = Depends(get_db)):
-    if not access_token:
-        return None
-    username = verify_token(access_token)
-    if username:
-        user = db.query(User).filter(User.username == username).first()
-        return user
-    return None
-
 @router.post("/analyze-post")
 async def analyze_post(
     content: str = Form(...),
-    current_user_obj: User = Depends(get_current_user_obj),
+    current_user_obj: CurrentUser = Depends(get_current_user_obj),
     db: Session = Depends(get_db)
 ):
     """Analyze post content with AI"""
@@ -65,7 +45,7 @@ async def analyze_post(
 @router.post("/moderate-content")
 async def moderate_content(
     content: str = Form(...),
-    current_user_obj: User = Depends(get_current_user_obj)
+    current_user_obj: CurrentUser = Depends(get_current_user_obj)
 ):
     """Moderate content for inappropriate material"""
     if not current_user_obj:
@@ -87,7 +67,7 @@ async def moderate_content(
 @router.post("/analyze-sentiment")
 async def analyze_sentiment(
     content: str = Form(...),
-    current_user_obj: User = Depends(get_current_user_obj)
+    current_user_obj: CurrentUser = Depends(get_current_user_obj)
 ):
     """Analyze sentiment of content"""
     if not current_user_obj:
@@ -109,7 +89,7 @@ async def analyze_sentiment(
 @router.post("/summarize-content")
 async def summarize_content(
     content: str = Form(...),
-    current_user_obj: User = Depends(get_current_user_obj)
+    current_user_obj: CurrentUser = Depends(get_current_user_obj)
 ):
     """Summarize content using AI"""
     if not current_user_obj:
@@ -131,15 +111,15 @@ async def summarize_content(
 @router.post("/posts/{post_id}/analyze")
 async def analyze_existing_post(
     post_id: int,
-    current_user_obj: User = Depends(get_current_user_obj),
-    db: Session = Depends(get_db)
+    current_user_obj: CurrentUser = Depends(get_current_user_obj),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Analyze an existing post with AI"""
     if not current_user_obj:
         raise HTTPException(status_code=401, detail="Not authenticated")
     
     try:
-        post = db.query(Post).filter(Post.id == post_id).first()
+        post = await db.get(Post, post_id)
         if not post:
             raise HTTPException(status_code=404, detail="Post not found")
         
@@ -156,8 +136,9 @@ async def analyze_existing_post(
         post.sentiment_score = int(analysis["sentiment"]["sentiment_score"] * 100)
         post.content_summary = analysis["summary"]["summary"]
         post.is_ai_processed = 1
+        RankingService.apply_hot_score(post)
         
-        db.commit()
+        await db.commit()
         
         return JSONResponse({
             "success": True,
@@ -170,15 +151,15 @@ async def analyze_existing_post(
 @router.get("/posts/{post_id}/analysis")
 async def get_post_analysis(
     post_id: int,
-    current_user_obj: User = Depends(get_current_user_obj),
-    db: Session = Depends(get_db)
+    current_user_obj: CurrentUser = Depends(get_current_user_obj),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get AI analysis for a post"""
     if not current_user_obj:
         raise HTTPException(status_code=401, detail="Not authenticated")
     
     try:
-        post = db.query(Post).filter(Post.id == post_id).first()
+        post = await db.get(Post, post_id)
         if not post:
             raise HTTPException(status_code=404, detail="Post not found")
         
@@ -199,36 +180,28 @@ async def get_post_analysis(
 @router.get("/ai-dashboard", response_class=HTMLResponse)
 async def ai_dashboard(
     request: Request,
-    current_user_obj: User = Depends(get_current_user_obj),
-    db: Session = Depends(get_db)
+    current_user_obj: CurrentUser = Depends(get_current_user_obj),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """AI Dashboard - View AI analysis features"""
     if not current_user_obj:
         return RedirectResponse(url="/login", status_code=303)
     
     try:
+        processed = (Post.user_id == current_user_obj.id, Post.is_ai_processed == 1)
+        
         # Get user's posts with AI analysis
-        posts_with_ai = db.query(Post).filter(
-            Post.user_id == current_user_obj.id,
-            Post.is_ai_processed == 1
-        ).order_by(Post.created_at.desc()).limit(10).all()
+        posts_with_ai = (await db.scalars(
+            select(Post).where(*processed).order_by(Post.created_at.desc()).limit(10)
+        )).all()
         
         # Calculate AI statistics
-        total_posts = db.query(Post).filter(Post.user_id == current_user_obj.id).count()
-        ai_processed_posts = db.query(Post).filter(
-            Post.user_id == current_user_obj.id,
-            Post.is_ai_processed == 1
-        ).count()
-        
-        avg_moderation_score = db.query(func.avg(Post.moderation_score)).filter(
-            Post.user_id == current_user_obj.id,
-            Post.is_ai_processed == 1
-        ).scalar() or 0
-        
-        avg_sentiment_score = db.query(func.avg(Post.sentiment_score)).filter(
-            Post.user_id == current_user_obj.id,
-            Post.is_ai_processed == 1
-        ).scalar() or 50
+        total_posts = await db.scalar(select(func.count(Post.id)).where(Post.user_id == current_user_obj.id))
+        ai_processed_posts, avg_moderation_score, avg_sentiment_score = (await db.execute(
+            select(func.count(Post.id), func.avg(Post.moderation_score), func.avg(Post.sentiment_score)).where(*processed)
+        )).one()
+        avg_moderation_score = avg_moderation_score or 0
+        avg_sentiment_score = avg_sentiment_score or 50
         
         return templates.TemplateResponse("ai_dashboard.html", {
             "request": request,
@@ -244,7 +217,7 @@ async def ai_dashboard(
         raise HTTPException(status_code=500, detail=f"Failed to load AI dashboard: {str(e)}") 
 
 @router.get("/ai", response_class=HTMLResponse)
-def ai_dashboard(request: Request, current_user: str = Depends(get_current_user), current_user_obj: User = Depends(get_current_user_obj)):
+def ai_dashboard(request: Request, current_user: str = Depends(get_current_user), current_user_obj: CurrentUser = Depends(get_current_user_obj)):
     if not current_user_obj:
         return RedirectResponse(url="/login", status_code=303)
     
@@ -254,7 +227,7 @@ def ai_dashboard(request: Request, current_user: str = Depends(get_current_user)
     })
 
 @router.post("/ai/analyze-post")
-async def analyze_post(content: str = Form(...), current_user_obj: User = Depends(get_current_user_obj)):
+async def analyze_post(content: str = Form(...), current_user_obj: CurrentUser = Depends(get_current_user_obj)):
     """Real-time AI analysis for post preview"""
     if not current_user_obj:
         raise HTTPException(status_code=401, detail="Not authenticated")
@@ -278,7 +251,7 @@ async def analyze_post(content: str = Form(...), current_user_obj: User = Depend
         }, status_code=500)
 
 @router.post("/ai/analyze-comment")
-async def analyze_comment(content: str = Form(...), current_user_obj: User = Depends(get_current_user_obj)):
+async def analyze_comment(content: str = Form(...), current_user_obj: CurrentUser = Depends(get_current_user_obj)):
     """Real-time AI analysis for comment preview"""
     if not current_user_obj:
         raise HTTPException(status_code=401, detail="Not authenticated")
@@ -302,7 +275,7 @@ async def analyze_comment(content: str = Form(...), current_user_obj: User = Dep
         }, status_code=500)
 
 @router.post("/ai/test")
-async def test_ai_features(content: str = Form(...), current_user_obj: User = Depends(get_current_user_obj)):
+async def test_ai_features(content: str = Form(...), current_user_obj: CurrentUser = Depends(get_current_user_obj)):
     """Test AI features with custom content"""
     if not current_user_obj:
         raise HTTPException(status_code=401, detail="Not authenticated")
@@ -1,23 +1,34 @@
-from fastapi import APIRouter, Request, Form, Depends, Response
+from fastapi import APIRouter, Request, Form, Depends, Response, Cookie
 from fastapi.responses import HTMLResponse, RedirectResponse
-from fastapi.templating import Jinja2Templates
-import os
-from sqlalchemy.orm import Session
-from core.database import get_db
-from services.auth_service import AuthService
-from core.auth import create_access_token
+from sqlalchemy.ext.asyncio import AsyncSession
+from core.database import get_async_db
+from core.passwords import PasswordHasherBusy
+from services.auth_service import AsyncAuthService
+from core.auth import create_access_token, forget_token
+from core.templating import templates
 
 router = APIRouter()
-TEMPLATES_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "templates")
-templates = Jinja2Templates(directory=TEMPLATES_DIR)
+
+BUSY_MESSAGE = "Too many sign-ins right now. Please try again in a moment."
+BUSY_RETRY_AFTER_SECONDS = 5
+
+def _busy(template: str, request: Request, **context):
+    """The password hashing queue is full: fail fast instead of queueing behind the burst"""
+    return templates.TemplateResponse(
+        template, {"request": request, "error": BUSY_MESSAGE, **context},
+        status_code=503, headers={"Retry-After": str(BUSY_RETRY_AFTER_SECONDS)}
+    )
 
 @router.get("/login", response_class=HTMLResponse)
 def login_get(request: Request):
     return templates.TemplateResponse("login.html", {"request": request, "error": None})
 
 @router.post("/login", response_class=HTMLResponse)
-def login_post(request: Request, response: Response, username: str = Form(...), password: str = Form(...), db: Session = Depends(get_db)):
-    user, error = AuthService.authenticate_user(db, username, password)
+async def login_post(request: Request, response: Response, username: str = Form(...), password: str = Form(...), db: AsyncSession = Depends(get_async_db)):
+    try:
+        user, error = await AsyncAuthService.authenticate_user(db, username, password)
+    except PasswordHasherBusy:
+        return _busy("login.html", request, username=username)
     if error:
         return templates.TemplateResponse("login.html", {"request": request, "error": error, "username": username})
     
@@ -32,16 +43,20 @@ def register_get(request: Request):
     return templates.TemplateResponse("register.html", {"request": request, "error": None})
 
 @router.post("/register", response_class=HTMLResponse)
-def register_post(request: Request, username: str = Form(...), email: str = Form(...), password: str = Form(...), confirm_password: str = Form(...), db: Session = Depends(get_db)):
+async def register_post(request: Request, username: str = Form(...), email: str = Form(...), password: str = Form(...), confirm_password: str = Form(...), db: AsyncSession = Depends(get_async_db)):
     if password != confirm_password:
         return templates.TemplateResponse("register.html", {"request": request, "error": "Passwords do not match.", "username": username, "email": email})
-    user, error = AuthService.create_user(db, username, email, password)
+    try:
+        user, error = await AsyncAuthService.create_user(db, username, email, password)
+    except PasswordHasherBusy:
+        return _busy("register.html", request, username=username, email=email)
     if error:
         return templates.TemplateResponse("register.html", {"request": request, "error": error, "username": username, "email": email})
     return RedirectResponse(url="/login", status_code=303)
 
 @router.get("/logout")
-def logout(response: Response):
+def logout(response: Response, access_token: str = Cookie(None)):
+    forget_token(access_token)
     response = RedirectResponse(url="/", status_code=303)
     response.delete_cookie(key="access_token")
     return response 
\ No newline at end of file
@@ -0,0 +1,40 @@
+"""
+Server-Sent Events stream of new posts, likes and comments
+"""
+import asyncio
+import json
+from fastapi import APIRouter, Request
+from fastapi.responses import StreamingResponse
+
+from core.events import event_bus
+
+router = APIRouter(tags=["events"])
+
+HEARTBEAT_SECONDS = 25
+# Deltas arriving within this window are coalesced into a single frame per connection
+FLUSH_INTERVAL_SECONDS = 0.5
+
+async def _event_stream(request: Request):
+    subscription = event_bus.subscribe()
+    try:
+        yield "retry: 5000\n\n"
+        while True:
+            has_events = await subscription.wait(HEARTBEAT_SECONDS)
+            if await request.is_disconnected():
+                break
+            if not has_events:
+                yield ": keep-alive\n\n"
+                continue
+            await asyncio.sleep(FLUSH_INTERVAL_SECONDS)
+            yield f"event: batch\ndata: {json.dumps(subscription.drain())}\n\n"
+    finally:
+        event_bus.unsubscribe(subscription)
+
+@router.get("/events")
+async def events(request: Request):
+    """Push channel: one lightweight coroutine per idle connection, no worker thread"""
+    return StreamingResponse(
+        _event_stream(request),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
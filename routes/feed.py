@@ -1,62 +1,42 @@
-from fastapi import APIRouter, Request, Depends, Cookie, Form, HTTPException
+from fastapi import APIRouter, Request, Depends, Form, HTTPException, Query
 from fastapi.responses import HTMLResponse, RedirectResponse, JSONResponse
-from fastapi.templating import Jinja2Templates
-import os
 from typing import Optional
-from core.auth import verify_token
-from core.database import get_db
+from core.auth import CurrentUser, get_current_user, get_current_user_obj
+from core.conditional import make_etag, relative_time_bucket, etag_matches, etag_headers, not_modified
+from core.database import get_db, get_async_db
+from core.templating import templates
 from sqlalchemy.orm import Session
-from models.user import User
+from sqlalchemy.ext.asyncio import AsyncSession
 from models.post import Comment
-from services.post_service import PostService
+from services.post_service import PostService, AsyncPostService
 
 router = APIRouter()
-TEMPLATES_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "templates")
-templates = Jinja2Templates(directory=TEMPLATES_DIR)
-
-def get_current_user(access_token: str = Cookie(None), db: Session = Depends(get_db)):
-    if not access_token:
-        return None
-    username = verify_token(access_token)
-    if username:
-        user = db.query(User).filter(User.username == username).first()
-        return user.username if user else None
-    return None
-
-def get_current_user_obj(access_token: str = Cookie(None), db: Session = Depends(get_db)):
-    if not access_token:
-        return None
-    username = verify_token(access_token)
-    if username:
-        user = db.query(User).filter(User.username == username).first()
-        return user
-    return None
 
 @router.get("/feed", response_class=HTMLResponse)
-def feed_page(request: Request, current_user: str = Depends(get_current_user), current_user_obj: User = Depends(get_current_user_obj), db: Session = Depends(get_db)):
+def feed_page(request: Request, sort: str = Query("recent", pattern="^(recent|hot)$"), current_user: str = Depends(get_current_user), current_user_obj: CurrentUser = Depends(get_current_user_obj), db: Session = Depends(get_db)):
     # Get real posts from database with liked status
     current_user_id = current_user_obj.id if current_user_obj else None
-    posts = PostService.get_posts_with_users(db, current_user_id)
+    posts = PostService.get_posts_with_users(db, current_user_id, sort=sort)
     
     return templates.TemplateResponse("feed.html", {
         "request": request,
         "current_user": current_user_obj,
         "current_user_id": current_user_id,
-        "posts": posts
+        "posts": posts,
+        "sort": sort
     })
 
 @router.post("/posts/create")
-async def create_post(content: str = Form(...), category_id: Optional[int] = Form(None), current_user_obj: User = Depends(get_current_user_obj)):
+async def create_post(content: str = Form(...), category_id: Optional[int] = Form(None), current_user_obj: CurrentUser = Depends(get_current_user_obj), db: AsyncSession = Depends(get_async_db)):
     if not current_user_obj:
         raise HTTPException(status_code=401, detail="Not authenticated")
     
     if not content.strip():
         raise HTTPException(status_code=400, detail="Post content cannot be empty")
     
-    db = next(get_db())
     try:
         # Use AI analysis for post creation
-        result = await PostService.create_post_with_ai_analysis(db, content.strip(), current_user_obj.id, category_id)
+        result = await AsyncPostService.create_post_with_ai_analysis(db, content.strip(), current_user_obj.id, category_id)
         
         # Check if content is appropriate
         if not result["is_appropriate"]:
@@ -82,7 +62,7 @@ async def create_post(content: str = Form(...), category_id: Optional[int] = For
         raise HTTPException(status_code=500, detail=f"Failed to create post: {str(e)}")
 
 @router.post("/posts/{post_id}/like")
-def like_post(post_id: int, current_user_obj: User = Depends(get_current_user_obj), db: Session = Depends(get_db)):
+def like_post(post_id: int, current_user_obj: CurrentUser = Depends(get_current_user_obj), db: Session = Depends(get_db)):
     if not current_user_obj:
         raise HTTPException(status_code=401, detail="Not authenticated")
     success = PostService.like_post(db, current_user_obj.id, post_id)
@@ -91,7 +71,7 @@ def like_post(post_id: int, current_user_obj: User = Depends(get_current_user_ob
     return JSONResponse({"message": "Post liked"})
 
 @router.post("/posts/{post_id}/unlike")
-def unlike_post(post_id: int, current_user_obj: User = Depends(get_current_user_obj), db: Session = Depends(get_db)):
+def unlike_post(post_id: int, current_user_obj: CurrentUser = Depends(get_current_user_obj), db: Session = Depends(get_db)):
     if not current_user_obj:
         raise HTTPException(status_code=401, detail="Not authenticated")
     success = PostService.unlike_post(db, current_user_obj.id, post_id)
@@ -100,7 +80,7 @@ def unlike_post(post_id: int, current_user_obj: User = Depends(get_current_user_
     return JSONResponse({"message": "Post unliked"})
 
 @router.post("/posts/{post_id}/comments")
-async def create_comment(post_id: int, content: str = Form(...), current_user_obj: User = Depends(get_current_user_obj), db: Session = Depends(get_db)):
+async def create_comment(post_id: int, content: str = Form(...), current_user_obj: CurrentUser = Depends(get_current_user_obj), db: AsyncSession = Depends(get_async_db)):
     if not current_user_obj:
         raise HTTPException(status_code=401, detail="Not authenticated")
     if not content.strip():
@@ -108,7 +88,7 @@ async def create_comment(post_id: int, content: str = Form(...), current_user_ob
     
     try:
         # Use AI analysis for comment creation
-        result = await PostService.create_comment_with_ai_analysis(db, content.strip(), current_user_obj.id, post_id)
+        result = await AsyncPostService.create_comment_with_ai_analysis(db, content.strip(), current_user_obj.id, post_id)
         
         # Check if content is appropriate
         if not result["is_appropriate"]:
@@ -137,15 +117,83 @@ async def create_comment(post_id: int, content: str = Form(...), current_user_ob
         raise HTTPException(status_code=500, detail=f"Failed to create comment: {str(e)}")
 
 @router.get("/posts/{post_id}/comments")
-def get_comments(post_id: int, db: Session = Depends(get_db)):
+def get_comments(request: Request, post_id: int, db: Session = Depends(get_db)):
     try:
+        etag = make_etag("comments", post_id, relative_time_bucket(), PostService.comments_version(db, Comment.post_id == post_id))
+        if etag_matches(request, etag):
+            return not_modified(etag)
         comments = PostService.get_comments_for_post(db, post_id)
-        return JSONResponse({"comments": comments})
+        return JSONResponse({"comments": comments}, headers=etag_headers(etag))
     except Exception as e:
         raise HTTPException(status_code=500, detail="Failed to get comments")
 
+@router.get("/posts/{post_id}/thread")
+def get_comment_thread(
+    request: Request,
+    post_id: int,
+    cursor: Optional[str] = Query(None),
+    limit: int = Query(20, ge=1, le=100),
+    replies: int = Query(3, ge=0, le=20),
+    current_user_obj: CurrentUser = Depends(get_current_user_obj),
+    db: Session = Depends(get_db)
+):
+    current_user_id = current_user_obj.id if current_user_obj else None
+    etag = make_etag(
+        "thread", post_id, cursor, limit, replies, current_user_id, relative_time_bucket(),
+        PostService.comments_version(db, Comment.post_id == post_id)
+    )
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    try:
+        thread = PostService.get_comment_thread(db, post_id, current_user_id, cursor, limit, replies)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return JSONResponse(thread, headers=etag_headers(etag))
+
+@router.get("/posts/{post_id}", response_class=HTMLResponse)
+def post_detail_page(request: Request, post_id: int, current_user_obj: CurrentUser = Depends(get_current_user_obj), db: Session = Depends(get_db)):
+    post = PostService.get_post(db, post_id)
+    if not post:
+        raise HTTPException(status_code=404, detail="Post not found")
+    current_user_id = current_user_obj.id if current_user_obj else None
+    # Same rule as the category page: a private category's posts are for its members only
+    if not PostService.can_view_category(db, post.category_id, current_user_id):
+        raise HTTPException(status_code=403, detail="Access denied")
+    return templates.TemplateResponse("post_detail.html", {
+        "request": request,
+        "current_user": current_user_obj,
+        "post": post,
+        "liked": PostService.has_liked_post(db, current_user_id, post_id) if current_user_id else False,
+        "thread": PostService.get_comment_thread(db, post_id, current_user_id),
+        "related": PostService.get_related_posts(db, post_id)
+    })
+
+@router.get("/posts/{post_id}/related")
+def get_related_posts(post_id: int, limit: int = Query(5, ge=1, le=20), current_user_obj: CurrentUser = Depends(get_current_user_obj), db: Session = Depends(get_db)):
+    post = PostService.get_post(db, post_id)
+    if not post:
+        raise HTTPException(status_code=404, detail="Post not found")
+    if not PostService.can_view_category(db, post.category_id, current_user_obj.id if current_user_obj else None):
+        raise HTTPException(status_code=403, detail="Access denied")
+    related = PostService.get_related_posts(db, post_id, limit) or []
+    # Shared caches may only keep the answer when every viewer gets the same one
+    shared = PostService.can_view_category(db, post.category_id, None)
+    return JSONResponse({
+        "results": [
+            {
+                "id": row.id,
+                "content": row.content,
+                "username": row.username,
+                "created_at": row.created_at.isoformat(),
+                "likes": row.likes_count,
+                "comments": row.comments_count
+            }
+            for row in related
+        ]
+    }, headers={"Cache-Control": f"{'public' if shared else 'private'}, max-age=300"})
+
 @router.delete("/comments/{comment_id}")
-def delete_comment(comment_id: int, current_user_obj: User = Depends(get_current_user_obj), db: Session = Depends(get_db)):
+def delete_comment(comment_id: int, current_user_obj: CurrentUser = Depends(get_current_user_obj), db: Session = Depends(get_db)):
     if not current_user_obj:
         raise HTTPException(status_code=401, detail="Not authenticated")
     
@@ -156,7 +204,7 @@ def delete_comment(comment_id: int, current_user_obj: User = Depends(get_current
     return JSONResponse({"message": "Comment deleted"})
 
 @router.post("/comments/{comment_id}/like")
-def like_comment(comment_id: int, current_user_obj: User = Depends(get_current_user_obj), db: Session = Depends(get_db)):
+def like_comment(comment_id: int, current_user_obj: CurrentUser = Depends(get_current_user_obj), db: Session = Depends(get_db)):
     if not current_user_obj:
         raise HTTPException(status_code=401, detail="Not authenticated")
     success = PostService.like_comment(db, current_user_obj.id, comment_id)
@@ -165,7 +213,7 @@ def like_comment(comment_id: int, current_user_obj: User = Depends(get_current_u
     return JSONResponse({"message": "Comment liked"})
 
 @router.post("/comments/{comment_id}/unlike")
-def unlike_comment(comment_id: int, current_user_obj: User = Depends(get_current_user_obj), db: Session = Depends(get_db)):
+def unlike_comment(comment_id: int, current_user_obj: CurrentUser = Depends(get_current_user_obj), db: Session = Depends(get_db)):
     if not current_user_obj:
         raise HTTPException(status_code=401, detail="Not authenticated")
     success = PostService.unlike_comment(db, current_user_obj.id, comment_id)
@@ -174,20 +222,20 @@ def unlike_comment(comment_id: int, current_user_obj: User = Depends(get_current
     return JSONResponse({"message": "Comment unliked"}) 
 
 @router.post("/comments/{comment_id}/reply")
-async def create_reply(comment_id: int, content: str = Form(...), current_user_obj: User = Depends(get_current_user_obj), db: Session = Depends(get_db)):
+async def create_reply(comment_id: int, content: str = Form(...), current_user_obj: CurrentUser = Depends(get_current_user_obj), db: AsyncSession = Depends(get_async_db)):
     if not current_user_obj:
         raise HTTPException(status_code=401, detail="Not authenticated")
     if not content.strip():
         raise HTTPException(status_code=400, detail="Reply content cannot be empty")
     # Find the parent comment to get the post_id
-    parent_comment = db.query(Comment).filter(Comment.id == comment_id).first()
+    parent_comment = await AsyncPostService.get_comment(db, comment_id)
     if not parent_comment:
         raise HTTPException(status_code=404, detail="Parent comment not found")
     try:
         # Use AI analysis for reply creation
-        result = await PostService.create_comment_with_ai_analysis(db, content.strip(), current_user_obj.id, parent_comment.post_id)
-        result["comment"].parent_id = comment_id  # Set the parent_id for the reply
-        db.commit()
+        result = await AsyncPostService.create_comment_with_ai_analysis(
+            db, content.strip(), current_user_obj.id, parent_comment.post_id, parent_id=comment_id
+        )
         
         # Check if content is appropriate
         if not result["is_appropriate"]:
@@ -216,10 +264,18 @@ async def create_reply(comment_id: int, content: str = Form(...), current_user_o
         raise HTTPException(status_code=500, detail=f"Failed to create reply: {str(e)}")
 
 @router.get("/comments/{comment_id}/replies")
-def get_replies(comment_id: int, current_user_obj: User = Depends(get_current_user_obj), db: Session = Depends(get_db)):
+def get_replies(request: Request, comment_id: int, cursor: Optional[str] = Query(None), limit: int = Query(20, ge=1, le=100), current_user_obj: CurrentUser = Depends(get_current_user_obj), db: Session = Depends(get_db)):
+    current_user_id = current_user_obj.id if current_user_obj else None
+    etag = make_etag(
+        "replies", comment_id, cursor, limit, current_user_id, relative_time_bucket(),
+        PostService.comments_version(db, Comment.parent_id == comment_id)
+    )
+    if etag_matches(request, etag):
+        return not_modified(etag)
     try:
-        current_user_id = current_user_obj.id if current_user_obj else None
-        replies = PostService.get_replies_for_comment(db, comment_id, current_user_id)
-        return JSONResponse({"replies": replies})
+        page = PostService.get_replies_for_comment(db, comment_id, current_user_id, cursor, limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
-        raise HTTPException(status_code=500, detail="Failed to get replies") 
\ No newline at end of file
+        raise HTTPException(status_code=500, detail="Failed to get replies")
+    return JSONResponse(page, headers=etag_headers(etag)) 
\ No newline at end of file
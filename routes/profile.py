@@ -1,60 +1,46 @@
-from fastapi import APIRouter, Depends, HTTPException, Request, Form, UploadFile, File
-from fastapi.responses import HTMLResponse, RedirectResponse
-from fastapi.templating import Jinja2Templates
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Request, Form, UploadFile, File, Query
+from fastapi.responses import HTMLResponse, RedirectResponse, JSONResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Optional
-import os
-import shutil
 from datetime import datetime
 
-from core.database import get_db
-from fastapi import Cookie
-from core.auth import verify_token
-from models.user import User, UserFollow
-from services.profile_service import ProfileService
+from core.database import get_async_db
+from core.auth import CurrentUser, get_current_user, get_current_user_obj
+from core.avatars import AvatarError, AvatarTooLarge
+from core.templating import templates
+from services.profile_service import AsyncProfileService
 
 router = APIRouter(prefix="/profile", tags=["profile"])
-templates = Jinja2Templates(directory="templates")
-
-def get_current_user(access_token: str = Cookie(None), db: Session = Depends(get_db)):
-    if not access_token:
-        return None
-    username = verify_token(access_token)
-    if username:
-        user = db.query(User).filter(User.username == username).first()
-        return user.username if user else None
-    return None
-
-def get_current_user_obj(access_token: str = Cookie(None), db: Session = Depends(get_db)):
-    if not access_token:
-        return None
-    username = verify_token(access_token)
-    if username:
-        user = db.query(User).filter(User.username == username).first()
-        return user
-    return None
 
 # Profile routes
+@router.get("/suggestions")
+async def people_you_may_know(limit: int = Query(5, ge=1, le=50), current_user_obj: CurrentUser = Depends(get_current_user_obj), db: AsyncSession = Depends(get_async_db)):
+    """Friends-of-friends suggestions for the current user (declared before /{username})"""
+    if not current_user_obj:
+        raise HTTPException(status_code=401, detail="Not authenticated")
+    results = await AsyncProfileService(db).people_you_may_know(current_user_obj.id, limit)
+    return JSONResponse({"results": results}, headers={"Cache-Control": "private, max-age=60"})
+
 @router.get("/{username}", response_class=HTMLResponse)
-async def view_profile(request: Request, username: str, current_user: str = Depends(get_current_user), current_user_obj: User = Depends(get_current_user_obj), db: Session = Depends(get_db)):
+async def view_profile(request: Request, username: str, current_user: str = Depends(get_current_user), current_user_obj: CurrentUser = Depends(get_current_user_obj), db: AsyncSession = Depends(get_async_db)):
     """View a user's profile page"""
-    profile_service = ProfileService(db)
+    profile_service = AsyncProfileService(db)
     
     # Get the profile user
-    profile_user = profile_service.get_user_by_username(username)
+    profile_user = await profile_service.get_user_by_username(username)
     if not profile_user:
         raise HTTPException(status_code=404, detail="User not found")
     
     # Get user stats
-    stats = profile_service.get_user_stats(profile_user.id)
+    stats = await profile_service.get_user_stats(profile_user.id)
     
     # Check if current user is following this profile
     is_following = False
     if current_user_obj:
-        is_following = profile_service.is_following(current_user_obj.id, profile_user.id)
+        is_following = await profile_service.is_following(current_user_obj.id, profile_user.id)
     
     # Get user's posts
-    posts = profile_service.get_user_posts(profile_user.id)
+    posts = await profile_service.get_user_posts(profile_user.id)
     
     return templates.TemplateResponse("profile.html", {
         "request": request,
@@ -66,7 +52,7 @@ async def view_profile(request: Request, username: str, current_user: str = Depe
     })
 
 @router.get("/edit", response_class=HTMLResponse)
-async def edit_profile_page(request: Request, current_user: str = Depends(get_current_user), current_user_obj: User = Depends(get_current_user_obj)):
+async def edit_profile_page(request: Request, current_user: str = Depends(get_current_user), current_user_obj: CurrentUser = Depends(get_current_user_obj)):
     """Show profile editing page"""
     if not current_user:
         return RedirectResponse(url="/login", status_code=302)
@@ -85,22 +71,27 @@ async def update_profile(
     website: str = Form(None),
     avatar: Optional[UploadFile] = File(None),
     current_user: str = Depends(get_current_user),
-    current_user_obj: User = Depends(get_current_user_obj),
-    db: Session = Depends(get_db)
+    current_user_obj: CurrentUser = Depends(get_current_user_obj),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Update user profile"""
     if not current_user:
         return RedirectResponse(url="/login", status_code=302)
     
-    profile_service = ProfileService(db)
+    profile_service = AsyncProfileService(db)
     
     # Handle avatar upload
     avatar_url = None
     if avatar and avatar.filename:
-        avatar_url = await profile_service.upload_avatar(avatar, current_user_obj.username)
+        try:
+            avatar_url = await profile_service.upload_avatar(avatar)
+        except AvatarTooLarge as e:
+            raise HTTPException(status_code=413, detail=str(e))
+        except AvatarError as e:
+            raise HTTPException(status_code=400, detail=str(e))
     
     # Update profile
-    updated_user = profile_service.update_profile(
+    updated_user = await profile_service.update_profile(
         user_id=current_user_obj.id,
         full_name=full_name,
         bio=bio,
@@ -113,37 +104,37 @@ async def update_profile(
 
 # Follow/Unfollow routes
 @router.post("/{username}/follow")
-async def follow_user(request: Request, username: str, current_user: str = Depends(get_current_user), current_user_obj: User = Depends(get_current_user_obj), db: Session = Depends(get_db)):
+async def follow_user(request: Request, username: str, current_user: str = Depends(get_current_user), current_user_obj: CurrentUser = Depends(get_current_user_obj), db: AsyncSession = Depends(get_async_db)):
     """Follow a user"""
     if not current_user:
         raise HTTPException(status_code=401, detail="Not authenticated")
     
-    profile_service = ProfileService(db)
-    target_user = profile_service.get_user_by_username(username)
+    profile_service = AsyncProfileService(db)
+    target_user = await profile_service.get_user_by_username(username)
     if not target_user:
         raise HTTPException(status_code=404, detail="User not found")
     
     if current_user_obj.id == target_user.id:
         raise HTTPException(status_code=400, detail="Cannot follow yourself")
     
-    success = profile_service.follow_user(current_user_obj.id, target_user.id)
+    success = await profile_service.follow_user(current_user_obj.id, target_user.id)
     if not success:
         raise HTTPException(status_code=400, detail="Already following this user")
     
     return {"message": "Successfully followed user"}
 
 @router.post("/{username}/unfollow")
-async def unfollow_user(request: Request, username: str, current_user: str = Depends(get_current_user), current_user_obj: User = Depends(get_current_user_obj), db: Session = Depends(get_db)):
+async def unfollow_user(request: Request, username: str, current_user: str = Depends(get_current_user), current_user_obj: CurrentUser = Depends(get_current_user_obj), db: AsyncSession = Depends(get_async_db)):
     """Unfollow a user"""
     if not current_user:
         raise HTTPException(status_code=401, detail="Not authenticated")
     
-    profile_service = ProfileService(db)
-    target_user = profile_service.get_user_by_username(username)
+    profile_service = AsyncProfileService(db)
+    target_user = await profile_service.get_user_by_username(username)
     if not target_user:
         raise HTTPException(status_code=404, detail="User not found")
     
-    success = profile_service.unfollow_user(current_user_obj.id, target_user.id)
+    success = await profile_service.unfollow_user(current_user_obj.id, target_user.id)
     if not success:
         raise HTTPException(status_code=400, detail="Not following this user")
     
@@ -151,37 +142,45 @@ async def unfollow_user(request: Request, username: str, current_user: str = Dep
 
 # Followers/Following pages
 @router.get("/{username}/followers", response_class=HTMLResponse)
-async def view_followers(request: Request, username: str, current_user: str = Depends(get_current_user), current_user_obj: User = Depends(get_current_user_obj), db: Session = Depends(get_db)):
+async def view_followers(request: Request, username: str, cursor: Optional[str] = Query(None), current_user: str = Depends(get_current_user), current_user_obj: CurrentUser = Depends(get_current_user_obj), db: AsyncSession = Depends(get_async_db)):
     """View a user's followers"""
-    profile_service = ProfileService(db)
+    profile_service = AsyncProfileService(db)
     
-    profile_user = profile_service.get_user_by_username(username)
+    profile_user = await profile_service.get_user_by_username(username)
     if not profile_user:
         raise HTTPException(status_code=404, detail="User not found")
     
-    followers = profile_service.get_followers(profile_user.id)
+    try:
+        page = await profile_service.get_followers(profile_user.id, current_user_obj.id if current_user_obj else None, cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     
     return templates.TemplateResponse("followers.html", {
         "request": request,
         "profile_user": profile_user,
         "current_user": current_user_obj,
-        "followers": followers
+        "followers": page["users"],
+        "next_cursor": page["next_cursor"]
     })
 
 @router.get("/{username}/following", response_class=HTMLResponse)
-async def view_following(request: Request, username: str, current_user: str = Depends(get_current_user), current_user_obj: User = Depends(get_current_user_obj), db: Session = Depends(get_db)):
+async def view_following(request: Request, username: str, cursor: Optional[str] = Query(None), current_user: str = Depends(get_current_user), current_user_obj: CurrentUser = Depends(get_current_user_obj), db: AsyncSession = Depends(get_async_db)):
     """View who a user is following"""
-    profile_service = ProfileService(db)
+    profile_service = AsyncProfileService(db)
     
-    profile_user = profile_service.get_user_by_username(username)
+    profile_user = await profile_service.get_user_by_username(username)
     if not profile_user:
         raise HTTPException(status_code=404, detail="User not found")
     
-    following = profile_service.get_following(profile_user.id)
+    try:
+        page = await profile_service.get_following(profile_user.id, current_user_obj.id if current_user_obj else None, cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     
     return templates.TemplateResponse("following.html", {
         "request": request,
         "profile_user": profile_user,
         "current_user": current_user_obj,
-        "following": following
+        "following": page["users"],
+        "next_cursor": page["next_cursor"]
     }) 
\ No newline at end of file
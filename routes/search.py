@@ -1,48 +1,96 @@
-from fastapi import APIRouter, Depends, Request, Query
-from fastapi.responses import HTMLResponse
-from fastapi.templating import Jinja2Templates
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Request, Query
+from fastapi.responses import HTMLResponse, JSONResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Optional
 
-from core.database import get_db
+from core.database import get_async_db
 from fastapi import Cookie
-from core.auth import verify_token
-from models.user import User
-from services.profile_service import ProfileService
+from core.auth import CurrentUser, get_current_user, get_current_user_obj, token_username
+from core.templating import templates
+from services.profile_service import AsyncProfileService
+from services.post_service import AsyncPostService
 
 router = APIRouter(prefix="/search", tags=["search"])
-templates = Jinja2Templates(directory="templates")
-
-def get_current_user(access_token: str = Cookie(None), db: Session = Depends(get_db)):
-    if not access_token:
-        return None
-    username = verify_token(access_token)
-    if username:
-        user = db.query(User).filter(User.username == username).first()
-        return user.username if user else None
-    return None
-
-def get_current_user_obj(access_token: str = Cookie(None), db: Session = Depends(get_db)):
-    if not access_token:
-        return None
-    username = verify_token(access_token)
-    if username:
-        user = db.query(User).filter(User.username == username).first()
-        return user
-    return None
 
 @router.get("/", response_class=HTMLResponse)
-async def search_page(request: Request, q: Optional[str] = Query(None), current_user: str = Depends(get_current_user), current_user_obj: User = Depends(get_current_user_obj), db: Session = Depends(get_db)):
+async def search_page(
+    request: Request,
+    q: Optional[str] = Query(None),
+    type: str = Query("users", pattern="^(users|posts|comments)$"),
+    category: Optional[str] = Query(None),
+    author: Optional[str] = Query(None),
+    cursor: Optional[str] = Query(None),
+    current_user: str = Depends(get_current_user),
+    current_user_obj: CurrentUser = Depends(get_current_user_obj),
+    db: AsyncSession = Depends(get_async_db)
+):
     """Search page with results"""
-    profile_service = ProfileService(db)
+    profile_service = AsyncProfileService(db)
     
     results = []
+    next_cursor = None
     if q and current_user_obj:
-        results = profile_service.search_users(q, current_user_obj.id)
+        if type == "users":
+            results = await profile_service.search_users(q, current_user_obj.id)
+        else:
+            search = AsyncPostService.search_posts if type == "posts" else AsyncPostService.search_comments
+            try:
+                page = await search(db, q, current_user_obj.id, category or None, author or None, cursor)
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=str(e))
+            results, next_cursor = page[type], page["next_cursor"]
     
     return templates.TemplateResponse("search.html", {
         "request": request,
         "current_user": current_user_obj,
         "query": q,
-        "results": results
-    }) 
\ No newline at end of file
+        "type": type,
+        "category": category,
+        "author": author,
+        "results": results,
+        "next_cursor": next_cursor
+    })
+
+@router.get("/posts")
+async def search_posts(
+    q: str = Query(..., min_length=1, max_length=200),
+    category: Optional[str] = Query(None),
+    author: Optional[str] = Query(None),
+    cursor: Optional[str] = Query(None),
+    limit: int = Query(20, ge=1, le=100),
+    current_user_obj: CurrentUser = Depends(get_current_user_obj),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Full-text post search, ranked by relevance and recency; follow `next_cursor` for more"""
+    current_user_id = current_user_obj.id if current_user_obj else None
+    try:
+        page = await AsyncPostService.search_posts(db, q, current_user_id, category, author, cursor, limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return JSONResponse(page)
+
+@router.get("/comments")
+async def search_comments(
+    q: str = Query(..., min_length=1, max_length=200),
+    category: Optional[str] = Query(None),
+    author: Optional[str] = Query(None),
+    cursor: Optional[str] = Query(None),
+    limit: int = Query(20, ge=1, le=100),
+    current_user_obj: CurrentUser = Depends(get_current_user_obj),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Full-text comment search, ranked by relevance and recency; follow `next_cursor` for more"""
+    current_user_id = current_user_obj.id if current_user_obj else None
+    try:
+        page = await AsyncPostService.search_comments(db, q, current_user_id, category, author, cursor, limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return JSONResponse(page)
+
+@router.get("/suggest")
+async def suggest(q: str = Query("", max_length=64), limit: int = Query(8, ge=1, le=20), access_token: str = Cookie(None), db: AsyncSession = Depends(get_async_db)):
+    """Typeahead completions; the token is checked without loading the user to keep keystrokes cheap"""
+    if not access_token or not token_username(access_token) or not q.strip():
+        return JSONResponse({"results": []})
+    results = await AsyncProfileService(db).suggest_users(q, limit)
+    return JSONResponse({"results": results}, headers={"Cache-Control": "private, max-age=30"})
@@ -1,9 +1,8 @@
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from models.user import User
-from passlib.context import CryptContext
 from sqlalchemy.exc import IntegrityError
-
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+from core.passwords import pwd_context, password_hasher
 
 class AuthService:
     @staticmethod
@@ -17,6 +16,10 @@ class AuthService:
     @staticmethod
     def create_user(db: Session, username: str, email: str, password: str):
         hashed_password = AuthService.get_password_hash(password)
+        return AuthService._insert_user(db, username, email, hashed_password)
+
+    @staticmethod
+    def _insert_user(db: Session, username: str, email: str, hashed_password: str):
         user = User(username=username, email=email, hashed_password=hashed_password)
         db.add(user)
         try:
@@ -31,11 +34,49 @@ class AuthService:
                 return None, "Email already exists."
             return None, "Registration failed."
 
+    @staticmethod
+    def _find_user(db: Session, username_or_email: str):
+        return db.query(User).filter((User.username == username_or_email) | (User.email == username_or_email)).first()
+
+    @staticmethod
+    def _store_rehash(db: Session, user: User, hashed_password: str):
+        """Replace a hash made with outdated parameters (e.g. an old BCRYPT_ROUNDS)"""
+        user.hashed_password = hashed_password
+        db.commit()
+
     @staticmethod
     def authenticate_user(db: Session, username_or_email: str, password: str):
-        user = db.query(User).filter((User.username == username_or_email) | (User.email == username_or_email)).first()
+        user = AuthService._find_user(db, username_or_email)
+        if not user:
+            return None, "User not found."
+        matches, new_hash = pwd_context.verify_and_update(password, user.hashed_password)
+        if not matches:
+            return None, "Incorrect password."
+        if new_hash:
+            AuthService._store_rehash(db, user, new_hash)
+        return user, None
+
+class AsyncAuthService:
+    """AuthService for async handlers: bcrypt runs on the password hasher's threads, never on the request threadpool.
+
+    Both methods raise core.passwords.PasswordHasherBusy when the hashing queue is full.
+    """
+
+    @staticmethod
+    async def create_user(db: AsyncSession, username: str, email: str, password: str):
+        hashed_password = await password_hasher.hash(password)
+        return await db.run_sync(AuthService._insert_user, username, email, hashed_password)
+
+    @staticmethod
+    async def authenticate_user(db: AsyncSession, username_or_email: str, password: str):
+        user = await db.run_sync(AuthService._find_user, username_or_email)
         if not user:
             return None, "User not found."
-        if not AuthService.verify_password(password, user.hashed_password):
+        # End the read so the connection goes back to the pool while bcrypt runs (the user stays loaded)
+        await db.commit()
+        matches, new_hash = await password_hasher.verify(password, user.hashed_password)
+        if not matches:
             return None, "Incorrect password."
-        return user, None 
\ No newline at end of file
+        if new_hash:
+            await db.run_sync(AuthService._store_rehash, user, new_hash)
+        return user, None
@@ -1,11 +1,16 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import func, and_, or_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import func, and_, or_, select, update, Row
 from typing import List, Optional, Dict, Any
 import re
 
-from models.category import Category, CategoryMember
+from models.category import Category, CategoryMember, CategorySuggestion
 from models.user import User
-from models.post import Post, PostLike, Comment
+from models.post import Post
+from core.pagination import encode_cursor, decode_cursor
+from services.post_service import PostService
+from services.search_service import SearchService
+from services.suggestion_service import SuggestionService
 
 class CategoryService:
     def __init__(self, db: Session):
@@ -31,7 +36,8 @@ class CategoryService:
             rules=rules,
             is_public=is_public,
             is_nsfw=is_nsfw,
-            created_by=created_by
+            created_by=created_by,
+            members_count=1
         )
         
         self.db.add(category)
@@ -45,7 +51,9 @@ class CategoryService:
             role="admin"
         )
         self.db.add(member)
+        SuggestionService.refresh_user_categories(self.db, created_by)
         self.db.commit()
+        SearchService.index_category(category)
         
         return category
     
@@ -76,6 +84,31 @@ class CategoryService:
         
         return query.order_by(Category.display_name).all()
     
+    def get_suggested_categories(self, user_id: int, limit: int = 6) -> List[Category]:
+        """Precomputed suggestions for the user, best first"""
+        return self.db.query(Category).join(CategorySuggestion, CategorySuggestion.category_id == Category.id).filter(
+            CategorySuggestion.user_id == user_id
+        ).order_by(CategorySuggestion.score.desc()).limit(limit).all()
+    
+    def get_category_counts(self, category_ids: List[int]) -> Dict[int, Dict[str, int]]:
+        """Post and member counts for a page of categories in two grouped queries"""
+        counts = {category_id: {"posts": 0, "members": 0} for category_id in category_ids}
+        if not category_ids:
+            return counts
+        
+        posts = self.db.query(Post.category_id, func.count(Post.id)).filter(
+            Post.category_id.in_(category_ids)
+        ).group_by(Post.category_id).all()
+        members = self.db.query(CategoryMember.category_id, func.count(CategoryMember.id)).filter(
+            CategoryMember.category_id.in_(category_ids)
+        ).group_by(CategoryMember.category_id).all()
+        
+        for category_id, total in posts:
+            counts[category_id]["posts"] = total
+        for category_id, total in members:
+            counts[category_id]["members"] = total
+        return counts
+    
     def get_user_categories(self, user_id: int) -> List[Category]:
         """Get categories where user is a member"""
         return self.db.query(Category).join(CategoryMember).filter(
@@ -100,6 +133,8 @@ class CategoryService:
         # Add member
         member = CategoryMember(user_id=user_id, category_id=category_id)
         self.db.add(member)
+        self._bump_members_count(category_id, 1)
+        SuggestionService.refresh_user_categories(self.db, user_id)
         self.db.commit()
         return True
     
@@ -117,8 +152,20 @@ class CategoryService:
             return False
         
         self.db.delete(member)
+        self._bump_members_count(category_id, -1)
+        SuggestionService.refresh_user_categories(self.db, user_id)
         self.db.commit()
         return True
+
+    def _bump_members_count(self, category_id: int, delta: int):
+        """Adjust the member counter in the database (no read-modify-write)"""
+        stmt = update(Category).where(Category.id == category_id)
+        if delta < 0:
+            stmt = stmt.where(Category.members_count > 0)
+        self.db.execute(
+            stmt.values(members_count=func.coalesce(Category.members_count, 0) + delta)
+            .execution_options(synchronize_session=False)
+        )
     
     def get_category_members(self, category_id: int) -> List[Dict[str, Any]]:
         """Get all members of a category"""
@@ -174,43 +221,91 @@ class CategoryService:
         
         return category.is_public or self.is_member(user_id, category_id)
     
-    def get_category_posts(self, category_id: int, limit: int = 20) -> List[Post]:
-        """Get posts from a category"""
-        posts = self.db.query(Post).filter(Post.category_id == category_id).order_by(
-            Post.created_at.desc()
-        ).limit(limit).all()
-        
-        # Add like and comment counts
-        for post in posts:
-            post.likes_count = self.db.query(PostLike).filter(PostLike.post_id == post.id).count()
-            post.comments_count = self.db.query(Comment).filter(Comment.post_id == post.id).count()
-        
-        return posts
+    def get_category_posts(self, category_id: int, limit: int = 20) -> List[Row]:
+        """Get latest posts from a category with their authors and stored counts"""
+        return PostService.list_posts(self.db, Post.category_id == category_id, limit=limit)
     
-    def search_categories(self, query: str, user_id: Optional[int] = None) -> List[Category]:
-        """Search categories by name or description"""
-        search_query = self.db.query(Category).filter(
-            and_(
-                Category.is_public == True,
-                or_(
-                    Category.name.ilike(f"%{query}%"),
-                    Category.display_name.ilike(f"%{query}%"),
-                    Category.description.ilike(f"%{query}%")
-                )
-            )
-        )
-        
-        if user_id:
-            # Also include private categories where user is a member
-            member_categories = self.db.query(CategoryMember.category_id).filter(
-                CategoryMember.user_id == user_id
-            ).subquery()
-            
-            search_query = search_query.filter(
-                or_(
-                    Category.is_public == True,
-                    Category.id.in_(member_categories)
-                )
-            )
-        
-        return search_query.order_by(Category.display_name).all() 
\ No newline at end of file
+    def search_categories(self, query: str, user_id: Optional[int] = None, cursor: Optional[str] = None,
+                          limit: int = 20) -> Dict[str, Any]:
+        """A cursor-paginated page of categories ranked by relevance, member count and recent activity.
+
+        Rankings are cached per query and shared; private categories only show up for their members.
+        """
+        after = decode_cursor(cursor, float, int)
+        ranked = SearchService.rank_categories(self.db, query)
+        private_ids = set()
+        if user_id and not all(is_public for _, _, is_public in ranked):
+            private_ids = set(self.db.scalars(
+                select(CategoryMember.category_id).join(Category, Category.id == CategoryMember.category_id)
+                .where(CategoryMember.user_id == user_id, Category.is_public == False)
+            ))
+        page = [
+            (score, category_id) for score, category_id, is_public in ranked
+            if (is_public or category_id in private_ids) and (after is None or (score, category_id) < after)
+        ][:limit + 1]
+        has_more = len(page) > limit
+        page = page[:limit]
+        categories = {category.id: category for category in self.db.query(Category).filter(
+            Category.id.in_([category_id for _, category_id in page])
+        )} if page else {}
+        return {
+            "categories": [categories[category_id] for _, category_id in page if category_id in categories],
+            "next_cursor": encode_cursor(*page[-1]) if has_more else None
+        }
+
+    def recount_categories(self) -> None:
+        """Recompute the denormalized member counts and last post times from scratch"""
+        self.db.execute(update(Category).values(
+            members_count=select(func.count(CategoryMember.id)).where(CategoryMember.category_id == Category.id).scalar_subquery(),
+            last_post_at=select(func.max(Post.created_at)).where(Post.category_id == Category.id).scalar_subquery()
+        ))
+        self.db.commit()
+
+class AsyncCategoryService:
+    """CategoryService for async handlers: queries run on the async engine without blocking the event loop"""
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def _call(self, method: str, *args, **kwargs):
+        return await self.db.run_sync(lambda session: getattr(CategoryService(session), method)(*args, **kwargs))
+
+    async def create_category(self, **kwargs) -> Optional[Category]:
+        return await self._call("create_category", **kwargs)
+
+    async def get_category_by_name(self, name: str) -> Optional[Category]:
+        return await self._call("get_category_by_name", name)
+
+    async def get_all_categories(self, user_id: Optional[int] = None) -> List[Category]:
+        return await self._call("get_all_categories", user_id)
+
+    async def get_suggested_categories(self, user_id: int, limit: int = 6) -> List[Category]:
+        return await self._call("get_suggested_categories", user_id, limit)
+
+    async def get_category_counts(self, category_ids: List[int]) -> Dict[int, Dict[str, int]]:
+        return await self._call("get_category_counts", category_ids)
+
+    async def join_category(self, user_id: int, category_id: int) -> bool:
+        return await self._call("join_category", user_id, category_id)
+
+    async def leave_category(self, user_id: int, category_id: int) -> bool:
+        return await self._call("leave_category", user_id, category_id)
+
+    async def get_category_members(self, category_id: int) -> List[Dict[str, Any]]:
+        return await self._call("get_category_members", category_id)
+
+    async def get_category_stats(self, category_id: int) -> Dict[str, Any]:
+        return await self._call("get_category_stats", category_id)
+
+    async def is_member(self, user_id: int, category_id: int) -> bool:
+        return await self._call("is_member", user_id, category_id)
+
+    async def get_user_role(self, user_id: int, category_id: int) -> Optional[str]:
+        return await self._call("get_user_role", user_id, category_id)
+
+    async def get_category_posts(self, category_id: int, limit: int = 20) -> List[Row]:
+        return await self._call("get_category_posts", category_id, limit)
+
+    async def search_categories(self, query: str, user_id: Optional[int] = None, cursor: Optional[str] = None,
+                                limit: int = 20) -> Dict[str, Any]:
+        return await self._call("search_categories", query, user_id, cursor, limit)
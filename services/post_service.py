@@ -1,58 +1,90 @@
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import update, delete, func, select
 from models.post import Post, PostLike, Comment, CommentLike
 from models.user import User
+from models.category import Category
 from datetime import datetime, timezone
+from typing import Optional
 import asyncio
 from ai import AIManager
+from core.database import insert_ignore
+from core.events import event_bus
+from core.pagination import encode_cursor, decode_cursor, after_keyset
+from services.ranking_service import RankingService
+from services.related_posts_service import RelatedPostsService
+from services.search_service import SearchService
+from services.user_stats_service import UserStatsService
 
 class PostService:
     @staticmethod
     async def create_post_with_ai_analysis(db: Session, content: str, user_id: int, category_id: int = None):
         """Create post with automatic AI analysis"""
+        # Create the post first
+        post = PostService._insert_post(db, content, user_id, category_id)
+        
         try:
-            # Create the post first
-            post = Post(content=content, user_id=user_id, category_id=category_id)
-            db.add(post)
-            db.commit()
-            db.refresh(post)
-            
             # Perform AI analysis
             ai_manager = AIManager()
             analysis = await ai_manager.analyze_post(content)
-            
-            # Update post with AI analysis results
-            post.ai_analysis = analysis
-            post.moderation_score = int(analysis["moderation"]["confidence"] * 100)
-            post.sentiment_score = int(analysis["sentiment"]["sentiment_score"] * 100)
-            post.content_summary = analysis["summary"]["summary"]
-            post.is_ai_processed = 1
-            
-            db.commit()
-            
-            # Check for content warnings
-            warnings = PostService._check_content_warnings(analysis)
-            
-            return {
-                "post": post,
-                "analysis": analysis,
-                "warnings": warnings,
-                "is_appropriate": analysis["moderation"]["is_appropriate"]
-            }
-            
+            PostService._store_post_analysis(db, post, analysis)
         except Exception as e:
-            # If AI analysis fails, still create the post but mark as not processed
-            post = Post(content=content, user_id=user_id, category_id=category_id)
-            post.is_ai_processed = 0
-            db.add(post)
-            db.commit()
-            db.refresh(post)
-            
-            return {
-                "post": post,
-                "analysis": None,
-                "warnings": ["AI analysis unavailable"],
-                "is_appropriate": True  # Default to appropriate if AI fails
-            }
+            # If AI analysis fails, keep the post but leave it marked as not processed
+            PostService._discard_analysis(db, post)
+            return PostService._unanalyzed_result("post", post)
+        
+        return PostService._analysis_result("post", post, analysis)
+
+    @staticmethod
+    def _insert_post(db: Session, content: str, user_id: int, category_id: int = None) -> Post:
+        post = Post(content=content, user_id=user_id, category_id=category_id)
+        post.is_ai_processed = 0
+        RankingService.apply_hot_score(post)
+        db.add(post)
+        PostService._touch_category(db, category_id)
+        UserStatsService.bump(db, user_id, posts_count=1)
+        db.commit()
+        db.refresh(post)
+        SearchService.index_post(post)
+        RelatedPostsService.index_post(post)
+        PostService._publish_post_created(post)
+        return post
+
+    @staticmethod
+    def _store_post_analysis(db: Session, post: Post, analysis: dict):
+        """Update post with AI analysis results"""
+        post.ai_analysis = analysis
+        post.moderation_score = int(analysis["moderation"]["confidence"] * 100)
+        post.sentiment_score = int(analysis["sentiment"]["sentiment_score"] * 100)
+        post.content_summary = analysis["summary"]["summary"]
+        post.is_ai_processed = 1
+        RankingService.apply_hot_score(post)
+        db.commit()
+
+    @staticmethod
+    def _analysis_result(kind: str, obj, analysis: dict) -> dict:
+        return {
+            kind: obj,
+            "analysis": analysis,
+            # Check for content warnings
+            "warnings": PostService._check_content_warnings(analysis),
+            "is_appropriate": analysis["moderation"]["is_appropriate"]
+        }
+
+    @staticmethod
+    def _discard_analysis(db: Session, obj):
+        """Roll back a failed analysis and reload the already committed row, which the rollback expired"""
+        db.rollback()
+        db.refresh(obj)
+
+    @staticmethod
+    def _unanalyzed_result(kind: str, obj) -> dict:
+        return {
+            kind: obj,
+            "analysis": None,
+            "warnings": ["AI analysis unavailable"],
+            "is_appropriate": True  # Default to appropriate if AI fails
+        }
     
     @staticmethod
     def _check_content_warnings(analysis: dict) -> list:
@@ -93,14 +125,26 @@ class PostService:
     def create_post(db: Session, content: str, user_id: int, category_id: int = None):
         """Legacy method - use create_post_with_ai_analysis instead"""
         post = Post(content=content, user_id=user_id, category_id=category_id)
+        RankingService.apply_hot_score(post)
         db.add(post)
+        PostService._touch_category(db, category_id)
+        UserStatsService.bump(db, user_id, posts_count=1)
         db.commit()
         db.refresh(post)
+        SearchService.index_post(post)
+        RelatedPostsService.index_post(post)
+        PostService._publish_post_created(post)
         return post
 
     @staticmethod
-    def get_posts_with_users(db: Session, current_user_id: int = None, limit: int = 50):
-        posts = db.query(Post, User).join(User).order_by(Post.created_at.desc()).limit(limit).all()
+    def get_posts_with_users(db: Session, current_user_id: int = None, limit: int = 50, sort: str = "recent"):
+        query = db.query(Post, User).join(User)
+        if sort == "hot":
+            # Top-N straight off the hot_score index
+            query = query.order_by(Post.hot_score.desc(), Post.id.desc())
+        else:
+            query = query.order_by(Post.created_at.desc())
+        posts = query.limit(limit).all()
         return [
             {
                 "id": post.id,
@@ -150,116 +194,156 @@ class PostService:
 
     @staticmethod
     def delete_post(db: Session, post_id: int, user_id: int):
-        post = db.query(Post).filter(Post.id == post_id, Post.user_id == user_id).first()
+        # Lock the post before the author's stats row, the order likes and comments take them in; the lock
+        # also keeps the counts read here from missing a like that lands before the delete
+        post = db.query(Post).filter(Post.id == post_id, Post.user_id == user_id).with_for_update().first()
         if post:
+            # Likes and comments on the post go with it
+            UserStatsService.bump(
+                db, user_id, posts_count=-1,
+                likes_received=-(post.likes_count or 0), comments_received=-(post.comments_count or 0)
+            )
             db.delete(post)
             db.commit()
+            SearchService.remove_post(post_id)
+            RelatedPostsService.remove_post(post_id)
             return True
         return False
 
     @staticmethod
     def like_post(db: Session, user_id: int, post_id: int):
-        # Check if already liked
-        existing = db.query(PostLike).filter_by(user_id=user_id, post_id=post_id).first()
-        if existing:
+        # The unique (user_id, post_id) constraint makes a concurrent double like a no-op
+        if not insert_ignore(db, PostLike, user_id=user_id, post_id=post_id):
+            db.rollback()
             return False  # Already liked
-        like = PostLike(user_id=user_id, post_id=post_id)
-        db.add(like)
-        # Increment likes_count
-        post = db.query(Post).filter_by(id=post_id).first()
-        if post:
-            post.likes_count = (post.likes_count or 0) + 1
+        counters = PostService._bump_post_counter(db, post_id, Post.likes_count, 1)
+        if counters:
+            UserStatsService.bump(db, counters.user_id, likes_received=1)
         db.commit()
+        PostService._publish_post_counts(counters)
         return True
 
     @staticmethod
     def unlike_post(db: Session, user_id: int, post_id: int):
-        like = db.query(PostLike).filter_by(user_id=user_id, post_id=post_id).first()
-        if not like:
+        deleted = db.execute(
+            delete(PostLike).where(PostLike.user_id == user_id, PostLike.post_id == post_id)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        if not deleted:
+            db.rollback()
             return False  # Not liked
-        db.delete(like)
-        # Decrement likes_count
-        post = db.query(Post).filter_by(id=post_id).first()
-        if post and post.likes_count:
-            post.likes_count = max(0, post.likes_count - 1)
+        counters = PostService._bump_post_counter(db, post_id, Post.likes_count, -1)
+        if counters:
+            UserStatsService.bump(db, counters.user_id, likes_received=-1)
         db.commit()
+        PostService._publish_post_counts(counters)
         return True
 
+    @staticmethod
+    def _bump_post_counter(db: Session, post_id: int, counter, delta: int):
+        """Adjust a post counter in the database (no read-modify-write) and re-rank the post"""
+        stmt = update(Post).where(Post.id == post_id)
+        if delta < 0:
+            stmt = stmt.where(counter > 0)
+        row = db.execute(
+            stmt.values({counter: func.coalesce(counter, 0) + delta})
+            .returning(
+                Post.id, Post.likes_count, Post.comments_count, Post.sentiment_score, Post.moderation_score,
+                Post.created_at, Post.category_id, Post.user_id
+            )
+            .execution_options(synchronize_session=False)
+        ).first()
+        if row:
+            RankingService.update_hot_score(db, row)
+        return row
+
+    @staticmethod
+    def _touch_category(db: Session, category_id: Optional[int]):
+        """Record category activity for discovery ranking"""
+        if category_id:
+            db.execute(
+                update(Category).where(Category.id == category_id).values(last_post_at=func.now())
+                .execution_options(synchronize_session=False)
+            )
+
+    @staticmethod
+    def _publish_post_created(post: Post):
+        event_bus.publish({"type": "post_created", "id": post.id, "user_id": post.user_id, "category_id": post.category_id})
+
+    @staticmethod
+    def _publish_post_counts(counters):
+        """Push absolute counters so clients (and per-connection coalescing) can simply overwrite"""
+        if counters:
+            event_bus.publish({"type": "post_counts", "id": counters.id, "likes": counters.likes_count, "comments": counters.comments_count})
+
+    @staticmethod
+    def _publish_comment_created(comment: Comment, counters):
+        event_bus.publish({"type": "comment_created", "id": comment.id, "post_id": comment.post_id, "parent_id": comment.parent_id})
+        PostService._publish_post_counts(counters)
+
     @staticmethod
     def has_liked_post(db: Session, user_id: int, post_id: int) -> bool:
         return db.query(PostLike).filter_by(user_id=user_id, post_id=post_id).first() is not None
 
     @staticmethod
-    async def create_comment_with_ai_analysis(db: Session, content: str, user_id: int, post_id: int):
+    async def create_comment_with_ai_analysis(db: Session, content: str, user_id: int, post_id: int, parent_id: int = None):
         """Create comment with automatic AI analysis"""
+        # Create the comment first
+        comment = PostService._insert_comment(db, content, user_id, post_id, parent_id)
+        
         try:
-            # Create the comment first
-            comment = Comment(content=content, user_id=user_id, post_id=post_id)
-            db.add(comment)
-            # Increment comments_count
-            post = db.query(Post).filter_by(id=post_id).first()
-            if post:
-                post.comments_count = (post.comments_count or 0) + 1
-            db.commit()
-            db.refresh(comment)
-            
             # Perform AI analysis
             ai_manager = AIManager()
             analysis = await ai_manager.analyze_post(content)
-            
-            # Update comment with AI analysis results
-            comment.ai_analysis = analysis
-            comment.moderation_score = int(analysis["moderation"]["confidence"] * 100)
-            comment.sentiment_score = int(analysis["sentiment"]["sentiment_score"] * 100)
-            comment.is_ai_processed = 1
-            
-            db.commit()
-            
-            # Check for content warnings
-            warnings = PostService._check_content_warnings(analysis)
-            
-            return {
-                "comment": comment,
-                "analysis": analysis,
-                "warnings": warnings,
-                "is_appropriate": analysis["moderation"]["is_appropriate"]
-            }
-            
+            PostService._store_comment_analysis(db, comment, analysis)
         except Exception as e:
-            # If AI analysis fails, still create the comment but mark as not processed
-            comment = Comment(content=content, user_id=user_id, post_id=post_id)
-            comment.is_ai_processed = 0
-            db.add(comment)
-            # Increment comments_count
-            post = db.query(Post).filter_by(id=post_id).first()
-            if post:
-                post.comments_count = (post.comments_count or 0) + 1
-            db.commit()
-            db.refresh(comment)
-            
-            return {
-                "comment": comment,
-                "analysis": None,
-                "warnings": ["AI analysis unavailable"],
-                "is_appropriate": True
-            }
+            # If AI analysis fails, keep the comment but leave it marked as not processed
+            PostService._discard_analysis(db, comment)
+            return PostService._unanalyzed_result("comment", comment)
+        
+        return PostService._analysis_result("comment", comment, analysis)
+
+    @staticmethod
+    def _insert_comment(db: Session, content: str, user_id: int, post_id: int, parent_id: int = None) -> Comment:
+        comment = Comment(content=content, user_id=user_id, post_id=post_id, parent_id=parent_id)
+        comment.is_ai_processed = 0
+        db.add(comment)
+        counters = PostService._bump_post_counter(db, post_id, Post.comments_count, 1)
+        if counters:
+            UserStatsService.bump(db, counters.user_id, comments_received=1)
+        db.commit()
+        db.refresh(comment)
+        SearchService.index_comment(comment, counters.category_id if counters else None)
+        PostService._publish_comment_created(comment, counters)
+        return comment
+
+    @staticmethod
+    def _store_comment_analysis(db: Session, comment: Comment, analysis: dict):
+        """Update comment with AI analysis results"""
+        comment.ai_analysis = analysis
+        comment.moderation_score = int(analysis["moderation"]["confidence"] * 100)
+        comment.sentiment_score = int(analysis["sentiment"]["sentiment_score"] * 100)
+        comment.is_ai_processed = 1
+        db.commit()
 
     @staticmethod
     def create_comment(db: Session, content: str, user_id: int, post_id: int):
         """Legacy method - use create_comment_with_ai_analysis instead"""
         comment = Comment(content=content, user_id=user_id, post_id=post_id)
         db.add(comment)
-        # Increment comments_count
-        post = db.query(Post).filter_by(id=post_id).first()
-        if post:
-            post.comments_count = (post.comments_count or 0) + 1
+        counters = PostService._bump_post_counter(db, post_id, Post.comments_count, 1)
+        if counters:
+            UserStatsService.bump(db, counters.user_id, comments_received=1)
         db.commit()
         db.refresh(comment)
+        SearchService.index_comment(comment, counters.category_id if counters else None)
+        PostService._publish_comment_created(comment, counters)
         return comment
 
     @staticmethod
     def get_comments_for_post(db: Session, post_id: int, current_user_id: int = None):
         comments = db.query(Comment, User).join(User).filter(Comment.post_id == post_id).order_by(Comment.created_at.asc()).all()
+        liked_ids = PostService._liked_comment_ids(db, current_user_id, [comment.id for comment, _ in comments])
         return [
             {
                 "id": comment.id,
@@ -268,7 +352,7 @@ class PostService:
                 "time": PostService.format_time(comment.created_at),
                 "user_id": comment.user_id,
                 "likes": comment.likes_count,
-                "liked": PostService.has_liked_comment(db, current_user_id, comment.id) if current_user_id else False,
+                "liked": comment.id in liked_ids,
                 "ai_processed": bool(comment.is_ai_processed),
                 "moderation_score": comment.moderation_score,
                 "sentiment_score": comment.sentiment_score,
@@ -292,44 +376,68 @@ class PostService:
 
     @staticmethod
     def delete_comment(db: Session, comment_id: int, user_id: int):
-        comment = db.query(Comment).filter(Comment.id == comment_id, Comment.user_id == user_id).first()
-        if comment:
-            # Decrement comments_count
-            post = db.query(Post).filter_by(id=comment.post_id).first()
-            if post and post.comments_count:
-                post.comments_count = max(0, post.comments_count - 1)
-            db.delete(comment)
-            db.commit()
-            return True
-        return False
+        comment = db.query(Comment.post_id).filter(Comment.id == comment_id, Comment.user_id == user_id).first()
+        if not comment:
+            return False
+        db.execute(delete(CommentLike).where(CommentLike.comment_id == comment_id).execution_options(synchronize_session=False))
+        # Replies stay visible as top-level comments, as before
+        db.execute(update(Comment).where(Comment.parent_id == comment_id).values(parent_id=None).execution_options(synchronize_session=False))
+        # Only the request that actually removes the row may decrement the counter
+        deleted = db.execute(
+            delete(Comment).where(Comment.id == comment_id, Comment.user_id == user_id)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        if not deleted:
+            db.rollback()
+            return False
+        counters = PostService._bump_post_counter(db, comment.post_id, Post.comments_count, -1)
+        if counters:
+            UserStatsService.bump(db, counters.user_id, comments_received=-1)
+        db.commit()
+        SearchService.remove_comment(comment_id)
+        event_bus.publish({"type": "comment_deleted", "id": comment_id, "post_id": comment.post_id})
+        PostService._publish_post_counts(counters)
+        return True
 
     @staticmethod
     def like_comment(db: Session, user_id: int, comment_id: int):
-        existing = db.query(CommentLike).filter_by(user_id=user_id, comment_id=comment_id).first()
-        if existing:
+        if not insert_ignore(db, CommentLike, user_id=user_id, comment_id=comment_id):
+            db.rollback()
             return False  # Already liked
-        like = CommentLike(user_id=user_id, comment_id=comment_id)
-        db.add(like)
-        # Increment likes_count
-        comment = db.query(Comment).filter_by(id=comment_id).first()
-        if comment:
-            comment.likes_count = (comment.likes_count or 0) + 1
+        likes = db.execute(
+            update(Comment).where(Comment.id == comment_id)
+            .values(likes_count=func.coalesce(Comment.likes_count, 0) + 1)
+            .returning(Comment.likes_count)
+            .execution_options(synchronize_session=False)
+        ).scalar()
         db.commit()
+        PostService._publish_comment_likes(comment_id, likes)
         return True
 
     @staticmethod
     def unlike_comment(db: Session, user_id: int, comment_id: int):
-        like = db.query(CommentLike).filter_by(user_id=user_id, comment_id=comment_id).first()
-        if not like:
+        deleted = db.execute(
+            delete(CommentLike).where(CommentLike.user_id == user_id, CommentLike.comment_id == comment_id)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        if not deleted:
+            db.rollback()
             return False  # Not liked
-        db.delete(like)
-        # Decrement likes_count
-        comment = db.query(Comment).filter_by(id=comment_id).first()
-        if comment and comment.likes_count:
-            comment.likes_count = max(0, comment.likes_count - 1)
+        likes = db.execute(
+            update(Comment).where(Comment.id == comment_id, Comment.likes_count > 0)
+            .values(likes_count=Comment.likes_count - 1)
+            .returning(Comment.likes_count)
+            .execution_options(synchronize_session=False)
+        ).scalar()
         db.commit()
+        PostService._publish_comment_likes(comment_id, likes)
         return True
 
+    @staticmethod
+    def _publish_comment_likes(comment_id: int, likes: Optional[int]):
+        if likes is not None:
+            event_bus.publish({"type": "comment_likes", "id": comment_id, "likes": likes})
+
     @staticmethod
     def has_liked_comment(db: Session, user_id: int, comment_id: int) -> bool:
         return db.query(CommentLike).filter_by(user_id=user_id, comment_id=comment_id).first() is not None
@@ -338,26 +446,299 @@ class PostService:
     def create_reply(db: Session, content: str, user_id: int, post_id: int, parent_id: int):
         reply = Comment(content=content, user_id=user_id, post_id=post_id, parent_id=parent_id)
         db.add(reply)
-        # Increment comments_count on the post
-        post = db.query(Post).filter_by(id=post_id).first()
-        if post:
-            post.comments_count = (post.comments_count or 0) + 1
+        counters = PostService._bump_post_counter(db, post_id, Post.comments_count, 1)
+        if counters:
+            UserStatsService.bump(db, counters.user_id, comments_received=1)
         db.commit()
         db.refresh(reply)
+        SearchService.index_comment(reply, counters.category_id if counters else None)
+        PostService._publish_comment_created(reply, counters)
         return reply
 
     @staticmethod
-    def get_replies_for_comment(db: Session, comment_id: int, current_user_id: int = None):
-        replies = db.query(Comment, User).join(User).filter(Comment.parent_id == comment_id).order_by(Comment.created_at.asc()).all()
-        return [
-            {
-                "id": reply.id,
-                "content": reply.content,
-                "user": user.username,
-                "time": PostService.format_time(reply.created_at),
-                "user_id": reply.user_id,
-                "likes": reply.likes_count,
-                "liked": PostService.has_liked_comment(db, current_user_id, reply.id) if current_user_id else False
-            }
-            for reply, user in replies
-        ] 
\ No newline at end of file
+    def _listing_columns():
+        """Columns needed to list a post with its author (skips the ai_analysis JSON)"""
+        return (
+            Post.id, Post.content, Post.user_id, Post.category_id, Post.created_at, Post.likes_count,
+            Post.comments_count, User.username
+        )
+
+    @staticmethod
+    def list_posts(db: Session, *criteria, limit: int = 20) -> list:
+        """Newest posts matching `criteria` with their authors in one query, as read-only rows"""
+        return db.query(*PostService._listing_columns()).join(User, Post.user_id == User.id).filter(
+            *criteria
+        ).order_by(Post.created_at.desc()).limit(limit).all()
+
+    @staticmethod
+    def get_related_posts(db: Session, post_id: int, limit: int = 5) -> Optional[list]:
+        """Similar recent posts as listing rows, most similar first; None when the post does not exist"""
+        ranked = RelatedPostsService.related_ids(db, post_id, limit)
+        if not ranked:
+            return ranked
+        rows = {row.id: row for row in db.query(*PostService._listing_columns()).join(User, Post.user_id == User.id).filter(
+            Post.id.in_(ranked)
+        )}
+        return [rows[id_] for id_ in ranked if id_ in rows]
+
+    @staticmethod
+    def get_post(db: Session, post_id: int):
+        """One post with its author as a listing row, or None"""
+        return db.query(*PostService._listing_columns()).join(User, Post.user_id == User.id).filter(Post.id == post_id).first()
+
+    @staticmethod
+    def can_view_category(db: Session, category_id: Optional[int], user_id: Optional[int]) -> bool:
+        """Posts without a category or in a public one are open to everyone; a private category's only to its members"""
+        if category_id is None:
+            return True
+        return db.scalar(select(Category.id).where(
+            Category.id == category_id, Category.id.not_in(SearchService.hidden_categories(user_id))
+        )) is not None
+
+    @staticmethod
+    def comments_version(db: Session, *criteria) -> tuple:
+        """Version marker for the comments matching `criteria`, for ETags.
+
+        Changes when one is added, deleted or reparented (count, max id), liked or unliked (like total, newest
+        like, so one user's like and another's unlike don't cancel out) or finishes AI analysis.
+        """
+        counts = db.query(
+            func.count(Comment.id), func.max(Comment.id), func.sum(Comment.likes_count), func.sum(Comment.is_ai_processed)
+        ).filter(*criteria).one()
+        newest_like = db.query(func.max(CommentLike.id)).join(Comment, CommentLike.comment_id == Comment.id).filter(*criteria).scalar()
+        return tuple(counts) + (newest_like,)
+
+    @staticmethod
+    def _thread_columns():
+        """Columns needed to render a comment (skips the ai_analysis JSON)"""
+        return (
+            Comment.id, Comment.content, Comment.user_id, Comment.parent_id, Comment.created_at, Comment.likes_count,
+            Comment.is_ai_processed, Comment.moderation_score, Comment.sentiment_score, User.username
+        )
+
+    @staticmethod
+    def _liked_comment_ids(db: Session, current_user_id: Optional[int], comment_ids: list) -> set:
+        """One query for the liked state of a whole page of comments"""
+        if not current_user_id or not comment_ids:
+            return set()
+        rows = db.query(CommentLike.comment_id).filter(
+            CommentLike.user_id == current_user_id, CommentLike.comment_id.in_(comment_ids)
+        ).all()
+        return {row.comment_id for row in rows}
+
+    @staticmethod
+    def _serialize_thread_comment(row, liked_ids: set) -> dict:
+        return {
+            "id": row.id,
+            "content": row.content,
+            "user": row.username,
+            "time": PostService.format_time(row.created_at),
+            "user_id": row.user_id,
+            "parent_id": row.parent_id,
+            "likes": row.likes_count,
+            "liked": row.id in liked_ids,
+            "ai_processed": bool(row.is_ai_processed),
+            "moderation_score": row.moderation_score,
+            "sentiment_score": row.sentiment_score,
+            "warnings": PostService._get_comment_warnings(row) if row.is_ai_processed else []
+        }
+
+    @staticmethod
+    def get_comment_thread(db: Session, post_id: int, current_user_id: int = None, cursor: str = None,
+                           limit: int = 20, replies_limit: int = 3) -> dict:
+        """A page of top-level comments, each with its first few replies and a reply count.
+
+        Three queries regardless of page size or thread length: the top-level page,
+        the first `replies_limit` replies per comment (window function), and liked state.
+        """
+        query = db.query(*PostService._thread_columns()).join(User, Comment.user_id == User.id).filter(
+            Comment.post_id == post_id, Comment.parent_id.is_(None)
+        )
+        after = decode_cursor(cursor, datetime, int)
+        if after:
+            query = query.filter(after_keyset(db.get_bind().dialect.name, Comment.created_at, Comment.id, after))
+        rows = query.order_by(Comment.created_at, Comment.id).limit(limit + 1).all()
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+
+        replies_by_parent = {row.id: [] for row in rows}
+        reply_counts = {}
+        if rows and replies_limit > 0:
+            ranked = db.query(
+                *PostService._thread_columns(),
+                func.row_number().over(partition_by=Comment.parent_id, order_by=(Comment.created_at, Comment.id)).label("position"),
+                func.count(Comment.id).over(partition_by=Comment.parent_id).label("reply_count")
+            ).join(User, Comment.user_id == User.id).filter(Comment.parent_id.in_(list(replies_by_parent))).subquery()
+            for reply in db.query(ranked).filter(ranked.c.position <= replies_limit).order_by(ranked.c.parent_id, ranked.c.position):
+                replies_by_parent[reply.parent_id].append(reply)
+                reply_counts[reply.parent_id] = reply.reply_count
+        elif rows:
+            counts = db.query(Comment.parent_id, func.count(Comment.id)).filter(
+                Comment.parent_id.in_(list(replies_by_parent))
+            ).group_by(Comment.parent_id).all()
+            reply_counts = dict(counts)
+
+        all_ids = [row.id for row in rows] + [reply.id for replies in replies_by_parent.values() for reply in replies]
+        liked_ids = PostService._liked_comment_ids(db, current_user_id, all_ids)
+
+        comments = []
+        for row in rows:
+            replies = replies_by_parent[row.id]
+            reply_count = reply_counts.get(row.id, 0)
+            comment = PostService._serialize_thread_comment(row, liked_ids)
+            comment["reply_count"] = reply_count
+            comment["replies"] = [PostService._serialize_thread_comment(reply, liked_ids) for reply in replies]
+            # Clients expand the rest via /comments/{id}/replies (no cursor when none were inlined)
+            comment["replies_cursor"] = (
+                encode_cursor(replies[-1].created_at, replies[-1].id) if replies and reply_count > len(replies) else None
+            )
+            comments.append(comment)
+
+        return {
+            "comments": comments,
+            "next_cursor": encode_cursor(rows[-1].created_at, rows[-1].id) if has_more else None
+        }
+
+    @staticmethod
+    def get_replies_for_comment(db: Session, comment_id: int, current_user_id: int = None, cursor: str = None,
+                                limit: int = 20) -> dict:
+        """A cursor-paginated page of direct replies to a comment"""
+        query = db.query(*PostService._thread_columns()).join(User, Comment.user_id == User.id).filter(
+            Comment.parent_id == comment_id
+        )
+        after = decode_cursor(cursor, datetime, int)
+        if after:
+            query = query.filter(after_keyset(db.get_bind().dialect.name, Comment.created_at, Comment.id, after))
+        rows = query.order_by(Comment.created_at, Comment.id).limit(limit + 1).all()
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        liked_ids = PostService._liked_comment_ids(db, current_user_id, [row.id for row in rows])
+        return {
+            "replies": [PostService._serialize_thread_comment(row, liked_ids) for row in rows],
+            "next_cursor": encode_cursor(rows[-1].created_at, rows[-1].id) if has_more else None
+        }
+
+    @staticmethod
+    def _search_filters(db: Session, category: Optional[str], author: Optional[str],
+                        current_user_id: Optional[int]) -> Optional[tuple]:
+        """Resolve category name and author username to ids; None when either does not exist
+        (or the category is private and the user not a member)"""
+        category_id = author_id = None
+        if category:
+            category_id = db.scalar(select(Category.id).where(
+                Category.name == category, Category.id.not_in(SearchService.hidden_categories(current_user_id))
+            ))
+            if category_id is None:
+                return None
+        if author:
+            author_id = db.scalar(select(User.id).where(User.username == author))
+            if author_id is None:
+                return None
+        return category_id, author_id
+
+    @staticmethod
+    def search_posts(db: Session, query: str, current_user_id: int = None, category: str = None, author: str = None,
+                     cursor: str = None, limit: int = 20) -> dict:
+        """A cursor-paginated page of posts matching every word of `query`, ranked by relevance and recency"""
+        filters = PostService._search_filters(db, category, author, current_user_id)
+        if filters is None:
+            return {"posts": [], "next_cursor": None}
+        ids, next_cursor = SearchService.search_content(
+            db, "posts", query, *filters, cursor=cursor, limit=limit, viewer_id=current_user_id
+        )
+        if not ids:
+            return {"posts": [], "next_cursor": None}
+        rows = {row.id: row for row in db.query(
+            Post.id, Post.content, Post.created_at, Post.likes_count, Post.comments_count, Post.category_id, User.username
+        ).join(User, Post.user_id == User.id).filter(Post.id.in_(ids))}
+        liked_ids = {row.post_id for row in db.query(PostLike.post_id).filter(
+            PostLike.user_id == current_user_id, PostLike.post_id.in_(ids)
+        )} if current_user_id else set()
+        return {
+            "posts": [
+                {
+                    "id": row.id,
+                    "content": row.content,
+                    "user": row.username,
+                    "time": PostService.format_time(row.created_at),
+                    "category_id": row.category_id,
+                    "likes": row.likes_count,
+                    "comments": row.comments_count,
+                    "liked": row.id in liked_ids
+                }
+                # Rows deleted since another worker indexed them drop out here
+                for row in (rows.get(post_id) for post_id in ids) if row is not None
+            ],
+            "next_cursor": next_cursor
+        }
+
+    @staticmethod
+    def search_comments(db: Session, query: str, current_user_id: int = None, category: str = None, author: str = None,
+                        cursor: str = None, limit: int = 20) -> dict:
+        """A cursor-paginated page of comments matching every word of `query`, ranked by relevance and recency"""
+        filters = PostService._search_filters(db, category, author, current_user_id)
+        if filters is None:
+            return {"comments": [], "next_cursor": None}
+        ids, next_cursor = SearchService.search_content(
+            db, "comments", query, *filters, cursor=cursor, limit=limit, viewer_id=current_user_id
+        )
+        if not ids:
+            return {"comments": [], "next_cursor": None}
+        rows = {row.id: row for row in db.query(*PostService._thread_columns(), Comment.post_id).join(
+            User, Comment.user_id == User.id
+        ).filter(Comment.id.in_(ids))}
+        liked_ids = PostService._liked_comment_ids(db, current_user_id, ids)
+        comments = []
+        for row in (rows.get(comment_id) for comment_id in ids):
+            if row is not None:
+                comment = PostService._serialize_thread_comment(row, liked_ids)
+                comment["post_id"] = row.post_id
+                comments.append(comment)
+        return {"comments": comments, "next_cursor": next_cursor}
+
+class AsyncPostService:
+    """PostService for async handlers: database work is awaited on the async engine, never run on the loop"""
+
+    @staticmethod
+    async def create_post_with_ai_analysis(db: AsyncSession, content: str, user_id: int, category_id: int = None):
+        """Create post with automatic AI analysis"""
+        post = await db.run_sync(PostService._insert_post, content, user_id, category_id)
+        
+        try:
+            ai_manager = AIManager()
+            analysis = await ai_manager.analyze_post(content)
+            await db.run_sync(PostService._store_post_analysis, post, analysis)
+        except Exception as e:
+            await db.run_sync(PostService._discard_analysis, post)
+            return PostService._unanalyzed_result("post", post)
+        
+        return PostService._analysis_result("post", post, analysis)
+
+    @staticmethod
+    async def create_comment_with_ai_analysis(db: AsyncSession, content: str, user_id: int, post_id: int, parent_id: int = None):
+        """Create comment (or reply, when parent_id is set) with automatic AI analysis"""
+        comment = await db.run_sync(PostService._insert_comment, content, user_id, post_id, parent_id)
+        
+        try:
+            ai_manager = AIManager()
+            analysis = await ai_manager.analyze_post(content)
+            await db.run_sync(PostService._store_comment_analysis, comment, analysis)
+        except Exception as e:
+            await db.run_sync(PostService._discard_analysis, comment)
+            return PostService._unanalyzed_result("comment", comment)
+        
+        return PostService._analysis_result("comment", comment, analysis)
+
+    @staticmethod
+    async def get_comment(db: AsyncSession, comment_id: int) -> Optional[Comment]:
+        return await db.get(Comment, comment_id)
+
+    @staticmethod
+    async def search_posts(db: AsyncSession, query: str, current_user_id: int = None, category: str = None,
+                           author: str = None, cursor: str = None, limit: int = 20) -> dict:
+        return await db.run_sync(PostService.search_posts, query, current_user_id, category, author, cursor, limit)
+
+    @staticmethod
+    async def search_comments(db: AsyncSession, query: str, current_user_id: int = None, category: str = None,
+                              author: str = None, cursor: str = None, limit: int = 20) -> dict:
+        return await db.run_sync(PostService.search_comments, query, current_user_id, category, author, cursor, limit)
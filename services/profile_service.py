@@ -1,13 +1,20 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import func, and_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import func, and_, or_, select, delete, Row
 from fastapi import UploadFile
-import os
-import shutil
 from datetime import datetime
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Set, Tuple
 
 from models.user import User, UserFollow
-from models.post import Post, PostLike, Comment, CommentLike
+from models.post import Post
+from core.auth import invalidate_user
+from core.avatars import store_avatar
+from core.database import insert_ignore
+from core.pagination import encode_cursor, decode_cursor, after_keyset
+from services.post_service import PostService
+from services.search_service import SearchService
+from services.suggestion_service import SuggestionService
+from services.user_stats_service import UserStatsService
 
 class ProfileService:
     def __init__(self, db: Session):
@@ -18,40 +25,19 @@ class ProfileService:
         return self.db.query(User).filter(User.username == username).first()
     
     def get_user_stats(self, user_id: int) -> Dict[str, Any]:
-        """Get user statistics"""
-        # Count posts
-        posts_count = self.db.query(Post).filter(Post.user_id == user_id).count()
-        
-        # Count followers
-        followers_count = self.db.query(UserFollow).filter(UserFollow.followed_id == user_id).count()
-        
-        # Count following
-        following_count = self.db.query(UserFollow).filter(UserFollow.follower_id == user_id).count()
-        
-        # Count total likes received on posts
-        total_likes = self.db.query(PostLike).join(Post).filter(Post.user_id == user_id).count()
-        
-        # Count total comments received on posts
-        total_comments = self.db.query(Comment).join(Post).filter(Post.user_id == user_id).count()
-        
+        """Get user statistics from the denormalized user_stats row"""
+        stats = UserStatsService.get(self.db, user_id)
         return {
-            "posts": posts_count,
-            "followers": followers_count,
-            "following": following_count,
-            "total_likes": total_likes,
-            "total_comments": total_comments
+            "posts": stats["posts_count"],
+            "followers": stats["followers_count"],
+            "following": stats["following_count"],
+            "total_likes": stats["likes_received"],
+            "total_comments": stats["comments_received"]
         }
     
-    def get_user_posts(self, user_id: int, limit: int = 10) -> List[Post]:
-        """Get user's posts with like and comment counts"""
-        posts = self.db.query(Post).filter(Post.user_id == user_id).order_by(Post.created_at.desc()).limit(limit).all()
-        
-        # Add like and comment counts to each post
-        for post in posts:
-            post.likes_count = self.db.query(PostLike).filter(PostLike.post_id == post.id).count()
-            post.comments_count = self.db.query(Comment).filter(Comment.post_id == post.id).count()
-        
-        return posts
+    def get_user_posts(self, user_id: int, limit: int = 10) -> List[Row]:
+        """Get user's latest posts with their stored like and comment counts"""
+        return PostService.list_posts(self.db, Post.user_id == user_id, limit=limit)
     
     def is_following(self, follower_id: int, followed_id: int) -> bool:
         """Check if user is following another user"""
@@ -61,44 +47,86 @@ class ProfileService:
     
     def follow_user(self, follower_id: int, followed_id: int) -> bool:
         """Follow a user"""
-        # Check if already following
-        existing_follow = self.db.query(UserFollow).filter(
-            and_(UserFollow.follower_id == follower_id, UserFollow.followed_id == followed_id)
-        ).first()
-        
-        if existing_follow:
+        # The unique (follower_id, followed_id) index makes a concurrent double follow a no-op
+        if not insert_ignore(self.db, UserFollow, follower_id=follower_id, followed_id=followed_id):
+            self.db.rollback()
             return False
-        
-        # Create new follow relationship
-        new_follow = UserFollow(follower_id=follower_id, followed_id=followed_id)
-        self.db.add(new_follow)
+        # A follows B while B follows A: both lock the same two rows, so take them in one order
+        UserStatsService.bump_each(
+            self.db, (follower_id, {"following_count": 1}), (followed_id, {"followers_count": 1})
+        )
         self.db.commit()
+        SuggestionService.record_follow(follower_id, followed_id)
         return True
     
     def unfollow_user(self, follower_id: int, followed_id: int) -> bool:
         """Unfollow a user"""
-        follow = self.db.query(UserFollow).filter(
-            and_(UserFollow.follower_id == follower_id, UserFollow.followed_id == followed_id)
-        ).first()
-        
-        if not follow:
+        deleted = self.db.execute(
+            delete(UserFollow).where(UserFollow.follower_id == follower_id, UserFollow.followed_id == followed_id)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        if not deleted:
+            self.db.rollback()
             return False
-        
-        self.db.delete(follow)
+        UserStatsService.bump_each(
+            self.db, (follower_id, {"following_count": -1}), (followed_id, {"followers_count": -1})
+        )
         self.db.commit()
+        SuggestionService.record_unfollow(follower_id, followed_id)
         return True
     
-    def get_followers(self, user_id: int) -> List[User]:
-        """Get list of users following this user"""
-        return self.db.query(User).join(UserFollow, User.id == UserFollow.follower_id).filter(
-            UserFollow.followed_id == user_id
-        ).all()
+    def get_followers(self, user_id: int, viewer_id: Optional[int] = None, cursor: Optional[str] = None,
+                      limit: int = 50) -> Dict[str, Any]:
+        """A page of users following this user, most recent follows first"""
+        return self._follow_page(UserFollow.followed_id, UserFollow.follower_id, user_id, viewer_id, cursor, limit)
+    
+    def get_following(self, user_id: int, viewer_id: Optional[int] = None, cursor: Optional[str] = None,
+                      limit: int = 50) -> Dict[str, Any]:
+        """A page of users this user is following, most recent follows first"""
+        return self._follow_page(UserFollow.follower_id, UserFollow.followed_id, user_id, viewer_id, cursor, limit)
     
-    def get_following(self, user_id: int) -> List[User]:
-        """Get list of users this user is following"""
-        return self.db.query(User).join(UserFollow, User.id == UserFollow.followed_id).filter(
-            UserFollow.follower_id == user_id
-        ).all()
+    def _follow_page(self, owner_col, listed_col, user_id: int, viewer_id: Optional[int], cursor: Optional[str],
+                     limit: int) -> Dict[str, Any]:
+        """Keyset page over (follow created_at, follow id); two queries whatever the follower count"""
+        query = self.db.query(
+            User.id, User.username, User.full_name, User.avatar_url, User.bio,
+            UserFollow.created_at.label("followed_at"), UserFollow.id.label("follow_id")
+        ).join(UserFollow, User.id == listed_col).filter(owner_col == user_id)
+        after = decode_cursor(cursor, datetime, int)
+        if after:
+            query = query.filter(after_keyset(self.db.get_bind().dialect.name, UserFollow.created_at, UserFollow.id, after, descending=True))
+        rows = query.order_by(UserFollow.created_at.desc(), UserFollow.id.desc()).limit(limit + 1).all()
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+
+        following, followers = self.follow_relations(viewer_id, [row.id for row in rows])
+        return {
+            "users": [
+                {
+                    "id": row.id,
+                    "username": row.username,
+                    "full_name": row.full_name,
+                    "avatar_url": row.avatar_url,
+                    "bio": row.bio,
+                    "is_following": row.id in following,
+                    "follows_you": row.id in followers
+                }
+                for row in rows
+            ],
+            "next_cursor": encode_cursor(rows[-1].followed_at, rows[-1].follow_id) if has_more else None
+        }
+    
+    def follow_relations(self, viewer_id: Optional[int], user_ids: List[int]) -> Tuple[Set[int], Set[int]]:
+        """Which of `user_ids` the viewer follows and which follow the viewer, in one query"""
+        if not viewer_id or not user_ids:
+            return set(), set()
+        rows = self.db.execute(select(UserFollow.follower_id, UserFollow.followed_id).where(or_(
+            and_(UserFollow.follower_id == viewer_id, UserFollow.followed_id.in_(user_ids)),
+            and_(UserFollow.followed_id == viewer_id, UserFollow.follower_id.in_(user_ids))
+        ))).all()
+        following = {row.followed_id for row in rows if row.follower_id == viewer_id}
+        followers = {row.follower_id for row in rows if row.followed_id == viewer_id}
+        return following, followers
     
     def update_profile(self, user_id: int, **kwargs) -> User:
         """Update user profile fields"""
@@ -113,43 +141,94 @@ class ProfileService:
         
         self.db.commit()
         self.db.refresh(user)
+        SearchService.update_user_index(user)
+        invalidate_user(user.username)
         return user
     
-    async def upload_avatar(self, avatar: UploadFile, username: str) -> str:
-        """Upload and save user avatar"""
-        # Create uploads directory if it doesn't exist
-        upload_dir = "static/uploads/avatars"
-        os.makedirs(upload_dir, exist_ok=True)
-        
-        # Generate unique filename
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        file_extension = os.path.splitext(avatar.filename)[1]
-        filename = f"{username}_{timestamp}{file_extension}"
-        file_path = os.path.join(upload_dir, filename)
-        
-        # Save the file
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(avatar.file, buffer)
-        
-        # Return the URL path
-        return f"/static/uploads/avatars/{filename}"
+    async def upload_avatar(self, avatar: UploadFile) -> str:
+        """Store an uploaded avatar (see core.avatars) and return its URL; raises AvatarError"""
+        return await store_avatar(avatar)
     
+    def following_ids(self, follower_id: int, user_ids: List[int]) -> Set[int]:
+        """Which of `user_ids` the follower follows, in one query"""
+        if not user_ids:
+            return set()
+        return set(self.db.scalars(
+            select(UserFollow.followed_id).where(UserFollow.follower_id == follower_id, UserFollow.followed_id.in_(user_ids))
+        ))
+
+    def people_you_may_know(self, user_id: int, limit: int = 10) -> List[Dict[str, Any]]:
+        """Friends-of-friends ranked by shared connections"""
+        return SuggestionService.suggest_users(self.db, user_id, limit)
+
     def search_users(self, query: str, current_user_id: int, limit: int = 10) -> List[Dict[str, Any]]:
-        """Search for users by username or full name"""
-        users = self.db.query(User).filter(
-            User.username.ilike(f"%{query}%") | User.full_name.ilike(f"%{query}%")
-        ).limit(limit).all()
-        
-        results = []
-        for user in users:
-            if user.id != current_user_id:  # Don't show current user in search
-                is_following = self.is_following(current_user_id, user.id)
-                results.append({
-                    "id": user.id,
-                    "username": user.username,
-                    "full_name": user.full_name,
-                    "avatar_url": user.avatar_url,
-                    "is_following": is_following
-                })
-        
-        return results 
\ No newline at end of file
+        """Search for users by username or full name, best matches first"""
+        users = SearchService.search_users(self.db, query, limit, exclude_user_id=current_user_id)
+        followed = self.following_ids(current_user_id, [user.id for user in users])
+        return [
+            {
+                "id": user.id,
+                "username": user.username,
+                "full_name": user.full_name,
+                "avatar_url": user.avatar_url,
+                "is_following": user.id in followed
+            }
+            for user in users
+        ]
+
+    def suggest_users(self, query: str, limit: int = 8) -> List[Dict[str, Any]]:
+        """Typeahead completions: ranked users without follow state"""
+        return [
+            {"username": user.username, "full_name": user.full_name, "avatar_url": user.avatar_url}
+            for user in SearchService.search_users(self.db, query, limit)
+        ]
+
+class AsyncProfileService:
+    """ProfileService for async handlers: queries run on the async engine without blocking the event loop"""
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def _call(self, method: str, *args, **kwargs):
+        return await self.db.run_sync(lambda session: getattr(ProfileService(session), method)(*args, **kwargs))
+
+    async def get_user_by_username(self, username: str) -> Optional[User]:
+        return await self._call("get_user_by_username", username)
+
+    async def get_user_stats(self, user_id: int) -> Dict[str, Any]:
+        return await self._call("get_user_stats", user_id)
+
+    async def get_user_posts(self, user_id: int, limit: int = 10) -> List[Row]:
+        return await self._call("get_user_posts", user_id, limit)
+
+    async def is_following(self, follower_id: int, followed_id: int) -> bool:
+        return await self._call("is_following", follower_id, followed_id)
+
+    async def follow_user(self, follower_id: int, followed_id: int) -> bool:
+        return await self._call("follow_user", follower_id, followed_id)
+
+    async def unfollow_user(self, follower_id: int, followed_id: int) -> bool:
+        return await self._call("unfollow_user", follower_id, followed_id)
+
+    async def get_followers(self, user_id: int, viewer_id: Optional[int] = None, cursor: Optional[str] = None,
+                            limit: int = 50) -> Dict[str, Any]:
+        return await self._call("get_followers", user_id, viewer_id, cursor, limit)
+
+    async def get_following(self, user_id: int, viewer_id: Optional[int] = None, cursor: Optional[str] = None,
+                            limit: int = 50) -> Dict[str, Any]:
+        return await self._call("get_following", user_id, viewer_id, cursor, limit)
+
+    async def update_profile(self, user_id: int, **kwargs) -> User:
+        return await self._call("update_profile", user_id, **kwargs)
+
+    async def upload_avatar(self, avatar: UploadFile) -> str:
+        return await ProfileService(None).upload_avatar(avatar)
+
+    async def people_you_may_know(self, user_id: int, limit: int = 10) -> List[Dict[str, Any]]:
+        return await self._call("people_you_may_know", user_id, limit)
+
+    async def search_users(self, query: str, current_user_id: int, limit: int = 10) -> List[Dict[str, Any]]:
+        return await self._call("search_users", query, current_user_id, limit)
+
+    async def suggest_users(self, query: str, limit: int = 8) -> List[Dict[str, Any]]:
+        return await self._call("suggest_users", query, limit)
@@ -0,0 +1,89 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import update
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from config import settings
+from models.post import Post
+
+# Engagement weights and decay shape for the "hot" feed
+LIKE_WEIGHT = 1.0
+COMMENT_WEIGHT = 2.0
+GRAVITY = 1.5
+DECAY_BATCH_SIZE = 500
+
+class RankingService:
+    @staticmethod
+    def compute_hot_score(likes: int, comments: int, sentiment_score: Optional[int], moderation_score: Optional[int],
+                          created_at: Optional[datetime], now: Optional[datetime] = None) -> float:
+        """Engagement weighted by AI quality signals, decayed by age in hours"""
+        now = now or datetime.now(timezone.utc)
+        if created_at is None:
+            created_at = now
+        elif created_at.tzinfo is None:
+            created_at = created_at.replace(tzinfo=timezone.utc)
+        age_hours = max(0.0, (now - created_at).total_seconds() / 3600)
+
+        engagement = 1 + LIKE_WEIGHT * (likes or 0) + COMMENT_WEIGHT * (comments or 0)
+
+        # Scores are stored as 0-100; unprocessed posts keep the neutral column defaults
+        moderation = (100 if moderation_score is None else moderation_score) / 100
+        sentiment = (50 if sentiment_score is None else sentiment_score) / 100
+        quality = moderation * (0.75 + 0.5 * sentiment)
+
+        return quality * engagement / (age_hours + 2) ** GRAVITY
+
+    @staticmethod
+    def apply_hot_score(post: Post, now: Optional[datetime] = None) -> float:
+        """Recompute the stored hot score of a loaded post"""
+        post.hot_score = RankingService.compute_hot_score(
+            post.likes_count, post.comments_count, post.sentiment_score, post.moderation_score, post.created_at, now
+        )
+        return post.hot_score
+
+    @staticmethod
+    def update_hot_score(db: Session, row) -> float:
+        """Write the hot score for a row of post counters (e.g. returned by an atomic UPDATE)"""
+        score = RankingService.compute_hot_score(
+            row.likes_count, row.comments_count, row.sentiment_score, row.moderation_score, row.created_at
+        )
+        db.execute(
+            update(Post).where(Post.id == row.id).values(hot_score=score)
+            .execution_options(synchronize_session=False)
+        )
+        return score
+
+    @staticmethod
+    def decay_hot_scores(db: Session) -> int:
+        """Periodic job: re-decay scores inside the hot window and zero anything older"""
+        now = datetime.now(timezone.utc)
+        cutoff = now - timedelta(hours=settings.HOT_FEED_WINDOW_HOURS)
+        updated = 0
+        last_id = 0
+
+        while True:
+            rows = db.query(
+                Post.id, Post.likes_count, Post.comments_count, Post.sentiment_score, Post.moderation_score, Post.created_at
+            ).filter(Post.created_at >= cutoff, Post.id > last_id).order_by(Post.id).limit(DECAY_BATCH_SIZE).all()
+            if not rows:
+                break
+
+            db.execute(
+                update(Post),
+                [
+                    {"id": row.id, "hot_score": RankingService.compute_hot_score(
+                        row.likes_count, row.comments_count, row.sentiment_score, row.moderation_score, row.created_at, now
+                    )}
+                    for row in rows
+                ]
+            )
+            db.commit()
+            updated += len(rows)
+            last_id = rows[-1].id
+
+        # Posts that aged out of the window drop off the hot index entirely
+        db.query(Post).filter(Post.created_at < cutoff, Post.hot_score > 0).update(
+            {Post.hot_score: 0}, synchronize_session=False
+        )
+        db.commit()
+        return updated
@@ -0,0 +1,114 @@
+"""
+Related posts
+Every post gets a hashed TF-IDF vector (core.vectors) when it is created; the vectors
+live in memory-mapped files under RELATED_POSTS_DIR that all workers on a host share.
+Writes take a cross-process file lock, so they run on a background thread rather than
+the request's (which under run_sync is the event loop's).
+Lookups score the source post against the posts of the last RELATED_POSTS_WINDOW_DAYS
+with one vectorized pass and keep the visible ones (no category, or a public one).
+"""
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional
+
+import numpy as np
+from sqlalchemy import or_, select
+from sqlalchemy.orm import Session
+
+from config import settings
+from core.cache import TTLCache
+from core.fulltext import to_timestamp
+from core.metrics import registry
+from core.vectors import VectorStore
+from models.category import Category
+from models.post import Post
+
+# Candidates scored per lookup before the visibility filter, and the least similarity worth showing
+RELATED_CANDIDATES = 50
+MIN_SIMILARITY = 0.1
+BACKFILL_BATCH_SIZE = 1000
+
+vector_store = VectorStore(settings.RELATED_POSTS_DIR)
+# One thread, so the writes for a post apply in the order they were queued
+_writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="related-posts")
+
+# Ranked visible ids per source post, shared by every viewer
+related_posts_cache = TTLCache("related_posts", settings.RELATED_POSTS_CACHE_SECONDS, max_entries=10000)
+
+registry.gauge("related_posts_vectors", "Post vectors in the shared related-posts store").set_function(lambda: len(vector_store.indexed_ids()))
+
+logger = logging.getLogger(__name__)
+
+def _window_start() -> datetime:
+    return datetime.now(timezone.utc) - timedelta(days=settings.RELATED_POSTS_WINDOW_DAYS)
+
+def _visible():
+    return or_(Post.category_id.is_(None), Category.is_public == True)
+
+class RelatedPostsService:
+    @staticmethod
+    def index_post(post: Post):
+        """Called once the post is committed; queues the vector write, a failure only leaves it for the backfill job"""
+        _writer.submit(RelatedPostsService._store_vector, post.id, post.content, to_timestamp(post.created_at))
+
+    @staticmethod
+    def remove_post(post_id: int):
+        _writer.submit(RelatedPostsService._clear_vector, post_id)
+        related_posts_cache.delete(post_id)
+
+    @staticmethod
+    def _store_vector(post_id: int, content: str, timestamp: float):
+        try:
+            vector_store.add(post_id, content, timestamp)
+        except OSError:
+            logger.exception(f"Could not store the vector for post {post_id}")
+
+    @staticmethod
+    def _clear_vector(post_id: int):
+        try:
+            vector_store.remove(post_id)
+        except OSError:
+            logger.exception(f"Could not clear the vector for post {post_id}")
+
+    @staticmethod
+    def backfill(db: Session) -> int:
+        """Scheduled job: vectorize recent posts that have none and clear vectors of posts deleted elsewhere"""
+        # Read before the posts so a post indexed in between is never taken for a deleted one
+        indexed = vector_store.indexed_ids()
+        post_ids = np.array(db.scalars(select(Post.id).where(Post.created_at >= _window_start())).all(), dtype=np.int64)
+        if len(post_ids):
+            for stale_id in np.setdiff1d(indexed[indexed >= post_ids.min()], post_ids).tolist():
+                vector_store.remove(stale_id)
+        missing = np.setdiff1d(post_ids, indexed).tolist()
+        for start in range(0, len(missing), BACKFILL_BATCH_SIZE):
+            for row in db.execute(
+                select(Post.id, Post.content, Post.created_at).where(Post.id.in_(missing[start:start + BACKFILL_BATCH_SIZE]))
+            ):
+                vector_store.add(row.id, row.content, to_timestamp(row.created_at))
+        return len(missing)
+
+    @staticmethod
+    def _ranked_ids(db: Session, post_id: int, content: str) -> List[int]:
+        query = vector_store.vector(post_id)
+        if query is None:
+            # Older than anything indexed, or not vectorized yet
+            query = vector_store.vectorize(content)
+        candidates = vector_store.nearest(
+            query, to_timestamp(_window_start()), RELATED_CANDIDATES, exclude=post_id, min_score=MIN_SIMILARITY
+        )
+        if not candidates:
+            return []
+        visible = set(db.scalars(
+            select(Post.id).outerjoin(Category, Post.category_id == Category.id)
+            .where(Post.id.in_([id_ for id_, _ in candidates]), _visible())
+        ))
+        return [id_ for id_, _ in candidates if id_ in visible]
+
+    @staticmethod
+    def related_ids(db: Session, post_id: int, limit: int = 5) -> Optional[List[int]]:
+        """Ids of the most similar recent visible posts, best first, or None for an unknown post"""
+        content = db.scalar(select(Post.content).where(Post.id == post_id))
+        if content is None:
+            return None
+        return related_posts_cache.get_or_compute(post_id, lambda: RelatedPostsService._ranked_ids(db, post_id, content))[:limit]
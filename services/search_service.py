@@ -0,0 +1,452 @@
+"""
+Indexed search over users, posts, comments and categories
+Postgres ranks users with pg_trgm (GIN trigram indexes on username and full_name) and
+text with tsvector (GIN expression indexes); other databases use in-process
+indexes kept in sync with the tables. Users score by trigram similarity with a
+prefix boost, content by BM25 (ts_rank_cd on Postgres) times a recency boost, and
+categories by relevance times member count and recent post activity.
+"""
+import math
+import threading
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import DateTime, Float, bindparam, case, cast, func, literal, literal_column, or_, select, tuple_
+from sqlalchemy.orm import Session
+
+from config import settings
+from core.cache import TTLCache
+from core.fulltext import SegmentedIndex, recency_boost, to_timestamp
+from core.pagination import decode_cursor, encode_cursor
+from models.user import User
+from models.post import Post, Comment
+from models.category import Category, CategoryMember, CATEGORY_SEARCH_VECTOR
+
+# Fuzzy matches below this similarity are dropped, as with pg_trgm's `%` default
+SIMILARITY_THRESHOLD = 0.3
+PREFIX_BOOST = 1.0
+SUBSTRING_BOOST = 0.5
+
+def trigrams(text: str) -> Set[str]:
+    """pg_trgm-style trigrams: lowercase, per word, padded with two leading spaces and one trailing"""
+    grams = set()
+    for word in text.lower().split():
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+def _escape_like(query: str) -> str:
+    return query.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+class NgramIndex:
+    """Trigram postings for short documents (usernames, names); thread-safe"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.postings: Dict[str, Set[int]] = {}
+        self.documents: Dict[int, Tuple[str, ...]] = {}
+        self.gram_counts: Dict[int, int] = {}
+        self.max_id = 0
+
+    def _remove(self, doc_id: int):
+        fields = self.documents.pop(doc_id, None)
+        if fields is None:
+            return
+        for gram in trigrams(" ".join(fields)):
+            ids = self.postings.get(gram)
+            if ids is not None:
+                ids.discard(doc_id)
+                if not ids:
+                    del self.postings[gram]
+        del self.gram_counts[doc_id]
+
+    def upsert(self, doc_id: int, *fields: Optional[str]):
+        fields = tuple(field for field in fields if field)
+        grams = trigrams(" ".join(fields))
+        with self._lock:
+            self._remove(doc_id)
+            self.documents[doc_id] = fields
+            self.gram_counts[doc_id] = len(grams)
+            for gram in grams:
+                self.postings.setdefault(gram, set()).add(doc_id)
+            self.max_id = max(self.max_id, doc_id)
+
+    def remove(self, doc_id: int):
+        with self._lock:
+            self._remove(doc_id)
+
+    def replace_all(self, rows: Iterable[Tuple]):
+        """Rebuild from (id, *fields) rows and swap in atomically"""
+        fresh = NgramIndex()
+        for doc_id, *fields in rows:
+            fresh.upsert(doc_id, *fields)
+        with self._lock:
+            self.postings, self.documents = fresh.postings, fresh.documents
+            self.gram_counts, self.max_id = fresh.gram_counts, fresh.max_id
+
+    def search(self, query: str, limit: int, exclude: Optional[int] = None) -> List[Tuple[int, float]]:
+        """Top (id, score) pairs: trigram similarity plus prefix and substring boosts"""
+        needle = query.lower().strip()
+        query_grams = trigrams(needle)
+        if not query_grams:
+            return []
+        shared: Counter = Counter()
+        with self._lock:
+            for gram in query_grams:
+                shared.update(self.postings.get(gram, ()))
+            candidates = [(doc_id, count, self.gram_counts[doc_id], self.documents[doc_id]) for doc_id, count in shared.items()]
+        scored = []
+        for doc_id, count, doc_grams, fields in candidates:
+            if doc_id == exclude:
+                continue
+            # Same measure as pg_trgm similarity(): shared / union of trigram sets
+            similarity = count / (len(query_grams) + doc_grams - count)
+            lowered = [field.lower() for field in fields]
+            if any(field.startswith(needle) or f" {needle}" in field for field in lowered):
+                score = similarity + PREFIX_BOOST
+            elif any(needle in field for field in lowered):
+                score = similarity + SUBSTRING_BOOST
+            elif similarity >= SIMILARITY_THRESHOLD:
+                score = similarity
+            else:
+                continue
+            scored.append((doc_id, score))
+        scored.sort(key=lambda item: (-item[1], item[0]))
+        return scored[:limit]
+
+user_index = NgramIndex()
+_user_index_lock = threading.Lock()
+_user_index_loaded = False
+
+# Postgres text search configuration; 'simple' does no stemming, which suits mixed Amharic/English posts
+TS_CONFIG = "simple"
+CONTENT_KINDS = ("posts", "comments")
+
+post_index = SegmentedIndex()
+comment_index = SegmentedIndex()
+_content_index_lock = threading.Lock()
+_content_index_loaded = False
+
+# Category ranking: relevance x (1 + MEMBER_WEIGHT * ln(1 + members)) x activity boost
+CATEGORY_SEARCH_LIMIT = 500
+CATEGORY_MEMBER_WEIGHT = 0.25
+CATEGORY_ACTIVITY_WEIGHT = 0.5
+CATEGORY_ACTIVITY_HALF_LIFE_HOURS = 168.0
+
+category_index = SegmentedIndex()
+_category_index_lock = threading.Lock()
+_category_index_loaded = False
+# Ranked (score, id, is_public) lists per normalized query, shared by every user
+category_search_cache = TTLCache("category_search", settings.CATEGORY_SEARCH_CACHE_SECONDS, max_entries=2000)
+
+# Index writes this process makes while rebuild_indexes runs; its snapshot may predate them, so they are
+# replayed once it has swapped in (every write is idempotent)
+_rebuild_writes: Optional[List[Tuple[Callable, tuple]]] = None
+_rebuild_writes_lock = threading.Lock()
+
+def _write(function: Callable, *args):
+    with _rebuild_writes_lock:
+        if _rebuild_writes is not None:
+            _rebuild_writes.append((function, args))
+    function(*args)
+
+def _category_document(name: str, display_name: str, description: Optional[str]) -> str:
+    # Repeating the name fields is how the in-process index weights them above the description
+    names = f"{name.replace('_', ' ')} {display_name}"
+    return f"{names} {names} {description or ''}"
+
+def _category_rows(after_id: int = 0):
+    return select(
+        Category.id, Category.name, Category.display_name, Category.description, Category.created_at, Category.created_by
+    ).where(Category.id > after_id).order_by(Category.id).execution_options(yield_per=5000)
+
+def _category_entry(row) -> tuple:
+    return row.id, _category_document(row.name, row.display_name, row.description), row.created_at, row.created_by, row.id, 0
+
+def _category_popularity(members_count: Optional[int], last_post_at: Optional[datetime], now: float) -> float:
+    activity = recency_boost(now - to_timestamp(last_post_at), CATEGORY_ACTIVITY_WEIGHT, CATEGORY_ACTIVITY_HALF_LIFE_HOURS) if last_post_at else 1.0
+    return (1 + CATEGORY_MEMBER_WEIGHT * math.log1p(members_count or 0)) * activity
+
+def _content_rows(kind: str, after_id: int = 0):
+    """(id, text, created_at, user_id, category_id, post_id) for the in-process content indexes"""
+    if kind == "posts":
+        statement = select(Post.id, Post.content, Post.created_at, Post.user_id, Post.category_id, Post.id)
+    else:
+        statement = select(
+            Comment.id, Comment.content, Comment.created_at, Comment.user_id, Post.category_id, Comment.post_id
+        ).join(Post, Comment.post_id == Post.id)
+    model = Post if kind == "posts" else Comment
+    return statement.where(model.id > after_id).order_by(model.id).execution_options(yield_per=5000)
+
+class SearchService:
+    @staticmethod
+    def uses_trigram_indexes(db: Session) -> bool:
+        return db.get_bind().dialect.name == "postgresql"
+
+    @staticmethod
+    def search_users(db: Session, query: str, limit: int = 10, exclude_user_id: Optional[int] = None) -> List[User]:
+        """Users ranked by similarity to `query`, prefix matches first"""
+        query = query.strip()
+        if not query:
+            return []
+        if SearchService.uses_trigram_indexes(db):
+            return SearchService._search_users_trigram(db, query, limit, exclude_user_id)
+        SearchService.sync_user_index(db)
+        ranked = user_index.search(query, limit, exclude=exclude_user_id)
+        if not ranked:
+            return []
+        users = {user.id: user for user in db.query(User).filter(User.id.in_([doc_id for doc_id, _ in ranked]))}
+        return [users[doc_id] for doc_id, _ in ranked if doc_id in users]
+
+    @staticmethod
+    def _search_users_trigram(db: Session, query: str, limit: int, exclude_user_id: Optional[int]) -> List[User]:
+        # Every predicate here can be answered from the gin_trgm_ops indexes; pg_trgm ignores case
+        pattern = f"%{_escape_like(query)}%"
+        prefix = f"{_escape_like(query)}%"
+        similarity = func.greatest(func.similarity(User.username, query), func.similarity(User.full_name, query))
+        boost = case(
+            (or_(User.username.ilike(prefix), User.full_name.ilike(prefix), User.full_name.ilike(f"% {prefix}")), literal(PREFIX_BOOST)),
+            (or_(User.username.ilike(pattern), User.full_name.ilike(pattern)), literal(SUBSTRING_BOOST)),
+            else_=literal(0.0)
+        )
+        statement = select(User).where(
+            or_(
+                User.username.ilike(pattern), User.full_name.ilike(pattern),
+                User.username.op("%")(query), User.full_name.op("%")(query)
+            )
+        )
+        if exclude_user_id is not None:
+            statement = statement.where(User.id != exclude_user_id)
+        statement = statement.order_by((boost + similarity).desc(), User.id).limit(limit)
+        return db.scalars(statement).all()
+
+    @staticmethod
+    def sync_user_index(db: Session):
+        """Load the in-process index on first use, then pick up users added since (a primary-key range scan)"""
+        global _user_index_loaded
+        # Query first: under run_sync the execute yields to the event loop, where a thread waiting on the
+        # lock would block every other request
+        statement = select(User.id, User.username, User.full_name)
+        if _user_index_loaded:
+            statement = statement.where(User.id > user_index.max_id)
+        rows = db.execute(statement).all()
+        with _user_index_lock:
+            if _user_index_loaded:
+                for row in rows:
+                    user_index.upsert(*row)
+            else:
+                user_index.replace_all(rows)
+                _user_index_loaded = True
+
+    @staticmethod
+    def update_user_index(user: User):
+        """Reflect a profile edit made by this process; other workers catch up on rebuild_user_index"""
+        if _user_index_loaded:
+            _write(user_index.upsert, user.id, user.username, user.full_name)
+
+    @staticmethod
+    def hidden_categories(viewer_id: Optional[int]):
+        """Ids of the private categories the viewer is not a member of, as a subquery"""
+        statement = select(Category.id).where(Category.is_public == False)
+        if viewer_id is not None:
+            statement = statement.where(Category.id.not_in(
+                select(CategoryMember.category_id).where(CategoryMember.user_id == viewer_id)
+            ))
+        return statement
+
+    @staticmethod
+    def search_content(db: Session, kind: str, query: str, category_id: Optional[int] = None,
+                       author_id: Optional[int] = None, cursor: Optional[str] = None,
+                       limit: int = 20, viewer_id: Optional[int] = None) -> Tuple[List[int], Optional[str]]:
+        """One page of post or comment ids matching every term of `query`, best first, and the next cursor.
+
+        The cursor pins the clock used for the recency boost, so scores stay stable across pages.
+        Posts (and comments on posts) in private categories only match for the categories' members.
+        """
+        after = decode_cursor(cursor, datetime, float, int)
+        now = after[0] if after else datetime.now(timezone.utc)
+        if not query.strip():
+            return [], None
+        if SearchService.uses_trigram_indexes(db):
+            ranked = SearchService._search_content_tsvector(
+                db, kind, query, category_id, author_id, viewer_id, now, after[1:] if after else None, limit + 1
+            )
+        else:
+            SearchService.sync_content_index(db)
+            ranked = (post_index if kind == "posts" else comment_index).search(
+                query, limit + 1, now, settings.SEARCH_RECENCY_WEIGHT, settings.SEARCH_RECENCY_HALF_LIFE_HOURS,
+                user_id=author_id, category_id=category_id, after=after[1:] if after else None,
+                hidden_category_ids=set(db.scalars(SearchService.hidden_categories(viewer_id)))
+            )
+        has_more = len(ranked) > limit
+        ranked = ranked[:limit]
+        next_cursor = encode_cursor(now, ranked[-1][0], ranked[-1][1]) if has_more else None
+        return [doc_id for _, doc_id in ranked], next_cursor
+
+    @staticmethod
+    def _search_content_tsvector(db: Session, kind: str, query: str, category_id: Optional[int],
+                                 author_id: Optional[int], viewer_id: Optional[int], now: datetime,
+                                 after: Optional[Tuple[float, int]], limit: int) -> List[Tuple[float, int]]:
+        model = Post if kind == "posts" else Comment
+        config = literal_column(f"'{TS_CONFIG}'")
+        # Same expression as the GIN indexes, so the match is an index lookup
+        vector = func.to_tsvector(config, model.content)
+        tsquery = func.plainto_tsquery(config, query)
+        age_seconds = cast(func.extract("epoch", bindparam("now", now, type_=DateTime(timezone=True)) - model.created_at), Float)
+        age_hours = func.greatest(age_seconds / 3600.0, 0.0)
+        # Normalization 1 divides by 1 + log(length), the length penalty BM25 applies
+        score = cast(func.ts_rank_cd(vector, tsquery, 1), Float) * (
+            1 + settings.SEARCH_RECENCY_WEIGHT * func.power(0.5, age_hours / settings.SEARCH_RECENCY_HALF_LIFE_HOURS)
+        )
+        ranked = select(model.id.label("id"), score.label("score")).where(vector.op("@@")(tsquery))
+        if model is Comment:
+            ranked = ranked.join(Post, Comment.post_id == Post.id)
+        ranked = ranked.where(or_(Post.category_id.is_(None), Post.category_id.not_in(SearchService.hidden_categories(viewer_id))))
+        if author_id is not None:
+            ranked = ranked.where(model.user_id == author_id)
+        if category_id is not None:
+            ranked = ranked.where(Post.category_id == category_id)
+        ranked = ranked.subquery()
+        statement = select(ranked.c.score, ranked.c.id)
+        if after:
+            statement = statement.where(tuple_(ranked.c.score, ranked.c.id) < tuple_(*after))
+        statement = statement.order_by(ranked.c.score.desc(), ranked.c.id.desc()).limit(limit)
+        return [(row.score, row.id) for row in db.execute(statement)]
+
+    @staticmethod
+    def sync_content_index(db: Session):
+        """Load the in-process content indexes on first use, then pick up rows added by other workers"""
+        global _content_index_loaded
+        # Query before locking (see sync_user_index); add() skips ids a concurrent sync already added
+        fetched = [
+            (index, db.execute(_content_rows(kind, index.max_id if _content_index_loaded else 0)).all())
+            for kind, index in (("posts", post_index), ("comments", comment_index))
+        ]
+        with _content_index_lock:
+            for index, rows in fetched:
+                for row in rows:
+                    index.add(*row)
+            _content_index_loaded = True
+
+    @staticmethod
+    def index_post(post: Post):
+        if _content_index_loaded:
+            _write(post_index.add, post.id, post.content, post.created_at, post.user_id, post.category_id, post.id)
+
+    @staticmethod
+    def index_comment(comment: Comment, category_id: Optional[int]):
+        if _content_index_loaded:
+            _write(comment_index.add, comment.id, comment.content, comment.created_at, comment.user_id, category_id, comment.post_id)
+
+    @staticmethod
+    def remove_post(post_id: int):
+        """A deleted post takes its comments with it"""
+        if _content_index_loaded:
+            _write(post_index.remove, post_id)
+            _write(comment_index.remove_where, post_id)
+
+    @staticmethod
+    def remove_comment(comment_id: int):
+        if _content_index_loaded:
+            _write(comment_index.remove, comment_id)
+
+    @staticmethod
+    def rank_categories(db: Session, query: str) -> List[Tuple[float, int, bool]]:
+        """Up to CATEGORY_SEARCH_LIMIT (score, id, is_public) matches for `query`, best first; cached per query"""
+        key = " ".join(query.lower().split())
+        if not key:
+            return []
+        return category_search_cache.get_or_compute(key, lambda: SearchService._rank_categories(db, key))
+
+    @staticmethod
+    def _rank_categories(db: Session, query: str) -> List[Tuple[float, int, bool]]:
+        if SearchService.uses_trigram_indexes(db):
+            return SearchService._rank_categories_tsvector(db, query)
+        SearchService.sync_category_index(db)
+        now = datetime.now(timezone.utc)
+        # Relevance for every match; popularity can reorder anything, so nothing is cut before blending
+        matches = {doc_id: relevance for relevance, doc_id in category_index.search(query, len(category_index), now, 0, 1)}
+        ranked = []
+        ids = list(matches)
+        for start in range(0, len(ids), 500):
+            for row in db.execute(
+                select(Category.id, Category.is_public, Category.members_count, Category.last_post_at)
+                .where(Category.id.in_(ids[start:start + 500]))
+            ):
+                score = matches[row.id] * _category_popularity(row.members_count, row.last_post_at, now.timestamp())
+                ranked.append((score, row.id, bool(row.is_public)))
+        ranked.sort(reverse=True)
+        return ranked[:CATEGORY_SEARCH_LIMIT]
+
+    @staticmethod
+    def _rank_categories_tsvector(db: Session, query: str) -> List[Tuple[float, int, bool]]:
+        config = literal_column(f"'{TS_CONFIG}'")
+        vector = literal_column(f"({CATEGORY_SEARCH_VECTOR})")
+        tsquery = func.plainto_tsquery(config, query)
+        age_hours = cast(func.extract("epoch", func.now() - Category.last_post_at), Float) / 3600.0
+        activity = func.coalesce(
+            1 + CATEGORY_ACTIVITY_WEIGHT * func.power(0.5, func.greatest(age_hours, 0.0) / CATEGORY_ACTIVITY_HALF_LIFE_HOURS), 1.0
+        )
+        score = (
+            cast(func.ts_rank_cd(vector, tsquery), Float)
+            * (1 + CATEGORY_MEMBER_WEIGHT * func.ln(1 + func.coalesce(Category.members_count, 0)))
+            * activity
+        ).label("score")
+        statement = select(score, Category.id, Category.is_public).where(vector.op("@@")(tsquery)).order_by(
+            score.desc(), Category.id.desc()
+        ).limit(CATEGORY_SEARCH_LIMIT)
+        return [(row.score, row.id, bool(row.is_public)) for row in db.execute(statement)]
+
+    @staticmethod
+    def sync_category_index(db: Session):
+        """Load the in-process category index on first use, then pick up categories added by other workers"""
+        global _category_index_loaded
+        # Query before locking (see sync_user_index)
+        rows = db.execute(_category_rows(category_index.max_id if _category_index_loaded else 0)).all()
+        with _category_index_lock:
+            for row in rows:
+                category_index.add(*_category_entry(row))
+            _category_index_loaded = True
+
+    @staticmethod
+    def index_category(category: Category):
+        """New categories are searchable at once in this process; cached rankings predate them"""
+        if _category_index_loaded:
+            _write(category_index.add, *_category_entry(category))
+        category_search_cache.clear()
+
+    @staticmethod
+    def rebuild_indexes(db: Session) -> int:
+        """Scheduled job for the in-process indexes: picks up edits and deletions from other workers"""
+        global _rebuild_writes
+        if SearchService.uses_trigram_indexes(db):
+            return 0
+        with _rebuild_writes_lock:
+            _rebuild_writes = []
+        try:
+            SearchService._swap_in_snapshots(db)
+        finally:
+            with _rebuild_writes_lock:
+                writes, _rebuild_writes = _rebuild_writes, None
+            for function, args in writes:
+                function(*args)
+        return len(user_index.documents) + len(post_index) + len(comment_index) + len(category_index)
+
+    @staticmethod
+    def _swap_in_snapshots(db: Session):
+        global _user_index_loaded
+        rows = db.execute(select(User.id, User.username, User.full_name)).all()
+        with _user_index_lock:
+            user_index.replace_all(rows)
+            _user_index_loaded = True
+        # Content indexes are only kept by workers that have served a content search
+        if _content_index_loaded:
+            fetched = [(index, db.execute(_content_rows(kind)).all()) for kind, index in (("posts", post_index), ("comments", comment_index))]
+            with _content_index_lock:
+                for index, rows in fetched:
+                    index.replace_all(rows)
+        if _category_index_loaded:
+            rows = db.execute(_category_rows()).all()
+            with _category_index_lock:
+                category_index.replace_all(_category_entry(row) for row in rows)
@@ -0,0 +1,190 @@
+"""
+Personalized suggestions
+"People you may know" ranks friends-of-friends over an in-memory follow graph
+(core.follow_graph) that is loaded once per worker, updated by the follow write
+paths and rebuilt on a schedule. Ranked suggestions are cached per user.
+
+Category suggestions are item-item collaborative filtering: a scheduled job builds
+the sparse user x category membership matrix, keeps each category's nearest
+neighbours by cosine similarity of their member sets, and precomputes every
+member's top categories. Joining or leaving recomputes that user's row from the
+stored neighbours in one statement.
+"""
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+from scipy import sparse
+from sqlalchemy import delete, func, insert, literal, select
+from sqlalchemy.orm import Session
+
+from config import settings
+from core.cache import TTLCache
+from core.follow_graph import FollowGraph
+from core.metrics import registry
+from models.user import User, UserFollow
+from models.category import Category, CategoryMember, CategorySimilarity, CategorySuggestion
+
+# Ranked suggestions cached per user; pages are cut from this list
+MAX_USER_SUGGESTIONS = 50
+# Neighbours kept per category, suggestions stored per user, and the overlap below which similarity is noise
+SIMILAR_CATEGORIES = 20
+CATEGORY_SUGGESTIONS = 10
+MIN_SHARED_MEMBERS = 2
+WRITE_BATCH_SIZE = 5000
+
+follow_graph = FollowGraph()
+_follow_graph_loaded = False
+
+user_suggestion_cache = TTLCache("user_suggestions", settings.USER_SUGGESTIONS_CACHE_SECONDS, max_entries=10000)
+
+registry.gauge("follow_graph_edges", "Edges in this worker's in-memory follow graph").set_function(lambda: follow_graph.edge_count)
+registry.gauge("follow_graph_bytes", "Memory held by this worker's in-memory follow graph").set_function(lambda: follow_graph.nbytes)
+
+def _edge_rows(after_id: int = 0):
+    return select(UserFollow.id, UserFollow.follower_id, UserFollow.followed_id).where(UserFollow.id > after_id)
+
+def _top_per_row(matrix: sparse.spmatrix, k: int, keep_columns: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """(row, column, score) of the k best positive entries of each row among `keep_columns`, best first"""
+    entries = matrix.tocoo()
+    keep = (entries.data > 0) & keep_columns[entries.col]
+    rows, columns, scores = entries.row[keep], entries.col[keep], entries.data[keep]
+    order = np.lexsort((columns, -scores, rows))
+    rows, columns, scores = rows[order], columns[order], scores[order]
+    rank = np.arange(len(rows)) - np.searchsorted(rows, rows)
+    keep = rank < k
+    return rows[keep], columns[keep], scores[keep]
+
+def _write_rows(db: Session, model, rows: List[Dict[str, Any]]):
+    for start in range(0, len(rows), WRITE_BATCH_SIZE):
+        db.execute(insert(model), rows[start:start + WRITE_BATCH_SIZE])
+
+class SuggestionService:
+    @staticmethod
+    def sync_follow_graph(db: Session):
+        """Load the follow graph on first use, then pick up follows added by other workers (a primary-key range scan)"""
+        global _follow_graph_loaded
+        # No lock around the query: under run_sync it yields to the event loop, where a thread waiting on a
+        # lock would block every request. replace_all swaps atomically and add skips existing edges, so
+        # concurrent syncs at worst load the same edges twice.
+        if not _follow_graph_loaded:
+            follow_graph.replace_all(db.execute(_edge_rows()).all())
+            _follow_graph_loaded = True
+            return
+        for row in db.execute(_edge_rows(follow_graph.max_edge_id)).all():
+            follow_graph.add(row.follower_id, row.followed_id, row.id)
+
+    @staticmethod
+    def record_follow(follower_id: int, followed_id: int):
+        """Reflect a follow made by this process; the follower's cached suggestions are stale"""
+        if _follow_graph_loaded:
+            follow_graph.add(follower_id, followed_id)
+        user_suggestion_cache.delete(follower_id)
+
+    @staticmethod
+    def record_unfollow(follower_id: int, followed_id: int):
+        """Other workers only see unfollows on rebuild_follow_graph"""
+        if _follow_graph_loaded:
+            follow_graph.remove(follower_id, followed_id)
+        user_suggestion_cache.delete(follower_id)
+
+    @staticmethod
+    def rebuild_follow_graph(db: Session) -> int:
+        """Scheduled job: picks up unfollows from other workers (only on workers that loaded the graph)"""
+        if not _follow_graph_loaded:
+            return 0
+        # The swap is atomic, so requests keep using the old graph meanwhile instead of waiting on the load
+        follow_graph.replace_all(db.execute(_edge_rows()))
+        return follow_graph.edge_count
+
+    @staticmethod
+    def suggest_users(db: Session, user_id: int, limit: int = 10) -> List[Dict[str, Any]]:
+        """Friends-of-friends the user does not follow yet, with how many of their follows follow each"""
+        def compute():
+            SuggestionService.sync_follow_graph(db)
+            return follow_graph.suggest(user_id, MAX_USER_SUGGESTIONS)
+
+        ranked = user_suggestion_cache.get_or_compute(user_id, compute)[:limit]
+        if not ranked:
+            return []
+        users = {row.id: row for row in db.execute(
+            select(User.id, User.username, User.full_name, User.avatar_url).where(User.id.in_([id_ for id_, _, _ in ranked]))
+        )}
+        return [
+            {
+                "id": suggested_id,
+                "username": users[suggested_id].username,
+                "full_name": users[suggested_id].full_name,
+                "avatar_url": users[suggested_id].avatar_url,
+                "mutual_count": mutual_count,
+                "score": round(score, 4)
+            }
+            for suggested_id, score, mutual_count in ranked if suggested_id in users
+        ]
+
+    @staticmethod
+    def refresh_category_suggestions(db: Session) -> int:
+        """Scheduled job: recompute category neighbours from co-membership, then every member's suggestions"""
+        memberships = np.array(db.execute(select(CategoryMember.user_id, CategoryMember.category_id)).all(), dtype=np.int64).reshape(-1, 2)
+        public_ids = np.array(db.scalars(select(Category.id).where(Category.is_public == True)).all(), dtype=np.int64)
+        db.execute(delete(CategorySuggestion))
+        db.execute(delete(CategorySimilarity))
+        if not len(memberships):
+            db.commit()
+            return 0
+
+        user_ids, user_rows = np.unique(memberships[:, 0], return_inverse=True)
+        category_ids, category_columns = np.unique(memberships[:, 1], return_inverse=True)
+        members = sparse.csr_matrix(
+            (np.ones(len(memberships), dtype=np.float64), (user_rows, category_columns)),
+            shape=(len(user_ids), len(category_ids))
+        )
+        members.data[:] = 1
+
+        # Cosine similarity of member sets: shared members / sqrt(size a * size b)
+        shared = (members.T @ members).tocoo()
+        sizes = np.asarray(members.sum(axis=0)).ravel()
+        overlap = (shared.data >= MIN_SHARED_MEMBERS) & (shared.row != shared.col)
+        cosine = sparse.coo_matrix(
+            (shared.data[overlap] / np.sqrt(sizes[shared.row[overlap]] * sizes[shared.col[overlap]]),
+             (shared.row[overlap], shared.col[overlap])),
+            shape=shared.shape
+        )
+        rows, columns, scores = _top_per_row(cosine, SIMILAR_CATEGORIES, np.ones(len(category_ids), dtype=bool))
+        neighbours = sparse.csr_matrix((scores, (rows, columns)), shape=shared.shape)
+        _write_rows(db, CategorySimilarity, [
+            {"category_id": int(category_ids[row]), "similar_id": int(category_ids[column]), "score": float(score)}
+            for row, column, score in zip(rows, columns, scores)
+        ])
+
+        # A member's score for a category sums its similarity to every category they are in
+        candidates = (members @ neighbours).tocsr()
+        candidates = candidates - candidates.multiply(members)
+        rows, columns, scores = _top_per_row(candidates, CATEGORY_SUGGESTIONS, np.isin(category_ids, public_ids))
+        suggestions = [
+            {"user_id": int(user_ids[row]), "category_id": int(category_ids[column]), "score": float(score)}
+            for row, column, score in zip(rows, columns, scores)
+        ]
+        _write_rows(db, CategorySuggestion, suggestions)
+        db.commit()
+        return len(suggestions)
+
+    @staticmethod
+    def refresh_user_categories(db: Session, user_id: int):
+        """Recompute one user's category suggestions from the stored neighbours, in the caller's transaction"""
+        # Memberships added or removed by the caller must be visible to the statement below
+        db.flush()
+        joined = select(CategoryMember.category_id).where(CategoryMember.user_id == user_id)
+        score = func.sum(CategorySimilarity.score)
+        db.execute(delete(CategorySuggestion).where(CategorySuggestion.user_id == user_id))
+        db.execute(insert(CategorySuggestion).from_select(
+            ["user_id", "category_id", "score"],
+            select(literal(user_id), CategorySimilarity.similar_id, score)
+            .join(Category, Category.id == CategorySimilarity.similar_id)
+            .where(
+                CategorySimilarity.category_id.in_(joined), CategorySimilarity.similar_id.not_in(joined),
+                Category.is_public == True
+            )
+            .group_by(CategorySimilarity.similar_id)
+            .order_by(score.desc(), CategorySimilarity.similar_id)
+            .limit(CATEGORY_SUGGESTIONS)
+        ))
@@ -0,0 +1,97 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import case, func, select
+import logging
+from typing import Dict, Tuple
+
+from core.database import upsert_insert
+from core.metrics import registry
+from models.user import User, UserFollow, UserStats
+from models.post import Post, PostLike, Comment
+
+RECONCILE_BATCH_SIZE = 1000
+COUNTERS = ("posts_count", "followers_count", "following_count", "likes_received", "comments_received")
+
+STATS_REPAIRED = registry.counter("user_stats_repaired_total", "User stats rows corrected by the reconciliation job")
+
+logger = logging.getLogger(__name__)
+
+class UserStatsService:
+    @staticmethod
+    def get(db: Session, user_id: int) -> Dict[str, int]:
+        """Primary-key lookup; users with no activity yet have no row"""
+        stats = db.get(UserStats, user_id)
+        return {counter: getattr(stats, counter) if stats else 0 for counter in COUNTERS}
+
+    @staticmethod
+    def bump(db: Session, user_id: int, **deltas: int):
+        """Adjust counters in the caller's transaction (no read-modify-write), creating the row on first use"""
+        deltas = {counter: delta for counter, delta in deltas.items() if delta}
+        if not deltas:
+            return
+        insert = upsert_insert(db)
+        stmt = insert(UserStats).values(user_id=user_id, **{counter: max(delta, 0) for counter, delta in deltas.items()})
+        updates = {}
+        for counter, delta in deltas.items():
+            column = getattr(UserStats, counter)
+            # Decrements never go below zero; the reconciliation job fixes any drift
+            updates[counter] = case((column + delta < 0, 0), else_=column + delta) if delta < 0 else column + delta
+        db.execute(stmt.on_conflict_do_update(index_elements=[UserStats.user_id], set_=updates))
+
+    @staticmethod
+    def bump_each(db: Session, *changes: Tuple[int, Dict[str, int]]):
+        """bump() for several users, in ascending user_id order so concurrent transactions lock their rows in the same order"""
+        for user_id, deltas in sorted(changes, key=lambda change: change[0]):
+            UserStatsService.bump(db, user_id, **deltas)
+
+    @staticmethod
+    def _actual_counts() -> Dict[str, object]:
+        """Correlated subqueries computing each counter from the source tables for User.id"""
+        return {
+            "posts_count": select(func.count(Post.id)).where(Post.user_id == User.id).scalar_subquery(),
+            "followers_count": select(func.count(UserFollow.id)).where(UserFollow.followed_id == User.id).scalar_subquery(),
+            "following_count": select(func.count(UserFollow.id)).where(UserFollow.follower_id == User.id).scalar_subquery(),
+            "likes_received": select(func.count(PostLike.id)).join(Post, PostLike.post_id == Post.id)
+                .where(Post.user_id == User.id).scalar_subquery(),
+            "comments_received": select(func.count(Comment.id)).join(Post, Comment.post_id == Post.id)
+                .where(Post.user_id == User.id).scalar_subquery(),
+        }
+
+    @staticmethod
+    def reconcile(db: Session) -> int:
+        """Periodic job: recount every user's stats in batches and repair the rows that drifted"""
+        actual = UserStatsService._actual_counts()
+        repaired = 0
+        last_id = 0
+
+        while True:
+            rows = db.execute(
+                select(User.id, *(expr.label(counter) for counter, expr in actual.items()),
+                       *(getattr(UserStats, counter).label(f"stored_{counter}") for counter in COUNTERS))
+                .outerjoin(UserStats, UserStats.user_id == User.id)
+                .where(User.id > last_id).order_by(User.id).limit(RECONCILE_BATCH_SIZE)
+            ).all()
+            if not rows:
+                break
+            last_id = rows[-1].id
+
+            drifted = [
+                row.id for row in rows
+                if any(getattr(row, counter) != (getattr(row, f"stored_{counter}") or 0) for counter in COUNTERS)
+            ]
+            if drifted:
+                # Recount inside the repair statement so writes since the check are not overwritten
+                insert = upsert_insert(db)
+                stmt = insert(UserStats).from_select(
+                    ["user_id", *actual], select(User.id, *actual.values()).where(User.id.in_(drifted))
+                )
+                db.execute(stmt.on_conflict_do_update(
+                    index_elements=[UserStats.user_id],
+                    set_={counter: getattr(stmt.excluded, counter) for counter in COUNTERS}
+                ))
+                repaired += len(drifted)
+            db.commit()
+
+        if repaired:
+            STATS_REPAIRED.inc(repaired)
+            logger.warning(f"Repaired drifted stats for {repaired} users")
+        return repaired